@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# Фоновые задачи (reaper, пополнение пула колод) живут только в процессе сервера
+from main.services.background import start_background_jobs  # noqa: E402
+
+start_background_jobs()
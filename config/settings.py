@@ -11,8 +11,10 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
+from importlib.util import find_spec
 import dotenv
 import os
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,6 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "main.middleware.RequestMetricsMiddleware",
+    "main.middleware.CompressionMiddleware",
+    "main.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -62,6 +67,9 @@ CORS_ALLOWED_ORIGINS = [
     'http://2.56.90.144:3000',
     'http://2.56.90.144:8000',
 ]
+# Отметка read-your-writes (main.db_router) для клиентов, которые не хранят cookie
+CORS_ALLOW_HEADERS = (*default_headers, "x-read-primary")
+CORS_EXPOSE_HEADERS = ["X-Read-Primary"]
 
 
 ROOT_URLCONF = "config.urls"
@@ -83,6 +91,48 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "config.wsgi.application"
+ASGI_APPLICATION = "config.asgi.application"
+
+# Общий кеш (REDIS_URL): версия каталога после правок в админке и DjangoResponseCache видны всем воркерам.
+# Без него каждый процесс держит свой LocMem - другие воркеры перечитают каталог по CATALOG_TTL
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        },
+    }
+
+# Push-уведомления о комнатах (SSE). Для нескольких воркеров - main.services.events.RedisEventBackend
+ROOM_EVENTS = {
+    "BACKEND": os.getenv("ROOM_EVENTS_BACKEND", "main.services.events.LocalEventBackend"),
+    "OPTIONS": {"url": os.getenv("REDIS_URL")} if os.getenv("REDIS_URL") else {},
+}
+
+# Период (сек) фоновой очистки брошенных комнат в процессе сервера (запуск из config/asgi.py и wsgi.py).
+# Пусто - только manage.py reap_rooms (--every для отдельного процесса)
+ROOM_REAPER_INTERVAL = int(os.getenv("ROOM_REAPER_INTERVAL", "0")) or None
+
+# Пул заранее разыгранных колод для мгновенного создания комнат (manage.py fill_deck_pool), по умолчанию выключен:
+# без наполнения (команда или период ниже) он дает только промахи.
+# Период (сек) его пополнения в процессе сервера. Пусто - только команда (--every для отдельного процесса)
+ROOM_DECK_POOL = os.getenv("ROOM_DECK_POOL", "0") == "1"
+ROOM_DECK_POOL_INTERVAL = int(os.getenv("ROOM_DECK_POOL_INTERVAL", "0")) or None
+
+# Баланс характеристик: "seat" - каждый игрок отдельно к цели сложности,
+# "room" - вся комната сразу с минимальным разбросом сил между игроками (нужен numpy, без него - "seat")
+ROOM_TRAIT_BALANCER = os.getenv("ROOM_TRAIT_BALANCER", "seat")
+
+# Кеш отрендеренных ответов комнаты по ревизии. Общий для воркеров -
+# main.services.response_cache.DjangoResponseCache (OPTIONS: alias, timeout)
+ROOM_RESPONSE_CACHE = {
+    "BACKEND": os.getenv("ROOM_RESPONSE_CACHE_BACKEND", "main.services.response_cache.LocalResponseCache"),
+    "OPTIONS": {"max_bytes": int(os.getenv("ROOM_RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))},
+}
+
+# Метрики запросов: /metrics/ для Prometheus и лог медленных запросов вместе с их SQL
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "0")) or None
 
 
 # Database
@@ -98,6 +148,22 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: POSTGRES_REPLICA_HOSTS=host1,host2 (остальные параметры как у default).
+# Локально можно добавить алиас на ту же SQLite / Postgres и перечислить его в READ_REPLICAS
+READ_REPLICAS = []
+for index, host in enumerate(filter(None, os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",")), start=1):
+    DATABASES[f"replica_{index}"] = {**DATABASES["default"], "HOST": host.strip(), "TEST": {"MIRROR": "default"}}
+    READ_REPLICAS.append(f"replica_{index}")
+
+DATABASE_ROUTERS = ["main.db_router.ReplicaRouter"]
+
+# Реплика с отставанием больше READ_REPLICA_MAX_LAG (сек) или недоступная пропускается до следующей проверки,
+# клиент после изменения READ_REPLICA_STICKY_SECONDS читает с primary (подписанная cookie / заголовок X-Read-Primary).
+# Реплики проверяются фоновым потоком сервера раз в READ_REPLICA_CHECK_INTERVAL, до первой проверки чтения идут на primary
+READ_REPLICA_MAX_LAG = float(os.getenv("READ_REPLICA_MAX_LAG", "2"))
+READ_REPLICA_STICKY_SECONDS = int(os.getenv("READ_REPLICA_STICKY_SECONDS", "5"))
+READ_REPLICA_CHECK_INTERVAL = 5
+
 
 
 # Password validation
@@ -122,6 +188,19 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.BasicAuthentication',  # or token auth
     ),
+    # orjson (если установлен) и msgpack по Accept: application/msgpack (если установлен msgpack), см. reqs-optional.txt
+    'DEFAULT_RENDERER_CLASSES': (
+        'main.renderers.FastJSONRenderer',
+        *(('main.renderers.MsgPackRenderer',) if find_spec('msgpack') else ()),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    # main.middleware.CompressionMiddleware: br (пакет brotli) или gzip для ответов от MIN_BYTES
+    'COMPRESSION': {
+        'MIN_BYTES': int(os.getenv('COMPRESSION_MIN_BYTES', '1024')),
+        'GZIP_LEVEL': 6,
+        'BROTLI_QUALITY': 5,
+        'ENCODINGS': ('br', 'gzip'),
+    },
 }
 
 
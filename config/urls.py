@@ -17,8 +17,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from main.views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 
     path("api/", include("main.urls", namespace="main")),
+    # Асинхронные версии частых запросов (нужен ASGI-сервер, под WSGI работают, но без выигрыша)
+    path("api/async/", include("main.async_urls", namespace="main-async")),
 ]
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Фоновые задачи (reaper, пополнение пула колод) живут только в процессе сервера
+from main.services.background import start_background_jobs  # noqa: E402
+
+start_background_jobs()
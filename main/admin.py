@@ -1,11 +1,45 @@
 from django.contrib import admin
-from main.models import Trait, ShelterDescription, Catastrophe, Room, Player, AssignedTrait, ActionCard, ReactionCard, AssignedActionCard, AssignedReactionCard, Shelter
+from django.db import transaction
+from main.models import Trait, ShelterDescription, Catastrophe, Room, Player, ActionCard, ReactionCard, Shelter, ArchivedGame
+
+from main.services.catalog_io import catalog_changed
+from main.services.sheets import keep_deleted_texts
 
 # Register your models here.
 
+
+class CatalogAdminMixin:
+    """
+    Статичный контент кешируется в памяти - любое изменение через админку сбрасывает кеш и пул колод
+    Удаляемые записи, которые еще в колодах комнат, оставляют там свой текст
+    """
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        transaction.on_commit(catalog_changed)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            keep_deleted_texts(type(obj), [obj.pk])
+            super().delete_model(request, obj)
+        transaction.on_commit(catalog_changed)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            keep_deleted_texts(queryset.model, queryset.values_list("pk", flat=True))
+            super().delete_queryset(request, queryset)
+        transaction.on_commit(catalog_changed)
+
+
 @admin.register(Room)
 class RoomAdmin(admin.ModelAdmin):
-    list_display = ('code', 'pk')
+    list_display = ('code', 'pk', 'seed')
+
+
+@admin.register(ArchivedGame)
+class ArchivedGameAdmin(admin.ModelAdmin):
+    list_display = ('code', 'players_count', 'created_at', 'finished_at', 'archived_at')
+    date_hierarchy = 'created_at'
 
 @admin.register(Shelter)
 class ShelterAdmin(admin.ModelAdmin):
@@ -13,17 +47,17 @@ class ShelterAdmin(admin.ModelAdmin):
 
 
 @admin.register(ActionCard)
-class ActionCardAdmin(admin.ModelAdmin):
+class ActionCardAdmin(CatalogAdminMixin, admin.ModelAdmin):
     list_display = ('pk', )
 
 
 @admin.register(ReactionCard)
-class ReactionCardAdmin(admin.ModelAdmin):
+class ReactionCardAdmin(CatalogAdminMixin, admin.ModelAdmin):
     list_display = ('pk', )
 
 
 @admin.register(Trait)
-class TraitAdmin(admin.ModelAdmin):
+class TraitAdmin(CatalogAdminMixin, admin.ModelAdmin):
     list_display = ('description', 'trait_type', 'power')
     list_filter = ('trait_type', 'power')
     search_fields = ('description',)
@@ -31,7 +65,7 @@ class TraitAdmin(admin.ModelAdmin):
 
 
 @admin.register(ShelterDescription)
-class ShelterDescriptionAdmin(admin.ModelAdmin):
+class ShelterDescriptionAdmin(CatalogAdminMixin, admin.ModelAdmin):
     list_display = ('description', 'size', 'difficulty')
     list_filter = ('size', 'difficulty')
     search_fields = ('description',)
@@ -39,7 +73,7 @@ class ShelterDescriptionAdmin(admin.ModelAdmin):
 
 
 @admin.register(Catastrophe)
-class CatastropheAdmin(admin.ModelAdmin):
+class CatastropheAdmin(CatalogAdminMixin, admin.ModelAdmin):
     list_display = ('title', 'severity', 'description')
     list_filter = ('severity',)
     search_fields = ('title', 'description')
@@ -0,0 +1,21 @@
+from django.urls import path
+from main.async_views import (
+    AsyncRoomRetrieveView,
+    AsyncJoinRoomView,
+    AsyncRevealTraitView,
+    AsyncPlayerByDeviceView,
+)
+
+app_name = "main-async"
+
+# * Те же пути, что в main.urls - клиент переключается сменой префикса /api/ -> /api/async/
+urlpatterns = [
+    path("rooms/<str:code>/", AsyncRoomRetrieveView.as_view(), name="room-retrieve"),
+    path("rooms/<str:code>/join/", AsyncJoinRoomView.as_view(), name="join-room"),
+    path(
+        "players/<int:player_id>/traits/<int:trait_id>/reveal/",
+        AsyncRevealTraitView.as_view(),
+        name="reveal-trait",
+    ),
+    path("players/by-device/", AsyncPlayerByDeviceView.as_view(), name="player-by-device"),
+]
@@ -0,0 +1,190 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import ValidationError, NotFound
+
+from main.models import Room, Player
+from main.serializers import PlayerSerializer
+from main.services.queries import seated_player_queryset, other_room_code_queryset, free_seat_queryset
+from main.services.room_reads import read_projection, cached_room_body, room_changes_since
+from main.services.room_state import room_etag, etag_matches, player_joined, trait_revealed
+from main.services.transitions import areveal_trait, diagnose_reveal
+
+
+# * Асинхронные версии самых частых запросов (async ORM, без потока на ожидание БД)
+# * Отдаются по /api/async/... рядом с синхронными, ответы совпадают с main.views:
+# * запросы и логика общие (main.services), синхронными остаются только сборка снимка / дельты
+# * (сериализаторы) и room_changed (UPDATE ... RETURNING)
+
+
+class AsyncAPIView(View):
+    """
+    Minimal async counterpart of APIView
+    - JSON body parsing (form data as a fallback)
+    - CSRF exempt like DRF views
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    @staticmethod
+    def read_data(request):
+        """Returns the request body as a dict, None if it's not valid JSON"""
+        if request.content_type != "application/json":
+            return request.POST
+
+        if not request.body:
+            return {}
+
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    @staticmethod
+    def respond(data, status=status.HTTP_200_OK, headers=None):
+        return JsonResponse(data, status=status, headers=headers, safe=False, json_dumps_params={"ensure_ascii": False})
+
+    def bad_json(self):
+        return self.respond({"detail": "JSON parse error."}, status=status.HTTP_400_BAD_REQUEST)
+
+
+# & Комнаты
+
+
+class AsyncRoomRetrieveView(AsyncAPIView):
+    """Same contract as RoomRetrieveAPIView: ETag / 304 and ?since=<revision> deltas"""
+
+    replica_reads = True
+
+    async def get(self, request, code):
+        revision = await Room.objects.filter(code=code).values_list("pk", "revision").afirst()
+        if revision is None:
+            return self.respond({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        etag = room_etag(*revision)
+        if etag_matches(request, etag):
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        try:
+            projection = read_projection(request.GET)
+        except ValidationError as error:
+            return self.respond(error.detail, status=status.HTTP_400_BAD_REQUEST)
+
+        room_id, current = revision
+        since = request.GET.get("since")
+        try:
+            if since is None:
+                body = await sync_to_async(cached_room_body)(room_id, current, projection)
+                response = HttpResponse(body, content_type="application/json")
+            else:
+                try:
+                    since = int(since)
+                except ValueError:
+                    return self.respond({"detail": "since must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+                response = self.respond(await sync_to_async(room_changes_since)(room_id, current, since, projection))
+        except NotFound as error:
+            return self.respond({"detail": error.detail}, status=status.HTTP_404_NOT_FOUND)
+
+        response["ETag"] = etag
+        return response
+
+
+@sync_to_async
+def player_data(player):
+    """
+    PlayerSerializer data off the event loop: texts come from the catalog,
+    which is (re)loaded with the sync ORM when cold or expired
+    """
+    return PlayerSerializer(player).data
+
+
+class AsyncJoinRoomView(AsyncAPIView):
+    async def post(self, request, code):
+        room = await Room.objects.filter(code=code).afirst()
+        if room is None:
+            return self.respond({"detail": "Room not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        data = self.read_data(request)
+        if data is None:
+            return self.bad_json()
+
+        device_id = data.get("device_id")
+        if not device_id:
+            return self.respond({"detail": "device_id required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        player = await seated_player_queryset(room, device_id).afirst()
+        if player:
+            return self.respond(await player_data(player))
+
+        existing_room_code = await other_room_code_queryset(room, device_id).afirst()
+
+        if existing_room_code:
+            return self.respond(
+                {
+                    "detail": "Device already joined another room",
+                    "room_code": existing_room_code,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        unassigned_player = await free_seat_queryset(room).afirst()
+
+        if not unassigned_player:
+            return self.respond({"detail": "Room is full"}, status=status.HTTP_400_BAD_REQUEST)
+
+        unassigned_player.device_id = device_id
+        await unassigned_player.asave(update_fields=["device_id"])
+        await sync_to_async(player_joined)(room.pk, unassigned_player)
+
+        return self.respond(await player_data(unassigned_player))
+
+
+# & Игроки
+
+
+class AsyncRevealTraitView(AsyncAPIView):
+    async def post(self, request, player_id, trait_id):
+        data = self.read_data(request)
+        if data is None:
+            return self.bad_json()
+
+        device_id = data.get("device_id")
+        if not device_id:
+            return self.respond({"detail": "device_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if await areveal_trait(player_id, trait_id, device_id):
+            await sync_to_async(trait_revealed)(player_id, trait_id)
+            return self.respond({"trait_id": trait_id, "is_revealed": True})
+
+        error, error_status = await sync_to_async(diagnose_reveal)(player_id, trait_id, device_id)
+        return self.respond({"detail": error}, status=error_status)
+
+
+class AsyncPlayerByDeviceView(AsyncAPIView):
+    replica_reads = True
+
+    async def post(self, request):
+        data = self.read_data(request)
+        if data is None:
+            return self.bad_json()
+
+        device_id = data.get("device_id")
+        if not device_id:
+            return self.respond({"room": None})
+
+        code = await (
+            Player.objects
+            .filter(device_id=device_id, room__is_playing=True)
+            .values_list("room__code", flat=True)
+            .afirst()
+        )
+
+        return self.respond({"room": code})
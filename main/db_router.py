@@ -0,0 +1,215 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections, DatabaseError
+
+
+logger = logging.getLogger(__name__)
+
+
+# * Чтения помеченных view (replica_reads = True) уходят на реплики из READ_REPLICAS
+# * Любая запись в запросе и недавние записи того же клиента возвращают чтения на primary
+
+READ_REPLICA_MAX_LAG = 2.0
+READ_REPLICA_STICKY_SECONDS = 5
+READ_REPLICA_CHECK_INTERVAL = 5.0
+# * Статус старше стольких интервалов (проверки остановились) считается недоступностью
+READ_REPLICA_STALE_CHECKS = 3
+
+# Подписанная отметка о недавней записи: cookie и тот же токен в заголовке (для клиентов без cookie)
+PRIMARY_PIN_COOKIE = "read_primary"
+PRIMARY_PIN_HEADER = "X-Read-Primary"
+PRIMARY_PIN_SALT = "main.db_router.primary-pin"
+
+# Отставание реплики Postgres: 0, если все полученное уже применено
+POSTGRES_LAG_SQL = (
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+_replica_reads = ContextVar("replica_reads", default=False)
+# Записи запроса: изменяемый объект, чтобы отметку из потока sync_to_async было видно и в async middleware
+_writes = ContextVar("replica_writes", default=None)
+
+
+def read_replicas():
+    return tuple(getattr(settings, "READ_REPLICAS", ()))
+
+
+def allow_replica_reads(enabled=True):
+    """Switches replica reads for the current request/context, returns a token for reset"""
+    return _replica_reads.set(enabled)
+
+
+def reset_replica_reads(token):
+    _replica_reads.reset(token)
+
+
+def track_writes():
+    """Starts recording ORM writes of the current request/context, returns a token for untrack_writes"""
+    return _writes.set([])
+
+
+def untrack_writes(token):
+    """Stops recording, returns True if anything was written since track_writes"""
+    wrote = bool(_writes.get())
+    _writes.reset(token)
+    return wrote
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token = allow_replica_reads(enabled)
+    try:
+        yield
+    finally:
+        reset_replica_reads(token)
+
+
+class ReplicaHealth:
+    """
+    Availability of replica aliases, probed off the request path (start_replica_monitor)
+    - Down (connection error) or lagging past READ_REPLICA_MAX_LAG means unavailable
+    - Never probed or not probed for READ_REPLICA_STALE_CHECKS intervals also means unavailable:
+      requests only read the status and fall back to primary
+    """
+
+    def __init__(self):
+        self._status = {}
+
+    def is_available(self, alias):
+        status = self._status.get(alias)
+        if status is None:
+            return False
+        interval = getattr(settings, "READ_REPLICA_CHECK_INTERVAL", READ_REPLICA_CHECK_INTERVAL)
+        return status[0] and time.monotonic() - status[1] < interval * READ_REPLICA_STALE_CHECKS
+
+    def refresh(self):
+        for alias in read_replicas():
+            self.mark(alias, self.probe(alias))
+
+    def mark(self, alias, available):
+        previous = self._status.get(alias)
+        self._status[alias] = (available, time.monotonic())
+        if previous is not None and previous[0] != available:
+            logger.warning("Read replica %s is %s", alias, "back" if available else "unavailable")
+
+    def forget(self):
+        self._status.clear()
+
+    @staticmethod
+    def probe(alias):
+        max_lag = getattr(settings, "READ_REPLICA_MAX_LAG", READ_REPLICA_MAX_LAG)
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor == "postgresql":
+                    cursor.execute(POSTGRES_LAG_SQL)
+                    lag = cursor.fetchone()[0] or 0
+                    return float(lag) <= max_lag
+                cursor.execute("SELECT 1")
+                return True
+        except DatabaseError:
+            logger.exception("Read replica %s probe failed", alias)
+            return False
+
+
+health = ReplicaHealth()
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def start_replica_monitor(interval_seconds):
+    """Probes READ_REPLICAS now and then every interval in a daemon thread (once per process)"""
+    global _monitor
+
+    with _monitor_lock:
+        if _monitor is not None:
+            return _monitor
+
+        stop = threading.Event()
+
+        def run():
+            while True:
+                try:
+                    health.refresh()
+                except Exception:
+                    logger.exception("Read replica monitor failed")
+                finally:
+                    for alias in read_replicas():
+                        connections[alias].close()
+                if stop.wait(interval_seconds):
+                    return
+
+        _monitor = threading.Thread(target=run, name="replica-monitor", daemon=True)
+        _monitor.stop = stop
+        _monitor.start()
+        return _monitor
+
+
+# & Read-your-writes для клиента
+# * Отметка о записи едет с клиентом (подписанные cookie / заголовок), а не в кеше процесса:
+# * следующий запрос может попасть в другой воркер
+
+
+def primary_pin():
+    """Signed token that keeps the client's reads on primary for READ_REPLICA_STICKY_SECONDS"""
+    return signing.TimestampSigner(salt=PRIMARY_PIN_SALT).sign("1")
+
+
+def pinned_to_primary(request):
+    token = request.COOKIES.get(PRIMARY_PIN_COOKIE) or request.headers.get(PRIMARY_PIN_HEADER)
+    if not token:
+        return False
+
+    seconds = getattr(settings, "READ_REPLICA_STICKY_SECONDS", READ_REPLICA_STICKY_SECONDS)
+    try:
+        signing.TimestampSigner(salt=PRIMARY_PIN_SALT).unsign(token, max_age=seconds)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+class ReplicaRouter:
+    """
+    Reads go to one random available replica per context, only while replica reads are allowed
+    - Writes always go to default and switch the rest of the request back to default
+    - Writes are recorded for ReplicaRoutingMiddleware (track_writes): only a request that wrote pins its client
+    - Replicas are never migrated (they mirror default)
+    """
+
+    def db_for_read(self, model, **hints):
+        target = _replica_reads.get()
+        if not target:
+            return None
+        if isinstance(target, str):
+            return target
+
+        # Реплика выбирается один раз на запрос: ревизия и снимок комнаты читаются с одного сервера
+        candidates = [alias for alias in read_replicas() if health.is_available(alias)]
+        target = random.choice(candidates) if candidates else False
+        _replica_reads.set(target)
+        return target or None
+
+    def db_for_write(self, model, **hints):
+        writes = _writes.get()
+        if writes is not None and not writes:
+            writes.append(model)
+        if _replica_reads.get():
+            _replica_reads.set(False)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in read_replicas():
+            return False
+        return None
@@ -0,0 +1,41 @@
+import gzip
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+
+from main.services.archive import archive_idle_rooms, jsonl_writer, write_table, ARCHIVE_IDLE_HOURS, ARCHIVE_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        "Move finished / abandoned rooms into the archive (ArchivedGame or a JSONL file) "
+        "and delete them from the live tables, in bounded chunks"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=float, default=ARCHIVE_IDLE_HOURS, help="Idle time before archiving")
+        parser.add_argument("--chunk-size", type=int, default=ARCHIVE_CHUNK_SIZE)
+        parser.add_argument("--max-chunks", type=int, default=None)
+        parser.add_argument(
+            "--output", default=None, metavar="PATH",
+            help="Append JSON lines to this file (.gz is compressed) instead of the ArchivedGame table",
+        )
+
+    def handle(self, *args, **options):
+        arguments = {
+            "idle": timedelta(hours=options["hours"]),
+            "chunk_size": options["chunk_size"],
+            "max_chunks": options["max_chunks"],
+        }
+
+        if options["output"]:
+            opener = gzip.open if options["output"].endswith(".gz") else open
+            with opener(options["output"], "at", encoding="utf-8") as stream:
+                report = archive_idle_rooms(write=jsonl_writer(stream), **arguments)
+        else:
+            report = archive_idle_rooms(write=write_table, **arguments)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {report.archived} rooms, discarded {report.discarded} empty ones, "
+            f"deleted {report.rows} live rows."
+        ))
@@ -0,0 +1,104 @@
+import json
+import random
+import time
+from gzip import compress as gzip_compress
+
+from django.core.management import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+
+from main.management.commands.loadtest import seed_catalog
+from main.middleware import brotli, compression_settings
+from main.models import Room
+from main.renderers import FastJSONRenderer, MsgPackRenderer, orjson, msgpack
+from main.serializers import RoomRetrieveSerializer
+from main.services.catalog import invalidate_catalog
+from main.services.draw_content import draw_game_content
+from main.services.projections import project_room
+from main.services.queries import room_detail_queryset
+from main.utils import allocate_room_code
+
+
+def cpu_us(action, repeat):
+    """Mean process CPU time of one call, microseconds"""
+    started = time.process_time()
+    for _ in range(repeat):
+        action()
+    return round((time.process_time() - started) / repeat * 1_000_000, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure CPU time and size of room payloads per renderer and compression, "
+        "for several room sizes, against a throwaway test database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="4,8,16,30", help="Comma-separated players counts")
+        parser.add_argument("--repeat", type=int, default=200, help="Renders per measurement")
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--output", default=None, help="Write JSON here instead of stdout")
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        sizes = [int(size) for size in options["sizes"].split(",")]
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seed_catalog(traits_per_type=200, cards=30)
+            results = [self.bench_size(players_count, options["repeat"]) for players_count in sizes]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            invalidate_catalog()
+
+        report = {
+            "repeat": options["repeat"],
+            "available": {"orjson": orjson is not None, "msgpack": msgpack is not None, "brotli": brotli is not None},
+            "rooms": results,
+        }
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def bench_size(self, players_count, repeat):
+        room = Room.objects.create(code=allocate_room_code(), players_count=players_count, difficulty=3, balance=3, severity=3)
+        draw_game_content(room)
+
+        payloads = {
+            "full": RoomRetrieveSerializer(room_detail_queryset().get(pk=room.pk)).data,
+            "table": project_room(room.pk),
+        }
+
+        renderers = {"drf_json": JSONRenderer()}
+        if orjson is not None:
+            renderers["fast_json"] = FastJSONRenderer()
+        if msgpack is not None:
+            renderers["msgpack"] = MsgPackRenderer()
+
+        config = compression_settings()
+        compressors = {"gzip": lambda body: gzip_compress(body, compresslevel=config["GZIP_LEVEL"], mtime=0)}
+        if brotli is not None:
+            compressors["br"] = lambda body: brotli.compress(body, quality=config["BROTLI_QUALITY"])
+
+        result = {"players": players_count}
+        for payload_name, data in payloads.items():
+            for renderer_name, renderer in renderers.items():
+                body = renderer.render(data)
+                entry = {
+                    "render_us": cpu_us(lambda: renderer.render(data), repeat),
+                    "bytes": len(body),
+                }
+                for compressor_name, compress in compressors.items():
+                    entry[f"{compressor_name}_us"] = cpu_us(lambda: compress(body), repeat)
+                    entry[f"{compressor_name}_bytes"] = len(compress(body))
+                result[f"{payload_name}/{renderer_name}"] = entry
+        return result
@@ -7,11 +7,8 @@ from main.models import (
     ShelterDescription,
     Catastrophe,
     Player,
-    AssignedTrait,
     ActionCard,
     ReactionCard,
-    AssignedActionCard,
-    AssignedReactionCard,
     Room,
 )
 
@@ -48,11 +45,8 @@ class Command(BaseCommand):
             ShelterDescription,
             Catastrophe,
             Player,
-            AssignedTrait,
             ActionCard,
             ReactionCard,
-            AssignedActionCard,
-            AssignedReactionCard,
         ]
 
         permissions = []
@@ -0,0 +1,28 @@
+from django.core.management import BaseCommand
+
+from main.management.commands.import_catalog import catalog_format, open_text
+from main.services.catalog_io import export_catalog, CATALOG_KINDS
+
+
+class Command(BaseCommand):
+    help = "Export catalog content as CSV or JSONL (the format import_catalog reads), streamed from the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-", help="File to write, - for stdout (.gz is compressed)")
+        parser.add_argument("--format", choices=("csv", "jsonl"), default=None)
+        parser.add_argument("--kind", action="append", choices=tuple(CATALOG_KINDS), help="Only these kinds")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = catalog_format(path, options["format"]) if path != "-" else (options["format"] or "csv")
+        kinds = tuple(options["kind"] or CATALOG_KINDS)
+
+        stream = open_text(path, "w")
+        if stream is None:
+            written = export_catalog(self.stdout, fmt, kinds)
+        else:
+            with stream:
+                written = export_catalog(stream, fmt, kinds)
+
+        summary = ", ".join(f"{kind}: {count}" for kind, count in written.items()) or "nothing"
+        (self.stderr if stream is None else self.stdout).write(f"Exported {summary}.")
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from main.services.draw_content import DeckKey
+from main.services.deck_pool import (
+    fill_pool,
+    demanded_keys,
+    pool_stats,
+    DECK_POOL_PER_KEY,
+    DECK_POOL_MAX_KEYS,
+    DECK_POOL_STATS_WINDOW,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Top up the pool of pre-drawn room decks (for recently used room parameters by default) "
+        "and report pool hit / miss rates"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--per-key", type=int, default=DECK_POOL_PER_KEY, help="Decks kept per parameter set")
+        parser.add_argument("--max-keys", type=int, default=DECK_POOL_MAX_KEYS)
+        parser.add_argument(
+            "--key", action="append", default=[], metavar="PLAYERS,DIFFICULTY,BALANCE,SEVERITY",
+            help="Fill this parameter set instead of the demanded ones (repeatable)",
+        )
+        parser.add_argument("--stats", action="store_true", help="Only print pool statistics")
+        parser.add_argument(
+            "--every", type=float, default=None, metavar="SECONDS",
+            help="Keep running and top the pool up every SECONDS (a dedicated filler process)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.fill(options)
+            if not options["every"]:
+                break
+            time.sleep(options["every"])
+
+    def fill(self, options):
+        if not options["stats"]:
+            keys = [self.parse_key(value) for value in options["key"]] or demanded_keys(limit=options["max_keys"])
+
+            with transaction.atomic():
+                added = fill_pool(keys, options["per_key"])
+
+            for key, count in added.items():
+                self.stdout.write(f"{tuple(key)}: +{count}")
+            self.stdout.write(self.style.SUCCESS(f"Added {sum(added.values())} decks for {len(added)} keys."))
+
+        stats = pool_stats()
+        self.stdout.write(
+            f"Pool: {stats.decks} decks; rooms of the last {DECK_POOL_STATS_WINDOW}: "
+            f"hits {stats.hits}, misses {stats.misses}, hit rate {stats.hit_rate:.1%}"
+        )
+
+    @staticmethod
+    def parse_key(value):
+        try:
+            key = DeckKey(*(int(part) for part in value.split(",")))
+        except (TypeError, ValueError):
+            raise CommandError(f"--key expects PLAYERS,DIFFICULTY,BALANCE,SEVERITY, got {value!r}")
+
+        if not 4 <= key.players_count <= 30 or not all(1 <= level <= 5 for level in key[1:]):
+            raise CommandError(f"--key out of range: {value!r}")
+        return key
@@ -0,0 +1,73 @@
+import gzip
+import sys
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from main.services.catalog_io import import_catalog, CatalogImportError, IMPORT_CHUNK_SIZE
+
+
+def catalog_format(path, fmt):
+    """--format or the file extension (.csv / .jsonl, optionally .gz)"""
+    if fmt:
+        return fmt
+    name = path[:-3] if path.endswith(".gz") else path
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    raise CommandError(f"Can't tell the format of {path!r}, pass --format csv|jsonl")
+
+
+def open_text(path, mode):
+    if path == "-":
+        return None
+    opener = gzip.open if path.endswith(".gz") else open
+    return opener(path, mode + "t", encoding="utf-8", newline="")
+
+
+class Command(BaseCommand):
+    help = (
+        "Import catalog content (traits, cards, shelters, catastrophes) from CSV or JSONL with upserts, "
+        "streamed in chunks inside one transaction"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to read, - for stdin (.gz is decompressed)")
+        parser.add_argument("--format", choices=("csv", "jsonl"), default=None)
+        parser.add_argument(
+            "--match", choices=("natural", "id"), default="natural",
+            help="Match existing rows by their text (default) or by the id column (unknown ids are created as given)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument("--skip-invalid", action="store_true", help="Import valid rows, report invalid ones")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = catalog_format(path, options["format"]) if path != "-" else (options["format"] or "csv")
+
+        started = time.perf_counter()
+        stream = open_text(path, "r") or sys.stdin
+        try:
+            report = import_catalog(
+                stream, fmt,
+                match=options["match"],
+                chunk_size=options["chunk_size"],
+                skip_invalid=options["skip_invalid"],
+            )
+        except CatalogImportError as error:
+            for line, message in error.errors[:20]:
+                self.stderr.write(f"line {line}: {message}")
+            raise CommandError(f"{len(error.errors)} invalid rows, nothing imported (see --skip-invalid)")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for kind in sorted({*report.created, *report.updated, *report.unchanged}):
+            self.stdout.write(
+                f"{kind}: +{report.created.get(kind, 0)} created, {report.updated.get(kind, 0)} updated, "
+                f"{report.unchanged.get(kind, 0)} unchanged"
+            )
+        if report.skipped:
+            self.stdout.write(self.style.WARNING(f"Skipped {report.skipped} invalid rows."))
+        self.stdout.write(self.style.SUCCESS(f"Imported in {time.perf_counter() - started:.1f} s."))
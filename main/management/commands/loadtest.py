@@ -0,0 +1,246 @@
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from main.models import Trait, TraitType, ActionCard, ReactionCard, ShelterDescription, Catastrophe
+from main.services.catalog import invalidate_catalog
+from main.utils import QueryCounter
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def seed_catalog(traits_per_type, cards):
+    """Synthetic catalog for benchmarks (test database only)"""
+    Trait.objects.bulk_create(
+        [
+            # Кириллица примерно реальной длины - от нее зависят размер и стоимость рендеринга
+            Trait(
+                trait_type=trait_type,
+                description=f"{TraitType(trait_type).label} №{i}: описание характеристики средней длины",
+                power=random.randint(-10, 10),
+            )
+            for trait_type in TraitType.values
+            if trait_type != TraitType.BIO
+            for i in range(traits_per_type)
+        ],
+        batch_size=1000,
+    )
+    ActionCard.objects.bulk_create([ActionCard(description=f"action #{i}") for i in range(cards)])
+    ReactionCard.objects.bulk_create([ReactionCard(description=f"reaction #{i}") for i in range(cards)])
+    ShelterDescription.objects.bulk_create([
+        ShelterDescription(size=size, difficulty=difficulty, description=f"shelter {size}/{difficulty}")
+        for size in (1, 2, 3)
+        for difficulty in range(1, 6)
+    ])
+    Catastrophe.objects.bulk_create([
+        Catastrophe(severity=severity, title=f"catastrophe {severity}", description="...")
+        for severity in range(1, 6)
+    ])
+    invalidate_catalog()
+
+
+class Command(BaseCommand):
+    help = (
+        "Play N rooms at once (one worker thread and client per room) through the full lifecycle "
+        "against a throwaway test database and print per-endpoint latency, query counts and throughput as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=10, help="Rooms played concurrently")
+        parser.add_argument("--workers", type=int, default=None, help="Rooms in flight at once (default: --rooms)")
+        parser.add_argument("--players", type=int, default=8, help="Seats per room (4-30)")
+        parser.add_argument("--polls", type=int, default=3, help="Room GETs per player between actions")
+        parser.add_argument("--traits-per-type", type=int, default=200)
+        parser.add_argument("--cards", type=int, default=30, help="Action and reaction cards each")
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--output", default=None, help="Write JSON here instead of stdout")
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        self.samples = defaultdict(list)
+        self.samples_lock = threading.Lock()
+        workers = options["workers"] or options["rooms"]
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        directory = None
+        if connection.vendor == "sqlite":
+            # Общая in-memory база блокирует таблицы целиком - потокам нужна файловая база с ожиданием блокировки,
+            # транзакции берут блокировку записи сразу (иначе чтение-затем-запись падает без ожидания)
+            directory = tempfile.mkdtemp()
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(directory, "loadtest.sqlite3")
+            connection.settings_dict["OPTIONS"].setdefault("timeout", 30)
+            connection.settings_dict["OPTIONS"].setdefault("transaction_mode", "IMMEDIATE")
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seed_catalog(options["traits_per_type"], options["cards"])
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                rooms = [
+                    pool.submit(self.play_room, options["players"], options["polls"], random.Random(random.random()))
+                    for _ in range(options["rooms"])
+                ]
+                for room in rooms:
+                    room.result()
+            wall_seconds = time.perf_counter() - started
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if directory:
+                shutil.rmtree(directory, ignore_errors=True)
+            teardown_test_environment()
+            invalidate_catalog()
+
+        report = {
+            "config": {
+                **{key: options[key] for key in ("rooms", "players", "polls", "traits_per_type", "cards", "seed")},
+                "workers": workers,
+            },
+            "database": connection.vendor,
+            "wall_seconds": round(wall_seconds, 3),
+            "requests": sum(len(samples) for samples in self.samples.values()),
+            "throughput_rps": round(sum(len(s) for s in self.samples.values()) / wall_seconds, 1),
+            "endpoints": {name: self.summarize(samples) for name, samples in sorted(self.samples.items())},
+        }
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def call(self, client, endpoint, method, url, data=None, **extra):
+        with QueryCounter() as counter:
+            if method == "get":
+                response = client.get(url, **extra)
+            else:
+                response = getattr(client, method)(url, data or {}, content_type="application/json", **extra)
+
+        sample = (counter.duration_ms, counter.count, response.status_code, len(response.content))
+        with self.samples_lock:
+            self.samples[endpoint].append(sample)
+        return response
+
+    def together(self, calls):
+        """
+        Sends requests at the same time, each from its own thread and client, returns the responses in order
+        - calls: [(endpoint, method, url, data, extra), ...]
+        """
+        def send(call):
+            endpoint, method, url, data, extra = call
+            try:
+                return self.call(Client(raise_request_exception=False), endpoint, method, url, data, **extra)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+            return list(pool.map(send, calls))
+
+    def play_room(self, players_count, polls, rng):
+        """
+        One room from creation to the last leave, in a worker thread with its own client
+        - Rooms run side by side, so their requests overlap like concurrent games
+        - Polls of a room go out at once (single-flight of the response cache), every action is tapped twice
+          at once (conditional transitions: exactly one of the pair applies)
+        """
+        try:
+            self.play(Client(raise_request_exception=False), players_count, polls, rng)
+        finally:
+            connection.close()
+
+    def play(self, client, players_count, polls, rng):
+        response = self.call(client, "room-create", "post", "/api/rooms/", {
+            "players_count": players_count,
+            "difficulty": rng.randint(1, 5),
+            "balance": rng.randint(1, 5),
+            "severity": rng.randint(1, 5),
+        })
+        code = response.json()["code"]
+        players = []
+        for seat in range(players_count):
+            player = self.call(client, "join-room", "post", f"/api/rooms/{code}/join/", {"device_id": f"{code}-{seat}"})
+            players.append(player.json())
+        host = players[0]
+        etag = None
+
+        def poll_all():
+            nonlocal etag
+            for _ in range(polls):
+                extra = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+                responses = self.together([("room-retrieve", "get", f"/api/rooms/{code}/", None, extra)] * len(players))
+                etag = responses[-1].get("ETag", etag)
+
+        def double_tap(endpoint, url, data):
+            self.together([(endpoint, "post", url, data, {})] * 2)
+
+        self.call(client, "start-game", "post", f"/api/rooms/{code}/start/", {"device_id": host["device_id"]})
+        poll_all()
+
+        for player in players:
+            trait = rng.choice(player["player_traits"])
+            double_tap(
+                "reveal-trait", f"/api/players/{player['id']}/traits/{trait['pk']}/reveal/",
+                {"device_id": player["device_id"]},
+            )
+            self.call(client, "player-retrieve", "get", f"/api/players/{player['id']}/")
+        poll_all()
+
+        for player in players:
+            own = {"device_id": player["device_id"]}
+            if player["action_card"]:
+                double_tap("use-action-card", f"/api/action/{player['action_card']['pk']}/use/", own)
+            if player["reaction_card"]:
+                double_tap("use-reaction-card", f"/api/reaction/{player['reaction_card']['pk']}/use/", own)
+        poll_all()
+
+        double_tap("kill-player", f"/api/players/{players[-1]['id']}/kill/", {"deviceId": host["device_id"]})
+        poll_all()
+
+        self.call(client, "room-restart", "post", f"/api/rooms/{code}/restart/")
+        for player in players:
+            self.call(client, "player-by-device", "post", "/api/players/by-device/", {"device_id": player["device_id"]})
+        poll_all()
+
+        # Хост выходит последним, иначе комната удаляется сразу
+        for player in reversed(players):
+            self.call(client, "leave-room", "post", f"/api/rooms/{code}/leave/", {"device_id": player["device_id"]})
+
+    @staticmethod
+    def summarize(samples):
+        latencies = sorted(sample[0] for sample in samples)
+        queries = [sample[1] for sample in samples]
+        total_ms = sum(latencies)
+        return {
+            "count": len(samples),
+            "errors": sum(1 for sample in samples if sample[2] >= 400),
+            # Второе из двух одновременных нажатий карты отвечает 400 (уже использована) - это ожидаемо
+            "statuses": dict(sorted(Counter(sample[2] for sample in samples).items())),
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+            "mean_ms": round(statistics.fmean(latencies), 2),
+            "queries_mean": round(statistics.fmean(queries), 2),
+            "queries_max": max(queries),
+            "bytes_mean": round(statistics.fmean(sample[3] for sample in samples)),
+            "throughput_rps": round(len(samples) / (total_ms / 1000), 1) if total_ms else None,
+        }
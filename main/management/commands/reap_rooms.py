@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+
+from main.services.reaper import reap_stale_rooms, STALE_ROOM_DAYS, REAP_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Delete rooms without activity for the given number of days, in bounded chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=float, default=STALE_ROOM_DAYS)
+        parser.add_argument("--chunk-size", type=int, default=REAP_CHUNK_SIZE)
+        parser.add_argument("--max-chunks", type=int, default=None)
+        parser.add_argument(
+            "--every", type=float, default=None, metavar="SECONDS",
+            help="Keep running and reap again every SECONDS (a dedicated reaper process)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.reap(options)
+            if not options["every"]:
+                break
+            time.sleep(options["every"])
+
+    def reap(self, options):
+        report = reap_stale_rooms(
+            max_age=timedelta(days=options["days"]),
+            chunk_size=options["chunk_size"],
+            max_chunks=options["max_chunks"],
+        )
+
+        for label, count in sorted(report.by_model.items()):
+            self.stdout.write(f"{label}: {count}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Reaped {report.rooms} rooms, {report.rows} rows in total.")
+        )
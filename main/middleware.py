@@ -0,0 +1,288 @@
+import logging
+import time
+from contextlib import ExitStack
+from gzip import compress as gzip_compress
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from main.db_router import (
+    read_replicas,
+    allow_replica_reads,
+    reset_replica_reads,
+    track_writes,
+    untrack_writes,
+    primary_pin,
+    pinned_to_primary,
+    PRIMARY_PIN_COOKIE,
+    PRIMARY_PIN_HEADER,
+    READ_REPLICA_STICKY_SECONDS,
+)
+from main.services.metrics import registry
+
+
+logger = logging.getLogger("main.slow_requests")
+
+# * Сколько запросов SQL сохраняется для лога медленного запроса
+SLOW_REQUEST_MAX_SQL = 100
+
+
+class QueryTracker:
+    """execute_wrapper that counts statements, their time and optionally keeps the SQL"""
+
+    def __init__(self, capture_sql=False):
+        self.count = 0
+        self.seconds = 0.0
+        self.capture_sql = capture_sql
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            if self.capture_sql and len(self.statements) < SLOW_REQUEST_MAX_SQL:
+                self.statements.append((elapsed, sql))
+
+
+class RequestMetricsMiddleware:
+    """
+    Records latency, SQL count and SQL time for every resolved view
+    - Counters live in main.services.metrics.registry (exposed by MetricsView)
+    - Requests slower than SLOW_REQUEST_MS are logged together with their SQL
+    - Async-capable: under ASGI async views are not pushed into a thread by this middleware
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_request_seconds = (getattr(settings, "SLOW_REQUEST_MS", None) or 0) / 1000
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        tracker = QueryTracker(capture_sql=bool(self.slow_request_seconds))
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            self.attach(stack, tracker)
+            response = self.get_response(request)
+        latency = time.perf_counter() - started
+
+        self.record(request, response, latency, tracker)
+        return response
+
+    async def __acall__(self, request):
+        tracker = QueryTracker(capture_sql=bool(self.slow_request_seconds))
+
+        # Соединения привязаны к потоку: async ORM выполняет запросы в потоке sync_to_async
+        # (один на запрос), поэтому обертка ставится и снимается там же
+        stack = ExitStack()
+        await sync_to_async(self.attach)(stack, tracker)
+
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            latency = time.perf_counter() - started
+            await sync_to_async(stack.close)()
+
+        self.record(request, response, latency, tracker)
+        return response
+
+    @staticmethod
+    def attach(stack, tracker):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(tracker))
+
+    def record(self, request, response, latency, tracker):
+        match = request.resolver_match
+        view = match.view_name if match and match.view_name else "<unresolved>"
+        registry.observe(view, request.method, response.status_code, latency, tracker.count, tracker.seconds)
+
+        if self.slow_request_seconds and latency >= self.slow_request_seconds:
+            logger.warning(
+                "Slow request %s %s (%s): %.1f ms, %s queries, %.1f ms in SQL\n%s",
+                request.method, request.path, view, latency * 1000, tracker.count, tracker.seconds * 1000,
+                "\n".join(f"  [{elapsed * 1000:.1f} ms] {sql}" for elapsed, sql in tracker.statements),
+            )
+
+
+# & Сжатие ответов
+
+
+try:  # Optional dependency: без него отдается только gzip
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def compression_settings():
+    """REST_FRAMEWORK["COMPRESSION"] with defaults"""
+    config = getattr(settings, "REST_FRAMEWORK", {}).get("COMPRESSION", {})
+    return {
+        "MIN_BYTES": config.get("MIN_BYTES", 1024),
+        "GZIP_LEVEL": config.get("GZIP_LEVEL", 6),
+        "BROTLI_QUALITY": config.get("BROTLI_QUALITY", 5),
+        "ENCODINGS": tuple(config.get("ENCODINGS", ("br", "gzip"))),
+    }
+
+
+def compress_body(body, encoding, config):
+    if encoding == "br":
+        return brotli.compress(body, quality=config["BROTLI_QUALITY"])
+    return gzip_compress(body, compresslevel=config["GZIP_LEVEL"], mtime=0)
+
+
+def choose_encoding(request, encodings):
+    """First server-preferred encoding the client accepts (q=0 means refused)"""
+    accepted = {}
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+        accepted[name.strip().lower()] = quality
+
+    for encoding in encodings:
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """
+    gzip / brotli for responses above REST_FRAMEWORK["COMPRESSION"]["MIN_BYTES"]
+    - Brotli when the client accepts it and the package is installed, gzip otherwise
+    - Streaming responses (SSE) are left alone
+    - ETag becomes weak like in Django's GZipMiddleware, etag_matches ignores W/
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = compression_settings()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        if (
+            response.streaming
+            or response.has_header("Content-Encoding")
+            or len(response.content) < self.config["MIN_BYTES"]
+        ):
+            return response
+
+        encoding = choose_encoding(request, self.config["ENCODINGS"])
+        if encoding is None:
+            return response
+
+        compressed = compress_body(response.content, encoding, self.config)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = encoding
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
+
+
+# & Чтения с реплик
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets ReplicaRouter send reads of views with `replica_reads = True` to READ_REPLICAS
+    - A client whose request wrote to the database reads from primary for READ_REPLICA_STICKY_SECONDS:
+      the response carries a signed pin (cookie and X-Read-Primary header), later requests send it back
+    - Without configured replicas does nothing
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not read_replicas():
+            return self.get_response(request)
+
+        request.replica_routing = True
+        token, writes = allow_replica_reads(False), track_writes()
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_replica_reads(token)
+            wrote = untrack_writes(writes)
+        self.pin_writer(response, wrote)
+        return response
+
+    async def __acall__(self, request):
+        if not read_replicas():
+            return await self.get_response(request)
+
+        request.replica_routing = True
+        token, writes = allow_replica_reads(False), track_writes()
+        try:
+            response = await self.get_response(request)
+        finally:
+            reset_replica_reads(token)
+            wrote = untrack_writes(writes)
+        self.pin_writer(response, wrote)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not getattr(request, "replica_routing", False):
+            return None
+
+        view_class = getattr(view_func, "view_class", None)
+        if getattr(view_class, "replica_reads", False) and not pinned_to_primary(request):
+            allow_replica_reads()
+        return None
+
+    @staticmethod
+    def pin_writer(response, wrote):
+        # Чтение через POST (players/by-device/) ничего не пишет и не отключает клиенту реплики
+        if not wrote or response.status_code >= 400:
+            return
+        seconds = getattr(settings, "READ_REPLICA_STICKY_SECONDS", READ_REPLICA_STICKY_SECONDS)
+        pin = primary_pin()
+        response.set_cookie(PRIMARY_PIN_COOKIE, pin, max_age=seconds, httponly=True, samesite="Lax")
+        response[PRIMARY_PIN_HEADER] = pin
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_remove_room_started_at_room_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-17 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_room_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.PositiveIntegerField()),
+                ('kind', models.CharField(choices=[('room', 'Комната'), ('player', 'Игрок'), ('trait', 'Характеристика'), ('action_card', 'Карта действия'), ('reaction_card', 'Карта реакции'), ('reset', 'Перезапуск')], max_length=16)),
+                ('object_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='main.room')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['room', 'revision'], name='main_roomch_room_id_fd8a25_idx')],
+            },
+        ),
+    ]
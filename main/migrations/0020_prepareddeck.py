@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_roomcodesequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PreparedDeck',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('players_count', models.PositiveSmallIntegerField()),
+                ('difficulty', models.PositiveSmallIntegerField()),
+                ('balance', models.PositiveSmallIntegerField()),
+                ('severity', models.PositiveSmallIntegerField()),
+                ('payload', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['players_count', 'difficulty', 'balance', 'severity'], name='main_prepar_players_348ee4_idx')],
+            },
+        ),
+    ]
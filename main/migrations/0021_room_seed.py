@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+def drop_prepared_decks(apps, schema_editor):
+    # Колоды пула хранили тексты - теперь это id каталога, старые просто разыгрываются заново
+    apps.get_model('main', 'PreparedDeck').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_prepareddeck'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='seed',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(drop_prepared_decks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_room_seed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignedtrait',
+            name='trait',
+            field=models.ForeignKey(blank=True, null=True, on_delete=models.SET_NULL, related_name='+', to='main.trait'),
+        ),
+        migrations.AlterField(
+            model_name='assignedtrait',
+            name='description',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='assignedactioncard',
+            name='card',
+            field=models.ForeignKey(null=True, on_delete=models.SET_NULL, to='main.actioncard'),
+        ),
+        migrations.AlterField(
+            model_name='assignedactioncard',
+            name='description',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='assignedreactioncard',
+            name='card',
+            field=models.ForeignKey(null=True, on_delete=models.SET_NULL, to='main.reactioncard'),
+        ),
+        migrations.AlterField(
+            model_name='assignedreactioncard',
+            name='description',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
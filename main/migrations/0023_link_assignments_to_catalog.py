@@ -0,0 +1,52 @@
+# Generated by Django 6.0.1 on 2026-10-17 12:00
+
+from django.db import migrations
+from django.db.models import Exists, OuterRef, Subquery
+
+
+def link_to_catalog(apps, schema_editor):
+    """Ссылки на каталог по совпадающему тексту, совпавший текст больше не хранится в назначении"""
+    Trait = apps.get_model('main', 'Trait')
+    AssignedTrait = apps.get_model('main', 'AssignedTrait')
+
+    AssignedTrait.objects.exclude(trait_type='bio').update(
+        trait_id=Subquery(
+            Trait.objects
+            .filter(trait_type=OuterRef('trait_type'), description=OuterRef('description'))
+            .order_by('pk')
+            .values('pk')[:1]
+        )
+    )
+    AssignedTrait.objects.filter(
+        Exists(Trait.objects.filter(pk=OuterRef('trait_id'), description=OuterRef('description')))
+    ).update(description=None)
+
+    for assigned, card in (('AssignedActionCard', 'ActionCard'), ('AssignedReactionCard', 'ReactionCard')):
+        Card = apps.get_model('main', card)
+        apps.get_model('main', assigned).objects.filter(
+            Exists(Card.objects.filter(pk=OuterRef('card_id'), description=OuterRef('description')))
+        ).update(description=None)
+
+
+def copy_from_catalog(apps, schema_editor):
+    Trait = apps.get_model('main', 'Trait')
+    apps.get_model('main', 'AssignedTrait').objects.filter(description__isnull=True).update(
+        description=Subquery(Trait.objects.filter(pk=OuterRef('trait_id')).values('description')[:1])
+    )
+
+    for assigned, card in (('AssignedActionCard', 'ActionCard'), ('AssignedReactionCard', 'ReactionCard')):
+        Card = apps.get_model('main', card)
+        apps.get_model('main', assigned).objects.filter(description__isnull=True).update(
+            description=Subquery(Card.objects.filter(pk=OuterRef('card_id')).values('description')[:1])
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_assignment_references'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_to_catalog, copy_from_catalog),
+    ]
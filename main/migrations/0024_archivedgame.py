@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0023_link_assignments_to_catalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedGame',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=6)),
+                ('players_count', models.PositiveSmallIntegerField()),
+                ('difficulty', models.PositiveSmallIntegerField()),
+                ('balance', models.PositiveSmallIntegerField()),
+                ('severity', models.PositiveSmallIntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+                ('document', models.JSONField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Архивная игра',
+                'verbose_name_plural': 'Архивные игры',
+                'indexes': [models.Index(fields=['created_at'], name='main_archiv_created_da6077_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,144 @@
+# Generated by Django 6.0.1 on 2026-10-17 12:00
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+# Порядок слотов колоды на момент миграции (services.sheets.TRAIT_TYPES), слот 0 - био
+TRAIT_TYPES = ['profession', 'health', 'hobby', 'fear', 'character', 'background', 'knowledge', 'item']
+CARDS = (('action_card', 'AssignedActionCard', 1), ('reaction_card', 'AssignedReactionCard', 2))
+
+
+def assignments_to_deck(apps, schema_editor):
+    """Строки назначений -> колода комнаты (id каталога или сохраненный текст) и маски игроков"""
+    Room = apps.get_model('main', 'Room')
+    Player = apps.get_model('main', 'Player')
+    AssignedTrait = apps.get_model('main', 'AssignedTrait')
+
+    traits = defaultdict(list)
+    for row in AssignedTrait.objects.order_by('pk').values('player_id', 'trait_type', 'trait_id', 'description',
+                                                             'is_revealed').iterator():
+        traits[row['player_id']].append(row)
+    cards = {
+        field: {row['player_id']: row for row in apps.get_model('main', model).objects.values().iterator()}
+        for field, model, _ in CARDS
+    }
+
+    players_by_room = defaultdict(list)
+    for player in Player.objects.all().iterator():
+        players_by_room[player.room_id].append(player)
+
+    rooms = []
+    players = []
+    for room in Room.objects.filter(pk__in=list(players_by_room)).iterator():
+        seats = {}
+        for player in players_by_room[room.pk]:
+            sheet = {'bio': '', 'traits': [None] * len(TRAIT_TYPES), 'action_card': None, 'reaction_card': None}
+            player.revealed = 0
+            player.cards_used = 0
+
+            for row in traits[player.pk]:
+                ref = row['trait_id'] if row['trait_id'] is not None else row['description']
+                if row['trait_type'] == 'bio':
+                    slot, sheet['bio'] = 0, row['description'] or ''
+                elif row['trait_type'] in TRAIT_TYPES:
+                    slot = TRAIT_TYPES.index(row['trait_type']) + 1
+                    sheet['traits'][slot - 1] = ref
+                else:
+                    continue
+                if row['is_revealed']:
+                    player.revealed |= 1 << slot
+
+            for field, _, bit in CARDS:
+                row = cards[field].get(player.pk)
+                if row is not None:
+                    sheet[field] = row['card_id'] if row['card_id'] is not None else row['description']
+                if row is None or row['is_used']:
+                    player.cards_used |= bit
+
+            # Отсутствующие слоты считаются открытыми - переходы их не трогают
+            player.revealed |= sum(1 << slot for slot, ref in enumerate(sheet['traits'], 1) if ref is None)
+            seats[player.seat] = sheet
+            players.append(player)
+
+        empty = {'bio': '', 'traits': [None] * len(TRAIT_TYPES), 'action_card': None, 'reaction_card': None}
+        room.deck = {'seats': [seats.get(seat, empty) for seat in range(1, max(seats) + 1)]}
+        rooms.append(room)
+
+    Room.objects.bulk_update(rooms, ['deck'], batch_size=200)
+    Player.objects.bulk_update(players, ['revealed', 'cards_used'], batch_size=500)
+
+    # Колоды пула в старом формате (без пустых слотов)
+    apps.get_model('main', 'PreparedDeck').objects.all().delete()
+
+
+def deck_to_assignments(apps, schema_editor):
+    Room = apps.get_model('main', 'Room')
+    Player = apps.get_model('main', 'Player')
+    AssignedTrait = apps.get_model('main', 'AssignedTrait')
+
+    decks = dict(Room.objects.filter(deck__isnull=False).values_list('pk', 'deck'))
+    traits = []
+    cards = defaultdict(list)
+    for player in Player.objects.filter(room_id__in=list(decks)).iterator():
+        sheet = decks[player.room_id]['seats'][player.seat - 1]
+        traits.append(AssignedTrait(
+            player_id=player.pk, trait_type='bio', description=sheet['bio'], is_revealed=bool(player.revealed & 1),
+        ))
+        for slot, ref in enumerate(sheet['traits'], 1):
+            if ref is not None:
+                traits.append(AssignedTrait(
+                    player_id=player.pk, trait_type=TRAIT_TYPES[slot - 1],
+                    trait_id=None if isinstance(ref, str) else ref,
+                    description=ref if isinstance(ref, str) else None,
+                    is_revealed=bool(player.revealed & 1 << slot),
+                ))
+        for field, model, bit in CARDS:
+            ref = sheet[field]
+            if ref is not None:
+                cards[model].append(apps.get_model('main', model)(
+                    player_id=player.pk,
+                    card_id=None if isinstance(ref, str) else ref,
+                    description=ref if isinstance(ref, str) else None,
+                    is_used=bool(player.cards_used & bit),
+                ))
+
+    AssignedTrait.objects.bulk_create(traits, batch_size=500)
+    for model, rows in cards.items():
+        apps.get_model('main', model).objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0024_archivedgame'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='deck',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='revealed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='cards_used',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(assignments_to_deck, deck_to_assignments),
+        migrations.DeleteModel(
+            name='AssignedActionCard',
+        ),
+        migrations.DeleteModel(
+            name='AssignedReactionCard',
+        ),
+        migrations.DeleteModel(
+            name='AssignedTrait',
+        ),
+    ]
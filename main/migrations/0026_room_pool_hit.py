@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0025_sheets_in_deck'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='pool_hit',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+    ]
@@ -14,6 +14,17 @@ class Room(models.Model):
 
     is_playing = models.BooleanField(default=False)
 
+    # * Растет при каждом изменении состояния комнаты - из него строится ETag
+    revision = models.PositiveIntegerField(default=0)
+
+    # * Зерно раздачи: колода комнаты воспроизводится из него и каталога (plan_game_content), перезапуск меняет его
+    seed = models.PositiveBigIntegerField(null=True, blank=True)
+    # * Колода: id каталога по местам, листы персонажей собираются из нее при чтении (services.sheets)
+    deck = models.JSONField(null=True, blank=True)
+    # * Колода из пула (True) или разыграна при создании, потому что в пуле не было (False); None - пул выключен.
+    # * Из этого считается доля попаданий пула (deck_pool.pool_stats)
+    pool_hit = models.BooleanField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -35,6 +46,10 @@ class Player(models.Model):
     is_alive = models.BooleanField(default=True)
     is_host = models.BooleanField(default=False)
 
+    # * Битовые маски листа из колоды комнаты: открытые слоты характеристик и использованные карты
+    revealed = models.PositiveIntegerField(default=0)
+    cards_used = models.PositiveSmallIntegerField(default=0)
+
     device_id = models.CharField(max_length=64) # ^ Get from frontend
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -83,33 +98,6 @@ class Trait(models.Model):
         return f"{self.description}"
     
 
-class AssignedTrait(models.Model):
-    """Модель для карточки, которая прикреплена к игроку"""
-    player = models.ForeignKey(
-        Player,
-        on_delete=models.CASCADE,
-        related_name='player_traits'
-    )
-
-    trait_type = models.CharField(
-        max_length=16,
-        choices=TraitType.choices
-    )
-
-    description = models.TextField()
-
-    is_revealed = models.BooleanField(default=False)
-
-    class Meta:
-        ordering = ["trait_type"]
-        verbose_name = "Назначенная характеристика"
-        verbose_name_plural = "Назначенные характеристики"
-
-
-    def __str__(self):
-        return f"{self.player} - {self.description}"
-    
-
 class ActionCard(models.Model):
     description = models.TextField()
 
@@ -132,27 +120,6 @@ class ReactionCard(models.Model):
         return f"Reaction: {self.description}"
 
 
-class AssignedActionCard(models.Model):
-    player = models.OneToOneField(
-        Player,
-        on_delete=models.CASCADE,
-        related_name='action_card'
-    )
-    card = models.ForeignKey(ActionCard, on_delete=models.CASCADE)
-    description = models.TextField()
-    is_used = models.BooleanField(default=False)
-
-
-class AssignedReactionCard(models.Model):
-    player = models.OneToOneField(
-        Player,
-        on_delete=models.CASCADE,
-        related_name='reaction_card'
-    )
-    card = models.ForeignKey(ReactionCard, on_delete=models.CASCADE)
-    description = models.TextField()
-    is_used = models.BooleanField(default=False)
-    
 # &
 
 class ShelterDescription(models.Model):
@@ -211,3 +178,88 @@ class RoomCatastrophe(models.Model):
     def __str__(self):
         return f"{self.room.code} - {self.catastrophe.title}"
 
+
+
+# & Журнал изменений комнаты
+
+class ChangeKind(models.TextChoices):
+    ROOM = 'room', 'Комната'
+    PLAYER = 'player', 'Игрок'
+    TRAIT = 'trait', 'Характеристика'
+    ACTION_CARD = 'action_card', 'Карта действия'
+    REACTION_CARD = 'reaction_card', 'Карта реакции'
+    RESET = 'reset', 'Перезапуск'
+
+
+class RoomChange(models.Model):
+    """Компактная запись журнала: что изменилось в комнате на данной ревизии"""
+    room = models.ForeignKey(
+        Room,
+        on_delete=models.CASCADE,
+        related_name='changes'
+    )
+
+    revision = models.PositiveIntegerField()
+
+    kind = models.CharField(
+        max_length=16,
+        choices=ChangeKind.choices
+    )
+
+    object_id = models.PositiveBigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['room', 'revision'])]
+
+    def __str__(self):
+        return f"{self.room_id}@{self.revision}: {self.kind} {self.object_id}"
+
+
+class RoomCodeSequence(models.Model):
+    """Счетчик блоков для выдачи кодов комнат (одна строка, блоки раздаются процессам целиком)"""
+    next_block = models.PositiveBigIntegerField(default=0)
+
+
+class PreparedDeck(models.Model):
+    """Заранее разыгранная колода комнаты (зерно + id контента), забирается при создании комнаты с теми же параметрами"""
+    players_count = models.PositiveSmallIntegerField()
+    difficulty = models.PositiveSmallIntegerField()
+    balance = models.PositiveSmallIntegerField()
+    severity = models.PositiveSmallIntegerField()
+
+    payload = models.JSONField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["players_count", "difficulty", "balance", "severity"]),
+        ]
+
+
+class ArchivedGame(models.Model):
+    """Завершенная / брошенная комната целиком в одном JSON-документе (manage.py archive_rooms)"""
+    code = models.CharField(max_length=6)
+
+    players_count = models.PositiveSmallIntegerField()
+    difficulty = models.PositiveSmallIntegerField()
+    balance = models.PositiveSmallIntegerField()
+    severity = models.PositiveSmallIntegerField()
+
+    # Время жизни исходной комнаты
+    created_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+
+    document = models.JSONField()
+
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"]),
+        ]
+        verbose_name = "Архивная игра"
+        verbose_name_plural = "Архивные игры"
+
+    def __str__(self):
+        return f"Archived {self.code} ({self.created_at:%Y-%m-%d})"
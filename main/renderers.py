@@ -0,0 +1,55 @@
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:  # Optional dependency: без него FastJSONRenderer рендерит как обычный JSONRenderer
+    import orjson
+except ImportError:
+    orjson = None
+
+try:  # Optional dependency, needed only for Accept: application/msgpack
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+_encoder = JSONEncoder()
+
+
+def _default(value):
+    """Types orjson doesn't know (Decimal, lazy strings, querysets...) go through DRF's encoder"""
+    return _encoder.default(value)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer on orjson when it's installed
+    - Same compact UTF-8 JSON as DRF, several times faster on trait-heavy rooms
+    - Indented output (browsable API, ?indent) is left to DRF
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if self.get_indent(accepted_media_type or "", renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return orjson.dumps(data, default=_default)
+
+
+class MsgPackRenderer(BaseRenderer):
+    """Binary msgpack, chosen by `Accept: application/msgpack`"""
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if msgpack is None:
+            raise ImproperlyConfigured("MsgPackRenderer requires the msgpack package")
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
@@ -2,49 +2,46 @@ from rest_framework import serializers
 from .models import (
     Room,
     Player,
-    AssignedTrait,
     Shelter,
     RoomCatastrophe,
     Catastrophe,
-    AssignedActionCard,
-    AssignedReactionCard,
 )
+from .services.catalog import get_catalog
+from .services.sheets import sheet_traits, sheet_card
 
 
-class AssignedTraitSerializer(serializers.ModelSerializer):
-    trait_type_display = serializers.CharField(
-        source="get_trait_type_display", read_only=True
-    )
-
-    class Meta:
-        model = AssignedTrait
-        fields = (
-            "pk",
-            "trait_type",
-            "trait_type_display",
-            "description",
-            "is_revealed",
-        )
-
-
-class AssignedActionCardSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = AssignedActionCard
-        fields = ("pk", "description", "is_used")
-
-
-class AssignedReactionCardSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = AssignedReactionCard
-        fields = ("pk", "description", "is_used")
+def context_catalog(serializer):
+    """Catalog snapshot shared by the whole serialization (one version check instead of one per row)"""
+    context = serializer.context
+    if "catalog" not in context:
+        context["catalog"] = get_catalog()
+    return context["catalog"]
 
 
 class PlayerSerializer(serializers.ModelSerializer):
-    player_traits = AssignedTraitSerializer(many=True, read_only=True)
-    action_card = AssignedActionCardSerializer(read_only=True)
-    reaction_card = AssignedReactionCardSerializer(read_only=True)
+    """Sheet fields are built from the room's deck and the player's masks (player.room must be loaded)"""
+    player_traits = serializers.SerializerMethodField()
+    action_card = serializers.SerializerMethodField()
+    reaction_card = serializers.SerializerMethodField()
+
+    def get_player_traits(self, obj):
+        return sheet_traits(context_catalog(self), obj.room.deck, obj.pk, obj.seat, obj.revealed)
+
+    def get_action_card(self, obj):
+        return sheet_card(context_catalog(self), obj.room.deck, "action_card", obj.pk, obj.seat, obj.cards_used)
+
+    def get_reaction_card(self, obj):
+        return sheet_card(context_catalog(self), obj.room.deck, "reaction_card", obj.pk, obj.seat, obj.cards_used)
+
+    def update(self, instance, validated_data):
+        """
+        Writes only the fields of the request: masks and is_alive change with conditional UPDATEs
+        (services.transitions), a full save of an instance loaded before them would roll them back
+        """
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
 
     class Meta:
         model = Player
@@ -137,3 +134,49 @@ class RoomCreateSerializer(serializers.ModelSerializer):
             if not 1 <= attrs[field] <= 5:
                 raise serializers.ValidationError(f"{field} must be between 1 and 5.")
         return attrs
+
+
+# & Дельта-ответы (?since=revision)
+
+
+class RoomStateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Room
+        fields = (
+            "code",
+            "players_count",
+            "difficulty",
+            "balance",
+            "severity",
+            "is_playing",
+        )
+
+
+class PlayerStateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Player
+        fields = (
+            "id",
+            "seat",
+            "device_id",
+            "is_host",
+            "is_alive",
+            "nickname",
+        )
+
+
+# & Пакет действий (rooms/<code>/actions/)
+
+
+# * Верхняя граница пакета, чтобы IN (...) оставался в пределах лимитов параметров БД
+MAX_BATCH_ACTIONS = 100
+
+
+class RoomActionSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=("reveal", "kill", "use_action_card", "use_reaction_card"))
+    id = serializers.IntegerField(min_value=1)
+
+
+class RoomActionsSerializer(serializers.Serializer):
+    device_id = serializers.CharField()
+    actions = RoomActionSerializer(many=True, allow_empty=False, max_length=MAX_BATCH_ACTIONS)
@@ -0,0 +1,189 @@
+import json
+import logging
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from main.models import Room, Player, ArchivedGame, Trait
+from main.services.catalog import get_catalog
+from main.services.reaper import delete_rooms
+from main.services.sheets import SLOT_TYPES, SLOT_ORDER, CARD_FIELDS, text_of
+
+
+logger = logging.getLogger(__name__)
+
+
+# * Комната уходит в архив, если в ней ничего не менялось столько часов (раньше, чем ее удалит reaper)
+ARCHIVE_IDLE_HOURS = 12
+ARCHIVE_CHUNK_SIZE = 200
+ARCHIVE_DOCUMENT_VERSION = 2
+
+
+class ArchiveReport(NamedTuple):
+    rooms: int
+    archived: int
+    discarded: int  # Комнаты, в которых никого нет - удаляются без документа
+    rows: int
+
+
+def _reference(catalog, model, ref):
+    """Deck entry as (catalog id | None, text): the deck keeps texts of rows deleted from the catalog"""
+    return None if isinstance(ref, str) else ref, text_of(catalog, model, ref)
+
+
+def sheet_document(catalog, sheet, revealed, cards_used):
+    """A player's sheet from the room's deck and the player's masks, with texts, in the archive's list form"""
+    traits = [
+        [SLOT_TYPES[slot], *_reference(catalog, Trait, sheet["traits"][slot - 1]), bool(revealed & 1 << slot)]
+        for slot in SLOT_ORDER
+        if slot != 0 and sheet["traits"][slot - 1] is not None
+    ]
+    cards = {
+        field: None if sheet[field] is None else [*_reference(catalog, model, sheet[field]), bool(cards_used & bit)]
+        for field, (model, bit) in CARD_FIELDS.items()
+    }
+    return {"bio": [sheet["bio"], bool(revealed & 1)], "traits": traits, **cards}
+
+
+def game_documents(room_ids):
+    """
+    One archive record per room with somebody still seated, 2 queries for the whole chunk
+    - Every seat is archived, "seated" is False for seats left empty or whose player left mid-game
+    - The document outlives the catalog: content keeps its catalog id (None for rows already deleted) and its text
+    - {"code", "players_count", "difficulty", "balance", "severity", "created_at", "finished_at",
+      "game": {"version", "seed", "revision", "is_playing",
+      "shelter": {"capacity", "description_id", "description"}, "catastrophe": {"id", "title", "description"},
+      "players": [{"seat", "nickname", "is_host", "is_alive", "seated", "bio": [text, revealed],
+      "traits": [[type, trait id, text, revealed]], "action_card": [card id, text, used] | None,
+      "reaction_card": ...}]}}
+    """
+    catalog = get_catalog()
+    seats = {}
+    occupied = set()
+    for player in (
+        Player.objects
+        .filter(room_id__in=room_ids)
+        .order_by("room_id", "seat")
+        .values("room_id", "seat", "nickname", "is_host", "is_alive", "device_id", "revealed", "cards_used")
+        .iterator()
+    ):
+        room_id = player.pop("room_id")
+        player["seated"] = bool(player.pop("device_id"))
+        if player["seated"]:
+            occupied.add(room_id)
+        seats.setdefault(room_id, []).append(player)
+
+    records = []
+    for room in (
+        Room.objects
+        .filter(pk__in=list(occupied))
+        .order_by("pk")
+        .values(
+            "pk", "code", "players_count", "difficulty", "balance", "severity", "seed", "revision", "is_playing",
+            "deck", "created_at", "updated_at", "shelter__capacity", "shelter__description_id",
+            "shelter__description__description", "room_catastrophe__catastrophe_id",
+            "room_catastrophe__catastrophe__title", "room_catastrophe__catastrophe__description",
+        )
+    ):
+        players = seats[room["pk"]]
+        for player in players:
+            revealed, cards_used = player.pop("revealed"), player.pop("cards_used")
+            if room["deck"]:
+                sheet = room["deck"]["seats"][player["seat"] - 1]
+                player.update(sheet_document(catalog, sheet, revealed, cards_used))
+            else:
+                player.update(bio=None, traits=[], action_card=None, reaction_card=None)
+
+        records.append({
+            "code": room["code"],
+            "players_count": room["players_count"],
+            "difficulty": room["difficulty"],
+            "balance": room["balance"],
+            "severity": room["severity"],
+            "created_at": room["created_at"],
+            "finished_at": room["updated_at"],
+            "game": {
+                "version": ARCHIVE_DOCUMENT_VERSION,
+                "seed": room["seed"],
+                "revision": room["revision"],
+                "is_playing": room["is_playing"],
+                "shelter": {
+                    "capacity": room["shelter__capacity"],
+                    "description_id": room["shelter__description_id"],
+                    "description": room["shelter__description__description"],
+                },
+                "catastrophe": {
+                    "id": room["room_catastrophe__catastrophe_id"],
+                    "title": room["room_catastrophe__catastrophe__title"],
+                    "description": room["room_catastrophe__catastrophe__description"],
+                },
+                "players": players,
+            },
+        })
+    return records
+
+
+def write_table(records):
+    ArchivedGame.objects.bulk_create([
+        ArchivedGame(
+            document=record["game"],
+            **{field: value for field, value in record.items() if field != "game"},
+        )
+        for record in records
+    ])
+
+
+def jsonl_writer(stream):
+    """Sink that appends records to a text stream as JSON lines (dates in ISO format)"""
+    def write(records):
+        for record in records:
+            stream.write(json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":")))
+            stream.write("\n")
+        stream.flush()
+
+    return write
+
+
+def archive_idle_rooms(idle=timedelta(hours=ARCHIVE_IDLE_HOURS), chunk_size=ARCHIVE_CHUNK_SIZE,
+                       max_chunks=None, write=write_table):
+    """
+    Moves rooms idle for longer than `idle` out of the live tables, one transaction per chunk
+    - Records go to ArchivedGame by default, `write` (e.g. jsonl_writer) sends them elsewhere
+    - Originals are deleted with delete_rooms in the same transaction as the archive rows
+    - Rooms are locked with SKIP LOCKED: a room that is being changed right now waits for the next run
+    - Outside sinks are written before the commit, so a failed chunk can leave records of rooms that stay live
+    """
+    cutoff = timezone.now() - idle
+    rooms = archived = rows = 0
+    chunks = 0
+
+    while max_chunks is None or chunks < max_chunks:
+        with transaction.atomic():
+            room_ids = list(
+                Room.objects
+                .select_for_update(skip_locked=True)
+                .filter(updated_at__lt=cutoff)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:chunk_size]
+            )
+            if not room_ids:
+                break
+
+            records = game_documents(room_ids)
+            write(records)
+            rows += sum(delete_rooms(room_ids).values())
+
+        rooms += len(room_ids)
+        archived += len(records)
+        chunks += 1
+
+    report = ArchiveReport(rooms=rooms, archived=archived, discarded=rooms - archived, rows=rows)
+    if rooms:
+        logger.info(
+            "Archived %s rooms (%s without players discarded, %s live rows deleted)",
+            report.archived, report.discarded, report.rows,
+        )
+    return report
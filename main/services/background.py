@@ -0,0 +1,27 @@
+from django.conf import settings
+
+
+def start_background_jobs():
+    """
+    Starts the in-process periodic jobs enabled in settings (stale room reaper, deck pool filler,
+    read replica health checks)
+    - Called from the server entrypoints (config/asgi.py, config/wsgi.py), so migrate, shell, tests
+      and other management commands never run them
+    - Without a server process the same jobs run as `manage.py reap_rooms --every` / `fill_deck_pool --every`
+    """
+    interval = getattr(settings, "ROOM_REAPER_INTERVAL", None)
+    if interval:
+        from main.services.reaper import start_reaper
+
+        start_reaper(interval)
+
+    interval = getattr(settings, "ROOM_DECK_POOL_INTERVAL", None)
+    if interval and getattr(settings, "ROOM_DECK_POOL", False):
+        from main.services.deck_pool import start_deck_filler
+
+        start_deck_filler(interval)
+
+    if getattr(settings, "READ_REPLICAS", None):
+        from main.db_router import start_replica_monitor, READ_REPLICA_CHECK_INTERVAL
+
+        start_replica_monitor(getattr(settings, "READ_REPLICA_CHECK_INTERVAL", READ_REPLICA_CHECK_INTERVAL))
@@ -1,7 +1,7 @@
 import random
 
 
-def generate_bio():
+def generate_bio(rng=random):
     age_ranges = [
         (14, 19),
         (20, 29),
@@ -13,16 +13,16 @@ def generate_bio():
     ]
     weights = [5, 15, 35, 15, 10, 10, 10]
 
-    selected_range = random.choices(age_ranges, weights=weights, k=1)[0]
-    age = random.randint(selected_range[0], selected_range[1])
+    selected_range = rng.choices(age_ranges, weights=weights, k=1)[0]
+    age = rng.randint(selected_range[0], selected_range[1])
 
-    gender = random.choices(
+    gender = rng.choices(
         population=['Мужчина', 'Женщина', 'Андрогин'],
         weights=[47.5, 47.5, 5],
         k=1
     )[0]
 
-    orientation = random.choices(
+    orientation = rng.choices(
         population=[
             'Гетеросексуал',
             'Гомосексуал',
@@ -0,0 +1,178 @@
+import hashlib
+import threading
+import time
+from bisect import bisect_right
+from typing import NamedTuple
+
+from django.core.cache import cache
+
+from main.models import Trait, ActionCard, ReactionCard, ShelterDescription, Catastrophe, TraitType
+
+
+# * Каталог статичного контента держится в памяти процесса и перечитывается только после
+# * изменений через админку (версия в кеше Django - общая для воркеров только с общим кешем, см. CACHES)
+# * или по истечении TTL
+CATALOG_TTL = 300
+CATALOG_VERSION_KEY = "main:catalog-version"
+
+
+class TraitRecord(NamedTuple):
+    id: int
+    trait_type: str
+    description: str
+    power: int
+
+
+class CardRecord(NamedTuple):
+    id: int
+    description: str
+
+
+class ShelterRecord(NamedTuple):
+    id: int
+    size: int
+    difficulty: int
+    description: str
+
+
+class CatastropheRecord(NamedTuple):
+    id: int
+    severity: int
+    title: str
+    description: str
+
+
+class Catalog:
+    """
+    Read-only snapshot of all static content
+    - Traits bucketed by type, sorted by power (with a parallel list of powers for bisect)
+    - Shelter descriptions bucketed by size, sorted by difficulty
+    - Catastrophes sorted by severity
+    - Ties are ordered by id, so a seeded draw picks the same content on every load
+    - fingerprint - hash of the content: equal in every worker that loaded the same rows
+    """
+
+    def __init__(self, traits, action_cards, reaction_cards, shelters, catastrophes):
+        self.fingerprint = hashlib.blake2b(
+            repr([sorted(records) for records in (traits, action_cards, reaction_cards, shelters, catastrophes)])
+            .encode(),
+            digest_size=8,
+        ).hexdigest()
+
+        self.traits = {t.id: t for t in traits}
+
+        self.traits_by_type = {
+            t_type: tuple(sorted((t for t in traits if t.trait_type == t_type), key=lambda t: (t.power, t.id)))
+            for t_type in TraitType.values
+        }
+        self.trait_powers_by_type = {
+            t_type: [t.power for t in pool] for t_type, pool in self.traits_by_type.items()
+        }
+
+        self.action_cards = tuple(sorted(action_cards))
+        self.reaction_cards = tuple(sorted(reaction_cards))
+        self.action_cards_by_id = {c.id: c for c in self.action_cards}
+        self.reaction_cards_by_id = {c.id: c for c in self.reaction_cards}
+
+        self.shelters_by_size = {}
+        for shelter in sorted(shelters, key=lambda s: (s.difficulty, s.id)):
+            self.shelters_by_size.setdefault(shelter.size, []).append(shelter)
+        self.shelters_by_size = {size: tuple(items) for size, items in self.shelters_by_size.items()}
+        self._shelter_difficulties = {
+            size: [s.difficulty for s in items] for size, items in self.shelters_by_size.items()
+        }
+
+        self.catastrophes = tuple(sorted(catastrophes, key=lambda c: (c.severity, c.id)))
+        self._catastrophe_severities = [c.severity for c in self.catastrophes]
+
+    def text_of(self, model, ref_id, override=None) -> str:
+        """
+        Text of an assignment: its own override, else the referenced catalog row
+        - A row missing from this snapshot (added after it was loaded) is read from the database
+        """
+        if override is not None:
+            return override
+        if ref_id is None:
+            return ""
+
+        records = {
+            Trait: self.traits,
+            ActionCard: self.action_cards_by_id,
+            ReactionCard: self.reaction_cards_by_id,
+        }[model]
+        record = records.get(ref_id)
+        if record is not None:
+            return record.description
+        return model.objects.filter(pk=ref_id).values_list("description", flat=True).first() or ""
+
+    def shelters_for(self, size: int, max_difficulty: int) -> tuple:
+        pool = self.shelters_by_size.get(size, ())
+        if not pool:
+            return ()
+        return pool[:bisect_right(self._shelter_difficulties[size], max_difficulty)]
+
+    def catastrophes_for(self, max_severity: int) -> tuple:
+        return self.catastrophes[:bisect_right(self._catastrophe_severities, max_severity)]
+
+
+_lock = threading.Lock()
+_catalog = None
+_catalog_version = None
+_loaded_at = 0.0
+
+
+def load_catalog() -> Catalog:
+    """Reads every content table once and packs it into compact records"""
+    return Catalog(
+        traits=[
+            TraitRecord(*row)
+            for row in Trait.objects.values_list("id", "trait_type", "description", "power")
+        ],
+        action_cards=[CardRecord(*row) for row in ActionCard.objects.values_list("id", "description")],
+        reaction_cards=[CardRecord(*row) for row in ReactionCard.objects.values_list("id", "description")],
+        shelters=[
+            ShelterRecord(*row)
+            for row in ShelterDescription.objects.values_list("id", "size", "difficulty", "description")
+        ],
+        catastrophes=[
+            CatastropheRecord(*row)
+            for row in Catastrophe.objects.values_list("id", "severity", "title", "description")
+        ],
+    )
+
+
+def get_catalog() -> Catalog:
+    global _catalog, _catalog_version, _loaded_at
+
+    version = cache.get(CATALOG_VERSION_KEY, 0)
+    catalog = _catalog
+    if catalog is not None and _catalog_version == version and time.monotonic() - _loaded_at < CATALOG_TTL:
+        return catalog
+
+    with _lock:
+        if _catalog is None or _catalog_version != version or time.monotonic() - _loaded_at >= CATALOG_TTL:
+            _catalog = load_catalog()
+            _catalog_version = version
+            _loaded_at = time.monotonic()
+        return _catalog
+
+
+def catalog_fingerprint():
+    """
+    Content hash of the current catalog: rendered room bodies and ETags depend on it
+    - Unlike the version key it needs no shared cache: workers that reloaded the same rows agree on it
+    """
+    return get_catalog().fingerprint
+
+
+def invalidate_catalog():
+    """Drops the local snapshot and bumps the cached version (other workers see it only with a shared cache)"""
+    global _catalog
+
+    with _lock:
+        _catalog = None
+
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
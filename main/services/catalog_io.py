@@ -0,0 +1,271 @@
+import csv
+import json
+from collections import Counter
+from typing import NamedTuple
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from main.models import Trait, ActionCard, ReactionCard, ShelterDescription, Catastrophe, TraitType
+from main.services.catalog import invalidate_catalog
+from main.services.deck_pool import drop_pool
+from main.services.response_cache import get_response_cache
+
+
+# * Импорт / экспорт всего каталога одним файлом: строка = запись, колонка kind - ее таблица
+# * Без id запись сопоставляется по тексту (natural), с --match id - по первичному ключу
+
+IMPORT_CHUNK_SIZE = 2000
+EXPORT_CHUNK_SIZE = 2000
+
+
+class CatalogKind(NamedTuple):
+    model: type
+    fields: tuple      # Колонки без id
+    natural_key: tuple  # Первое поле - для выборки существующих строк (IN)
+
+
+CATALOG_KINDS = {
+    "trait": CatalogKind(Trait, ("trait_type", "description", "power"), ("description", "trait_type")),
+    "action_card": CatalogKind(ActionCard, ("description",), ("description",)),
+    "reaction_card": CatalogKind(ReactionCard, ("description",), ("description",)),
+    "shelter": CatalogKind(ShelterDescription, ("size", "difficulty", "description"), ("description",)),
+    "catastrophe": CatalogKind(Catastrophe, ("severity", "title", "description"), ("title",)),
+}
+
+CSV_COLUMNS = ("kind", "id", "trait_type", "title", "description", "power", "size", "difficulty", "severity")
+
+# Допустимые диапазоны числовых полей (включительно)
+RANGES = {"power": (-10, 10), "size": (1, 3), "difficulty": (1, 5), "severity": (1, 5)}
+TEXT_FIELDS = ("trait_type", "title", "description")
+
+
+class CatalogImportError(ValueError):
+    """Invalid input rows, `errors` is a list of (line, message)"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid rows, first: line {errors[0][0]}: {errors[0][1]}")
+
+
+class ImportReport(NamedTuple):
+    created: dict
+    updated: dict
+    unchanged: dict
+    skipped: int
+
+
+def catalog_changed():
+    """
+    Static content changed: drop cached catalogs everywhere and the decks drawn from the old one
+    - Rendered room bodies of other workers become unreachable with the catalog fingerprint once they reload it,
+      local ones are freed here
+    """
+    invalidate_catalog()
+    drop_pool()
+    get_response_cache().clear()
+
+
+# & Чтение
+
+
+def _integer(field, value):
+    """int from an integer or its decimal string; floats (1.5 - and 2.0 too) and booleans are rejected"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    raise ValueError(f"{field} must be an integer, got {value!r}")
+
+
+def read_rows(stream, fmt):
+    """Yields (line number, dict of raw values) from a CSV (with header) or JSONL text stream"""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if value not in ("", None)}
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield line_number, error
+            continue
+        yield line_number, row if isinstance(row, dict) else ValueError("Expected a JSON object")
+
+
+def clean_row(raw, match):
+    """Raw values -> (kind, id or None, {field: value}), ValueError with a readable message when invalid"""
+    if isinstance(raw, Exception):
+        raise ValueError(str(raw))
+
+    kind = raw.get("kind")
+    if kind not in CATALOG_KINDS:
+        raise ValueError(f"Unknown kind {kind!r}, expected one of: {', '.join(CATALOG_KINDS)}")
+    spec = CATALOG_KINDS[kind]
+
+    pk = raw.get("id")
+    if pk is not None:
+        pk = _integer("id", pk)
+        if pk < 1:
+            raise ValueError(f"id must be positive, got {pk}")
+    elif match == "id":
+        raise ValueError("id is required with --match id")
+
+    values = {}
+    for field in spec.fields:
+        value = raw.get(field)
+        if value is None:
+            raise ValueError(f"{field} is required for {kind}")
+
+        if field in RANGES:
+            low, high = RANGES[field]
+            value = _integer(field, value)
+            if not low <= value <= high:
+                raise ValueError(f"{field} must be within {low}..{high}, got {value}")
+        elif field in TEXT_FIELDS:
+            value = str(value).strip()
+            if not value:
+                raise ValueError(f"{field} must not be empty")
+
+        values[field] = value
+
+    if kind == "trait" and values["trait_type"] not in TraitType.values:
+        raise ValueError(f"Unknown trait_type {values['trait_type']!r}")
+
+    return kind, pk, values
+
+
+# & Импорт
+
+
+def _upsert_chunk(kind, rows, match, report):
+    """
+    rows: {key: (pk, values)} of one kind - one SELECT for the existing rows, then bulk_create / bulk_update
+    - Rows that already hold the same values are not written
+    """
+    spec = CATALOG_KINDS[kind]
+    model = spec.model
+
+    if match == "id":
+        existing = model.objects.in_bulk([pk for pk, _ in rows.values()])
+        found = {key: existing.get(pk) for key, (pk, _) in rows.items()}
+    else:
+        lookup = {f"{spec.natural_key[0]}__in": {values[spec.natural_key[0]] for _, values in rows.values()}}
+        existing = {
+            tuple(getattr(obj, field) for field in spec.natural_key): obj
+            for obj in model.objects.filter(**lookup).order_by("-pk")  # Дубли в базе: обновляется самый ранний
+        }
+        found = {key: existing.get(key) for key in rows}
+
+    to_create = []
+    to_update = []
+    for key, (pk, values) in rows.items():
+        obj = found[key]
+        if obj is None:
+            # С --match id неизвестный id создается с этим же ключом: повторный импорт того же файла ничего не меняет,
+            # а колоды, ссылающиеся на id, остаются верными (последовательность сдвигается в import_catalog)
+            to_create.append(model(pk=pk, **values) if match == "id" else model(**values))
+        elif any(getattr(obj, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(obj, field, value)
+            to_update.append(obj)
+        else:
+            report["unchanged"][kind] += 1
+
+    model.objects.bulk_create(to_create, batch_size=IMPORT_CHUNK_SIZE)
+    model.objects.bulk_update(to_update, spec.fields, batch_size=500)
+    report["created"][kind] += len(to_create)
+    report["updated"][kind] += len(to_update)
+
+
+def _reset_sequences(models):
+    """Moves id sequences past rows inserted with explicit ids (no-op where the backend tracks it itself)"""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def import_catalog(stream, fmt="csv", match="natural", chunk_size=IMPORT_CHUNK_SIZE, skip_invalid=False):
+    """
+    Streams a catalog file into the database with upserts, chunk by chunk, in one transaction
+    - match="natural": rows are matched by text (trait: description + type, cards / shelters: description,
+      catastrophes: title); match="id": by primary key, unknown ids are created with that same id
+    - Invalid rows abort the whole import (CatalogImportError) unless skip_invalid
+    - Cached catalogs and the deck pool are dropped after the commit
+    """
+    report = {"created": Counter(), "updated": Counter(), "unchanged": Counter()}
+    errors = []
+    pending = {kind: {} for kind in CATALOG_KINDS}
+
+    with transaction.atomic():
+        for line, raw in read_rows(stream, fmt):
+            try:
+                kind, pk, values = clean_row(raw, match)
+            except ValueError as error:
+                errors.append((line, str(error)))
+                continue
+
+            key = pk if match == "id" else tuple(values[field] for field in CATALOG_KINDS[kind].natural_key)
+            # Повтор ключа во входных данных: побеждает последняя строка
+            pending[kind][key] = (pk, values)
+
+            if len(pending[kind]) >= chunk_size:
+                # После первой ошибки импорт все равно откатится - дальше только проверка строк
+                if not errors or skip_invalid:
+                    _upsert_chunk(kind, pending[kind], match, report)
+                pending[kind] = {}
+
+        if errors and not skip_invalid:
+            raise CatalogImportError(errors)
+
+        for kind, rows in pending.items():
+            if rows:
+                _upsert_chunk(kind, rows, match, report)
+
+        # Унарный плюс убирает нулевые счетчики (чанки без изменений)
+        created, updated, unchanged = +report["created"], +report["updated"], +report["unchanged"]
+        if match == "id" and created:
+            _reset_sequences([CATALOG_KINDS[kind].model for kind in created])
+        if created or updated:
+            transaction.on_commit(catalog_changed)
+
+    return ImportReport(created=dict(created), updated=dict(updated), unchanged=dict(unchanged), skipped=len(errors))
+
+
+# & Экспорт
+
+
+def iter_catalog(kinds=tuple(CATALOG_KINDS), chunk_size=EXPORT_CHUNK_SIZE):
+    """Yields every catalog row as a dict with kind and id, streamed with iterator()"""
+    for kind in kinds:
+        spec = CATALOG_KINDS[kind]
+        for row in spec.model.objects.order_by("pk").values("id", *spec.fields).iterator(chunk_size=chunk_size):
+            yield {"kind": kind, **row}
+
+
+def export_catalog(stream, fmt="csv", kinds=tuple(CATALOG_KINDS)):
+    """Writes the catalog to a text stream as CSV (one header for all kinds) or JSONL, returns rows per kind"""
+    written = Counter()
+
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for row in iter_catalog(kinds):
+            writer.writerow(row)
+            written[row["kind"]] += 1
+    else:
+        for row in iter_catalog(kinds):
+            stream.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+            stream.write("\n")
+            written[row["kind"]] += 1
+
+    return dict(written)
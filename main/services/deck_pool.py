@@ -0,0 +1,151 @@
+import logging
+import threading
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from main.models import Room, PreparedDeck
+from main.services.catalog import get_catalog
+from main.services.draw_content import DeckKey, plan_game_content
+
+
+logger = logging.getLogger(__name__)
+
+
+# * Пул заранее разыгранных колод: создание комнаты забирает готовую вместо розыгрыша
+DECK_POOL_PER_KEY = 5
+# * Пополняются параметры, с которыми комнаты создавались за это окно
+DECK_POOL_DEMAND_WINDOW = timedelta(days=1)
+DECK_POOL_MAX_KEYS = 50
+# * Попадания / промахи считаются по комнатам, созданным за это окно (раньше, чем их заберет архив)
+DECK_POOL_STATS_WINDOW = timedelta(hours=1)
+
+
+class PoolStats(NamedTuple):
+    hits: int
+    misses: int
+    decks: int
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def claim_deck(key):
+    """
+    Takes one prepared deck for the key or returns None (the room records the hit / miss, see draw_game_content)
+    - SKIP LOCKED: concurrent creations never wait on each other and never get the same deck
+    - Must run inside the transaction that creates the room
+    """
+    deck = (
+        PreparedDeck.objects
+        .select_for_update(skip_locked=True)
+        .filter(**key._asdict())
+        .order_by("pk")
+        .values_list("pk", "payload")
+        .first()
+    )
+
+    if deck is None:
+        return None
+
+    PreparedDeck.objects.filter(pk=deck[0]).delete()
+    return deck[1]
+
+
+def demanded_keys(window=DECK_POOL_DEMAND_WINDOW, limit=DECK_POOL_MAX_KEYS):
+    """Most used room parameters of the recent window, most popular first"""
+    rows = (
+        Room.objects
+        .filter(created_at__gte=timezone.now() - window)
+        .values("players_count", "difficulty", "balance", "severity")
+        .annotate(rooms=Count("pk"))
+        .order_by("-rooms")[:limit]
+    )
+    return [DeckKey(row["players_count"], row["difficulty"], row["balance"], row["severity"]) for row in rows]
+
+
+def fill_pool(keys, per_key=DECK_POOL_PER_KEY):
+    """Tops every key up to per_key decks, returns {key: decks added}"""
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+
+    catalog = get_catalog()
+
+    existing = {}
+    for row in (
+        PreparedDeck.objects
+        .values("players_count", "difficulty", "balance", "severity")
+        .annotate(decks=Count("pk"))
+    ):
+        existing[DeckKey(row["players_count"], row["difficulty"], row["balance"], row["severity"])] = row["decks"]
+
+    added = {}
+    decks = []
+    for key in keys:
+        missing = per_key - existing.get(key, 0)
+        if missing <= 0:
+            continue
+
+        decks.extend(
+            PreparedDeck(payload=plan_game_content(key, catalog), **key._asdict())
+            for _ in range(missing)
+        )
+        added[key] = missing
+
+    PreparedDeck.objects.bulk_create(decks, batch_size=100)
+    return added
+
+
+def drop_pool():
+    """
+    Decks hold catalog ids and texts - they are discarded whenever the catalog changes
+    - PreparedDeck has no relations and no delete signals, so delete() is a single DELETE without collecting rows
+    """
+    PreparedDeck.objects.all().delete()
+
+
+def pool_stats(window=DECK_POOL_STATS_WINDOW):
+    """Hits / misses of rooms created within the window (stored on the rooms, so shared by every process)"""
+    counts = Room.objects.filter(created_at__gte=timezone.now() - window).aggregate(
+        hits=Count("pk", filter=Q(pool_hit=True)),
+        misses=Count("pk", filter=Q(pool_hit=False)),
+    )
+    return PoolStats(hits=counts["hits"], misses=counts["misses"], decks=PreparedDeck.objects.count())
+
+
+_filler = None
+_filler_lock = threading.Lock()
+
+
+def start_deck_filler(interval_seconds, per_key=DECK_POOL_PER_KEY):
+    """Refills the pool for demanded keys every interval in a daemon thread (once per process)"""
+    global _filler
+
+    with _filler_lock:
+        if _filler is not None:
+            return _filler
+
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval_seconds):
+                try:
+                    with transaction.atomic():
+                        added = fill_pool(demanded_keys(), per_key)
+                    if added:
+                        logger.info("Deck pool refilled: %s decks for %s keys", sum(added.values()), len(added))
+                except Exception:
+                    logger.exception("Deck pool filler failed")
+                finally:
+                    connection.close()
+
+        _filler = threading.Thread(target=run, name="deck-pool-filler", daemon=True)
+        _filler.stop = stop
+        _filler.start()
+        return _filler
@@ -1,10 +1,22 @@
+import logging
 import random
-from django.utils import timezone
+from typing import NamedTuple
 
-from main.models import Player, Trait, AssignedTrait, Shelter, ShelterDescription, RoomCatastrophe, Catastrophe, TraitType, ActionCard, ReactionCard, AssignedActionCard, AssignedReactionCard
+from django.conf import settings
+from django.db import transaction
+
+from main.models import Room, Player, Shelter, RoomCatastrophe
 
 from main.services.bio_gen import generate_bio
+from main.services.catalog import get_catalog
+from main.services.trait_solver import balance_traits
+from main.services import room_balancer
 from main.services.shelter import calculate_shelter_size, calculate_shelter_cap
+from main.services.sheets import TRAIT_TYPES, deck_of, dealt_masks
+from main.utils import QueryCounter
+
+
+logger = logging.getLogger(__name__)
 
 
 # * Суммарная сила персонажей +- разброс - таблицы от уровня сложности и баланса
@@ -12,162 +24,243 @@ DIFFICULTY_TO_POWER = {1: 50, 2: 30, 3: 15, 4: 5, 5: -10}
 BALANCE_TO_DEV = {1: 25, 2: 20, 3: 15, 4: 10, 5: 5}
 
 
-def draw_player_cards(player):
-    all_action_cards = list(ActionCard.objects.all())
-    all_reaction_cards = list(ReactionCard.objects.all())
+class GenerationReport(NamedTuple):
+    players: int
+    rows: int
+    queries: int
+    duration_ms: float
+    source: str = "inline"  # inline | pool
+
 
-    if all_action_cards:
-        card = random.choice(all_action_cards)
-        AssignedActionCard.objects.create(player=player, description=card.description, card=card)
-    if all_reaction_cards:
-        card = random.choice(all_reaction_cards)
-        AssignedReactionCard.objects.create(player=player, description=card.description, card=card)
+class DeckKey(NamedTuple):
+    """Room parameters that fully define what gets drawn"""
+    players_count: int
+    difficulty: int
+    balance: int
+    severity: int
 
+    @classmethod
+    def of(cls, room):
+        return cls(room.players_count, room.difficulty, room.balance, room.severity)
 
-def draw_player_traits(player, difficulty, balance):
+
+def new_seed():
+    """Seed of a new deal (63 bits, fits a signed bigint column)"""
+    return random.getrandbits(63)
+
+
+def room_trait_sets(key, catalog, rng=random):
     """
-    Draws traits for a single player
-    - Always one trait per type
-    - Tries to keep total power around target +- dev
+    Traits of all seats at once (room_balancer) when ROOM_TRAIT_BALANCER = "room", None for per-seat balancing
+    - Falls back to per-seat balancing when NumPy isn't installed
     """
+    if getattr(settings, "ROOM_TRAIT_BALANCER", "seat") != "room":
+        return None
 
-    bio_data = generate_bio()
-    AssignedTrait.objects.create(
-        player=player,
-        trait_type=TraitType.BIO,
-        description=f"{bio_data['age']} лет, {bio_data['gender']}, {bio_data['orientation']}",
-        is_revealed=False
-    )
+    if room_balancer.np is None:
+        logger.warning("ROOM_TRAIT_BALANCER = 'room' requires numpy, balancing per seat")
+        return None
 
-    trait_types = [
-        TraitType.PROFESSION,
-        TraitType.HEALTH,
-        TraitType.HOBBY,
-        TraitType.FEAR,
-        TraitType.CHARACTER,
-        TraitType.BACKGROUND,
-        TraitType.KNOWLEDGE,
-        TraitType.ITEM,
-    ]
-
-    target = DIFFICULTY_TO_POWER[difficulty]
-    dev = BALANCE_TO_DEV[balance]
-
-    assigned_traits = []
-    assigned_power = 0
-
-    traits_by_type = {t: list(Trait.objects.filter(trait_type=t)) for t in trait_types}
-
-    for t_type in trait_types:
-        pool = traits_by_type[t_type]
-        if not pool:
-            continue
-
-        remaining_power = target - assigned_power
-
-        suitable = [tr for tr in pool if
-                    (remaining_power >= 0 and tr.power <= remaining_power + 5) or
-                    (remaining_power < 0 and tr.power >= remaining_power - 5)]
-
-        if not suitable:
-            suitable = pool
-
-        trait = random.choice(suitable)
-        assigned_traits.append(trait)
-        assigned_power += trait.power
-
-    all_non_bio_traits = list(Trait.objects.exclude(trait_type=TraitType.BIO))
-    random.shuffle(all_non_bio_traits)
-
-    adjustment_attempts = 0
-    while not (target - dev <= assigned_power <= target + dev) and adjustment_attempts < 20:
-        adjustment_attempts += 1
-        for trait in all_non_bio_traits:
-            if trait.trait_type in [t.trait_type for t in assigned_traits]:
-                continue
-
-            potential_power = assigned_power + trait.power
-            if abs(target - potential_power) < abs(target - assigned_power):
-                assigned_traits.append(trait)
-                assigned_power = potential_power
-                break
-        else:
-            break
-
-    for trait in assigned_traits:
-        AssignedTrait.objects.create(
-            player=player,
-            trait_type=trait.trait_type,
-            description=trait.description,
-            is_revealed=False
-        )
+    target = DIFFICULTY_TO_POWER[key.difficulty]
+    dev = BALANCE_TO_DEV[key.balance]
+    return room_balancer.balance_room(catalog, TRAIT_TYPES, key.players_count, target, dev, rng)
 
 
-def draw_game_content(room):
+def draw_seat(key, catalog, rng=random, traits=None):
     """
-    Случайно собирает подходящий контент для комантыЖ
-    - Игроки (персонажи и пустое место для подключения к ним)
-    - Био хар-ки, другие хар-ки
-    - Бункер
-    - Катастрфоа
+    One character sheet as catalog ids: {"bio": text, "traits": [trait id | None, ...], "action_card": id | None,
+    "reaction_card": id | None}
+    - Always one trait per type, in TRAIT_TYPES order (None when the catalog has none of the type)
+    - Keeps total power within target +- dev whenever the catalog allows it
+    - traits - already balanced for the whole room (room_trait_sets), otherwise balanced here
     """
+    action_card = rng.choice(catalog.action_cards).id if catalog.action_cards else None
+    reaction_card = rng.choice(catalog.reaction_cards).id if catalog.reaction_cards else None
 
-    players = []
+    bio_data = generate_bio(rng)
 
-    # ! Первый подключившийся игрок - всегда хост, подключение должно проихойти при создании комнаты
-    for seat in range(1, room.players_count + 1):
-        player = Player.objects.create(
-            room=room,
-            seat=seat,
-            is_host=(seat == 1),
-            device_id=""
-        )
-        players.append(player)
+    if traits is None:
+        target = DIFFICULTY_TO_POWER[key.difficulty]
+        dev = BALANCE_TO_DEV[key.balance]
+        traits = balance_traits(catalog, TRAIT_TYPES, target, dev, rng)
 
-    for player in players:
-        draw_player_cards(player)
-        draw_player_traits(player, room.difficulty, room.balance)
+    by_type = {trait.trait_type: trait.id for trait in traits}
+    return {
+        "bio": f"{bio_data['age']} лет, {bio_data['gender']}, {bio_data['orientation']}",
+        "traits": [by_type.get(t_type) for t_type in TRAIT_TYPES],
+        "action_card": action_card,
+        "reaction_card": reaction_card,
+    }
 
+
+def draw_setting(room, catalog, rng=random):
+    """Shelter (capacity, description) and catastrophe records for the room"""
     shelter_size = calculate_shelter_size(room.players_count)
     capacity = calculate_shelter_cap(room.players_count)
 
-    descriptions = list(
-        ShelterDescription.objects.filter(
-            size=shelter_size,
-            difficulty__lte=room.difficulty
-        )
-    )
+    descriptions = catalog.shelters_for(shelter_size, room.difficulty)
 
     if not descriptions:
         raise RuntimeError(
             f"No shelter descriptions for size={shelter_size}, difficulty≤{room.difficulty}"
         )
 
-    shelter_description = random.choice(descriptions)
+    catastrophes = catalog.catastrophes_for(room.severity)
+
+    if not catastrophes:
+        raise RuntimeError(
+            f"No catastrophes for severity≤{room.severity}"
+        )
+
+    return capacity, rng.choice(descriptions), rng.choice(catastrophes)
 
-    Shelter.objects.create(
-        room=room,
-        capacity=capacity,
-        description=shelter_description
+
+def deck_is_current(plan, catalog):
+    """False if the plan refers to content that is no longer in the catalog"""
+    return all(
+        all(trait_id is None or trait_id in catalog.traits for trait_id in sheet["traits"])
+        and sheet["action_card"] in (None, *catalog.action_cards_by_id)
+        and sheet["reaction_card"] in (None, *catalog.reaction_cards_by_id)
+        for sheet in plan["seats"]
     )
 
-    catastrophes = list(
-        Catastrophe.objects.filter(
-            severity__lte=room.severity
-        )
+
+def make_report(room, players, rows, counter, source="inline"):
+    report = GenerationReport(
+        players=players,
+        rows=rows,
+        queries=counter.count,
+        duration_ms=counter.duration_ms,
+        source=source,
+    )
+    logger.info(
+        "Generated content for room %s (%s): %s rows in %s queries, %.1f ms",
+        room.code, report.source, report.rows, report.queries, report.duration_ms,
     )
+    return report
 
-    if not catastrophes:
-        raise RuntimeError(
-            f"No catastrophes for severity≤{room.room_catastrophe}"
+
+def plan_game_content(key, catalog, seed=None):
+    """
+    Draws a whole room from a seed without touching the database: same seed, key and catalog - same deck
+    - Compact JSON: {"seed", "seats": [sheet of draw_seat, ...], "capacity", "shelter_description_id",
+      "catastrophe_id"}
+    - Drawn inline by draw_game_content or ahead of time for the deck pool
+    """
+    seed = new_seed() if seed is None else seed
+    rng = random.Random(seed)
+
+    trait_sets = room_trait_sets(key, catalog, rng) or [None] * key.players_count
+    seats = [draw_seat(key, catalog, rng, traits) for traits in trait_sets]
+    capacity, shelter_description, catastrophe = draw_setting(key, catalog, rng)
+
+    return {
+        "seed": seed,
+        "seats": seats,
+        "capacity": capacity,
+        "shelter_description_id": shelter_description.id,
+        "catastrophe_id": catastrophe.id,
+    }
+
+
+def materialize_game_content(room, plan):
+    """
+    Writes a plan: the room row with its seed and deck, one bulk_create of players, shelter and catastrophe
+    - Character sheets are not written anywhere else, they are read from the deck (services.sheets)
+    - An unsaved room is inserted, a saved one is updated
+    """
+    room.seed = plan["seed"]
+    room.deck = deck_of(plan)
+
+    # ! Первый подключившийся игрок - всегда хост, подключение должно проихойти при создании комнаты
+    players = []
+    for seat, sheet in enumerate(plan["seats"], 1):
+        revealed, cards_used = dealt_masks(sheet)
+        players.append(Player(
+            room=room, seat=seat, is_host=(seat == 1), device_id="", revealed=revealed, cards_used=cards_used,
+        ))
+
+    with transaction.atomic():
+        if room.pk is None:
+            room.save()
+        else:
+            Room.objects.filter(pk=room.pk).update(seed=room.seed, deck=room.deck)
+
+        Player.objects.bulk_create(players)
+
+        Shelter.objects.create(
+            room=room,
+            capacity=plan["capacity"],
+            description_id=plan["shelter_description_id"]
+        )
+        RoomCatastrophe.objects.create(
+            room=room,
+            catastrophe_id=plan["catastrophe_id"]
         )
 
-    catastrophe = random.choice(catastrophes)
+    return players
 
-    RoomCatastrophe.objects.create(
-        room=room,
-        catastrophe=catastrophe
-    )
 
-    room.started_at = timezone.now()
-    room.save()
+def draw_game_content(room, plan=None, pooled=False):
+    """
+    Случайно собирает подходящий контент для комнаты
+    - Игроки (персонажи и пустое место для подключения к ним)
+    - Колода: био хар-ки, другие хар-ки, карты (листы персонажей собираются из нее при чтении)
+    - Бункер
+    - Катастрофа
+
+    Колода разыгрывается из room.seed, комната может быть еще не сохранена - тогда она создается вместе с колодой
+    plan - заранее разыгранная колода из пула (см. deck_pool), ее зерно становится room.seed
+    pooled - колоду спрашивали у пула: комната запоминает попадание / промах (room.pool_hit)
+    Все строки собираются в памяти и пишутся bulk_create в одной транзакции
+    """
+
+    source = "pool" if plan is not None else "inline"
+
+    with QueryCounter() as counter:
+        catalog = get_catalog()
+
+        if plan is not None and not deck_is_current(plan, catalog):
+            # Контент колоды удалили из каталога после ее розыгрыша
+            logger.warning("Pooled deck for room %s refers to removed content, drawing inline", room.code)
+            plan, source = None, "inline"
+
+        if plan is None:
+            plan = plan_game_content(DeckKey.of(room), catalog, room.seed)
+        room.pool_hit = source == "pool" if pooled else None
+        players = materialize_game_content(room, plan)
+
+    return make_report(room, len(players), len(players) + 3, counter, source)
+
+
+def redraw_game_content(room):
+    """
+    Перераздача для перезапуска - новое зерно и колода в room (вызывающий код задает зерно и сохраняет seed и deck)
+    - Игроки (места, устройства, ники, хост) остаются как есть, их маски листа сбрасываются одним update
+    - Бункер и катастрофа меняются update-ом
+    Число запросов не зависит от размера комнаты
+    """
+
+    with QueryCounter() as counter:
+        catalog = get_catalog()
+        plan = plan_game_content(DeckKey.of(room), catalog, room.seed)
+        room.deck = deck_of(plan)
+
+        # Обычно у всех мест одни и те же начальные маски - тогда это один UPDATE на всю комнату
+        seats = {}
+        for seat, sheet in enumerate(plan["seats"], 1):
+            seats.setdefault(dealt_masks(sheet), []).append(seat)
+
+        with transaction.atomic():
+            for (revealed, cards_used), group in seats.items():
+                players = Player.objects.filter(room=room)
+                if len(seats) > 1:
+                    players = players.filter(seat__in=group)
+                players.update(is_alive=True, revealed=revealed, cards_used=cards_used)
+
+            Shelter.objects.filter(room=room).update(
+                capacity=plan["capacity"], description_id=plan["shelter_description_id"]
+            )
+            RoomCatastrophe.objects.filter(room=room).update(catastrophe_id=plan["catastrophe_id"])
+
+    return make_report(room, len(plan["seats"]), len(plan["seats"]) + 3, counter)
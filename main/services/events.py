@@ -0,0 +1,140 @@
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+# * Очередь одного подписчика - если клиент не успевает читать, лишние события отбрасываются,
+# * а пропуск он увидит по номеру ревизии и перезапросит комнату целиком
+SUBSCRIBER_QUEUE_SIZE = 256
+REDIS_CHANNEL_PREFIX = "room-events:"
+
+
+class RoomEventBroker:
+    """
+    In-process fan-out of room events to subscribed coroutines
+    - publish() is thread-safe and may be called from sync views
+    - subscribe() is an async iterator bound to the caller's event loop
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, room_code, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(room_code, ()))
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:
+                # Event loop of a finished subscriber is already closed
+                continue
+
+    @staticmethod
+    def _put(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    async def subscribe(self, room_code):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+
+        with self._lock:
+            self._subscribers.setdefault(room_code, set()).add(subscriber)
+
+        try:
+            while True:
+                yield await subscriber[1].get()
+        finally:
+            with self._lock:
+                room_subscribers = self._subscribers.get(room_code)
+                if room_subscribers is not None:
+                    room_subscribers.discard(subscriber)
+                    if not room_subscribers:
+                        del self._subscribers[room_code]
+
+    def subscriber_count(self, room_code):
+        with self._lock:
+            return len(self._subscribers.get(room_code, ()))
+
+
+class LocalEventBackend:
+    """Single-process backend: events go straight into the local broker (also used in tests)"""
+
+    def __init__(self, **options):
+        self.broker = RoomEventBroker()
+
+    def publish(self, room_code, event):
+        self.broker.publish(room_code, event)
+
+    def subscribe(self, room_code):
+        return self.broker.subscribe(room_code)
+
+
+class RedisEventBackend(LocalEventBackend):
+    """
+    Multi-worker backend over Redis pub/sub
+    - Every worker publishes to Redis
+    - One listener per worker relays messages from Redis into its local broker
+    """
+
+    def __init__(self, url="redis://localhost:6379/0", **options):
+        super().__init__(**options)
+
+        import redis  # Optional dependency, only needed for this backend
+        import redis.asyncio
+
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+        self._async_redis = redis.asyncio
+        self._listener = None
+
+    def publish(self, room_code, event):
+        self._client.publish(f"{REDIS_CHANNEL_PREFIX}{room_code}", json.dumps(event))
+
+    def subscribe(self, room_code):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return self.broker.subscribe(room_code)
+
+    async def _listen(self):
+        client = self._async_redis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.psubscribe(f"{REDIS_CHANNEL_PREFIX}*")
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                channel = message["channel"].decode().removeprefix(REDIS_CHANNEL_PREFIX)
+                self.broker.publish(channel, json.loads(message["data"]))
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_event_backend():
+    global _backend
+
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = getattr(settings, "ROOM_EVENTS", {})
+                backend_class = import_string(config.get("BACKEND", "main.services.events.LocalEventBackend"))
+                _backend = backend_class(**config.get("OPTIONS", {}))
+    return _backend
+
+
+def publish_room_event(room_code, event_type, **payload):
+    """Publishes an event to room subscribers once the current transaction commits"""
+    event = {"type": event_type, **payload}
+    transaction.on_commit(lambda: get_event_backend().publish(room_code, event))
@@ -0,0 +1,91 @@
+import threading
+from bisect import bisect_left
+
+
+# * Границы гистограммы задержек (секунды, как принято в Prometheus)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+METRIC_PREFIX = "shelter"
+
+
+class ViewMetrics:
+    __slots__ = ("buckets", "count", "latency_sum", "queries", "db_seconds", "statuses")
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.latency_sum = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statuses = {}
+
+
+class MetricsRegistry:
+    """In-memory per-view counters, rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, method, status_code, latency, queries, db_seconds):
+        bucket = bisect_left(LATENCY_BUCKETS, latency)
+
+        with self._lock:
+            metrics = self._views.get((view, method))
+            if metrics is None:
+                metrics = self._views[(view, method)] = ViewMetrics()
+
+            if bucket < len(LATENCY_BUCKETS):
+                metrics.buckets[bucket] += 1
+            metrics.count += 1
+            metrics.latency_sum += latency
+            metrics.queries += queries
+            metrics.db_seconds += db_seconds
+            metrics.statuses[status_code] = metrics.statuses.get(status_code, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render_prometheus(self):
+        with self._lock:
+            snapshot = [
+                (view, method, list(m.buckets), m.count, m.latency_sum, m.queries, m.db_seconds, dict(m.statuses))
+                for (view, method), m in sorted(self._views.items())
+            ]
+
+        duration = f"{METRIC_PREFIX}_request_duration_seconds"
+        lines = [
+            f"# HELP {duration} Request latency per view.",
+            f"# TYPE {duration} histogram",
+        ]
+        for view, method, buckets, count, latency_sum, *_ in snapshot:
+            labels = f'view="{view}",method="{method}"'
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                cumulative += bucket_count
+                lines.append(f'{duration}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{duration}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{duration}_sum{{{labels}}} {latency_sum:.6f}")
+            lines.append(f"{duration}_count{{{labels}}} {count}")
+
+        for name, help_text, index, fmt in (
+            ("db_queries_total", "SQL statements executed per view.", 5, "{}"),
+            ("db_seconds_total", "Time spent in SQL per view.", 6, "{:.6f}"),
+        ):
+            metric = f"{METRIC_PREFIX}_request_{name}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for row in snapshot:
+                lines.append(f'{metric}{{view="{row[0]}",method="{row[1]}"}} {fmt.format(row[index])}')
+
+        responses = f"{METRIC_PREFIX}_responses_total"
+        lines.append(f"# HELP {responses} Responses per view and status code.")
+        lines.append(f"# TYPE {responses} counter")
+        for view, method, *_, statuses in snapshot:
+            for status_code, count in sorted(statuses.items()):
+                lines.append(f'{responses}{{view="{view}",method="{method}",status="{status_code}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,127 @@
+from main.models import Room, Player
+from main.services.catalog import get_catalog
+from main.services.sheets import sheet_traits, sheet_card
+
+
+# * Облегченные чтения комнаты/игрока для опроса: только нужные колонки через values(),
+# * листы собираются из колоды комнаты - чужие закрытые характеристики и тексты неиспользованных карт
+# * в ответ не попадают, device_id не выбирается без ?device_id, сами тексты берутся из каталога
+
+PLAYER_FIELDS = (
+    "id",
+    "seat",
+    "device_id",
+    "is_host",
+    "is_alive",
+    "nickname",
+    "player_traits",
+    "action_card",
+    "reaction_card",
+)
+# device_id отдается только владельцу, поэтому по умолчанию его нет
+DEFAULT_PLAYER_FIELDS = tuple(field for field in PLAYER_FIELDS if field != "device_id")
+
+ROOM_FIELDS = ("code", "players_count", "difficulty", "balance", "severity", "is_playing")
+
+SHEET_FIELDS = ("player_traits", "action_card", "reaction_card")
+
+
+def parse_fields(raw):
+    """`?fields=seat,nickname,...` -> tuple of player fields, ValueError on unknown names"""
+    if not raw:
+        return DEFAULT_PLAYER_FIELDS
+
+    fields = tuple(dict.fromkeys(field.strip() for field in raw.split(",") if field.strip()))
+    unknown = [field for field in fields if field not in PLAYER_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(PLAYER_FIELDS)}")
+    return fields
+
+
+def project_players(players, fields, device_id=None, deck=None):
+    """
+    Public view of players (queryset filter), own player (matching device_id) sees everything of theirs
+    - Other players' traits: revealed only, other players' cards: text once used
+    - 1 query; deck - the room's deck when the caller already has it, otherwise it's joined per row
+    - Returns (entries ordered by seat, own player id or None)
+    """
+    columns = ["id", "seat", *(f for f in ("is_host", "is_alive", "nickname") if f in fields)]
+    if device_id:
+        columns.append("device_id")
+
+    sheet_fields = [field for field in SHEET_FIELDS if field in fields]
+    if sheet_fields:
+        columns.extend(("revealed", "cards_used"))
+        if deck is None:
+            columns.append("room__deck")
+
+    rows = list(players.order_by("seat").values(*columns))
+    catalog = get_catalog()
+
+    own_id = next((row["id"] for row in rows if device_id and row["device_id"] == device_id), None)
+
+    entries = []
+    for row in rows:
+        entry = {field: row[field] for field in ("id", "seat", "is_host", "is_alive", "nickname") if field in columns}
+        if "device_id" in fields and row["id"] == own_id:
+            entry["device_id"] = row["device_id"]
+
+        own = row["id"] == own_id
+        row_deck = row.get("room__deck", deck)
+        if "player_traits" in sheet_fields:
+            entry["player_traits"] = sheet_traits(catalog, row_deck, row["id"], row["seat"], row["revealed"], own)
+        for card in ("action_card", "reaction_card"):
+            if card in sheet_fields:
+                entry[card] = sheet_card(catalog, row_deck, card, row["id"], row["seat"], row["cards_used"], own)
+        entries.append(entry)
+
+    # Порядок ключей как в PlayerSerializer
+    return [
+        {field: entry[field] for field in PLAYER_FIELDS if field in fields and field in entry}
+        for entry in entries
+    ], own_id
+
+
+def project_room(room_id, fields=DEFAULT_PLAYER_FIELDS, device_id=None):
+    """Table view of the room: same shape as RoomRetrieveSerializer, hidden parts are null or absent"""
+    row = (
+        Room.objects
+        .filter(pk=room_id)
+        .values(
+            *ROOM_FIELDS,
+            # Колода нужна только для листов
+            *(("deck",) if any(field in fields for field in SHEET_FIELDS) else ()),
+            "shelter__pk", "shelter__capacity", "shelter__description",
+            "room_catastrophe__pk",
+            "room_catastrophe__catastrophe__id",
+            "room_catastrophe__catastrophe__title",
+            "room_catastrophe__catastrophe__description",
+            "room_catastrophe__catastrophe__severity",
+        )
+        .first()
+    )
+    if row is None:
+        return None
+
+    players, own_id = project_players(Player.objects.filter(room_id=room_id), fields, device_id, row.get("deck") or {})
+
+    room = {field: row[field] for field in ROOM_FIELDS}
+    room["players"] = players
+    room["shelter"] = None if row["shelter__pk"] is None else {
+        "pk": row["shelter__pk"],
+        "capacity": row["shelter__capacity"],
+        "description": row["shelter__description"],
+    }
+    room["room_catastrophe"] = None if row["room_catastrophe__pk"] is None else {
+        "pk": row["room_catastrophe__pk"],
+        "catastrophe": {
+            "id": row["room_catastrophe__catastrophe__id"],
+            "title": row["room_catastrophe__catastrophe__title"],
+            "description": row["room_catastrophe__catastrophe__description"],
+            "severity": row["room_catastrophe__catastrophe__severity"],
+        },
+    }
+    if device_id:
+        room["own_player"] = own_id
+    return room
+
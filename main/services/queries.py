@@ -0,0 +1,46 @@
+from django.db.models import Prefetch, Q
+
+from main.models import Room, Player
+
+
+def player_detail_queryset():
+    """Player with its room joined - the sheet is read from the room's deck (1 query total)"""
+    return Player.objects.select_related("room")
+
+
+def room_detail_queryset():
+    """
+    Everything RoomRetrieveSerializer touches in a fixed number of queries
+    - Room + deck + shelter + catastrophe (joined)
+    - Players (the prefetch links them back to the room, so the deck isn't read again per player)
+    """
+    return (
+        Room.objects
+        .select_related("shelter", "room_catastrophe__catastrophe")
+        .prefetch_related(
+            Prefetch("players", queryset=Player.objects.order_by("seat"))
+        )
+    )
+
+
+# & Подключение к комнате: одни и те же запросы для синхронной и асинхронной вьюхи (.first() / .afirst())
+
+
+def seated_player_queryset(room, device_id):
+    """The device's own player in the room (re-join)"""
+    return player_detail_queryset().filter(room=room, device_id=device_id)
+
+
+def other_room_code_queryset(room, device_id):
+    """Code of another room the device already sits in"""
+    return Player.objects.filter(device_id=device_id).exclude(room=room).values_list("room__code", flat=True)
+
+
+def free_seat_queryset(room):
+    """Lowest seat nobody has taken yet"""
+    return (
+        player_detail_queryset()
+        .filter(room=room)
+        .filter(Q(device_id__isnull=True) | Q(device_id=""))
+        .order_by("seat")
+    )
@@ -0,0 +1,151 @@
+import logging
+import threading
+from collections import Counter
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from main.services.response_cache import invalidate_room_responses
+from main.models import Room
+
+
+logger = logging.getLogger(__name__)
+
+
+# * Комната считается брошенной, если в ней ничего не менялось столько дней (updated_at двигает touch_room)
+STALE_ROOM_DAYS = 7
+REAP_CHUNK_SIZE = 200
+
+
+class ReapReport(NamedTuple):
+    rooms: int
+    rows: int
+    by_model: dict
+
+
+def _cascade(model, lookup, chain=()):
+    """
+    [(model, lookup of the room id)] for every table under `model`, children before their parent
+    - Follows reverse relations (Room -> Player -> assignments ...), so new tables are picked up on their own
+    - Only CASCADE relations can be deleted table by table, anything else is a configuration error
+    """
+    plan = []
+    for relation in model._meta.get_fields(include_hidden=True):
+        if not relation.auto_created or relation.concrete:
+            continue  # Только обратные связи (в том числе related_name='+')
+
+        child = relation.related_model
+        if relation.many_to_many or relation.on_delete is not models.CASCADE:
+            raise ImproperlyConfigured(
+                f"delete_rooms can't bulk-delete {child._meta.label}.{relation.field.name}: "
+                f"only CASCADE foreign keys to rooms and players are supported"
+            )
+        if child in (*chain, model):
+            raise ImproperlyConfigured(f"delete_rooms can't bulk-delete the cycle through {child._meta.label}")
+
+        child_lookup = f"{relation.field.name}__{lookup}" if chain else f"{relation.field.attname}__in"
+        plan.extend(_cascade(child, child_lookup, (*chain, model)))
+        plan.append((child, child_lookup))
+    return plan
+
+
+_room_tables = None
+
+
+def room_tables():
+    """Deletion plan of a room, built once from the models"""
+    global _room_tables
+
+    if _room_tables is None:
+        _room_tables = [*_cascade(Room, "pk__in"), (Room, "pk__in")]
+    return _room_tables
+
+
+def _delete_matching(queryset):
+    """One DELETE ... WHERE pk IN (<queryset>) statement, returns the deleted row count"""
+    model = queryset.model
+    sql, params = queryset.values("pk").query.sql_with_params()
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {pk} IN ({sql})", params)
+        return cursor.rowcount
+
+
+def delete_rooms(room_ids):
+    """
+    Deletes rooms with everything attached using one DELETE per table
+    - Children go first, so nothing is collected in Python
+    - Returns {model label: deleted rows}
+    """
+    deleted = Counter()
+
+    with transaction.atomic():
+        # * Без QuerySet.delete(): коллектор читал бы строки в память ради каскада и сигналов.
+        # * Каскад не нужен - дочерние таблицы к этому моменту уже очищены (порядок room_tables),
+        # * сигналов pre/post_delete на этих моделях нет (при появлении - удалять через коллектор)
+        for model, lookup in room_tables():
+            deleted[model._meta.label] += _delete_matching(model.objects.filter(**{lookup: room_ids}))
+
+        transaction.on_commit(lambda: [invalidate_room_responses(room_id) for room_id in room_ids])
+
+    return dict(deleted)
+
+
+def reap_stale_rooms(max_age=timedelta(days=STALE_ROOM_DAYS), chunk_size=REAP_CHUNK_SIZE, max_chunks=None):
+    """Deletes rooms idle for longer than max_age in bounded chunks, one transaction per chunk"""
+    cutoff = timezone.now() - max_age
+    rooms = 0
+    by_model = Counter()
+    chunks = 0
+
+    while max_chunks is None or chunks < max_chunks:
+        room_ids = list(
+            Room.objects
+            .filter(updated_at__lt=cutoff)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:chunk_size]
+        )
+        if not room_ids:
+            break
+
+        by_model.update(delete_rooms(room_ids))
+        rooms += len(room_ids)
+        chunks += 1
+
+    report = ReapReport(rooms=rooms, rows=sum(by_model.values()), by_model=dict(by_model))
+    if rooms:
+        logger.info("Reaped %s stale rooms (%s rows)", report.rooms, report.rows)
+    return report
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_reaper(interval_seconds):
+    """Runs reap_stale_rooms every interval in a daemon thread (once per process)"""
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is not None:
+            return _scheduler
+
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval_seconds):
+                try:
+                    reap_stale_rooms()
+                except Exception:
+                    logger.exception("Stale room reaper failed")
+                finally:
+                    connection.close()
+
+        _scheduler = threading.Thread(target=run, name="room-reaper", daemon=True)
+        _scheduler.stop = stop
+        _scheduler.start()
+        return _scheduler
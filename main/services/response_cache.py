@@ -0,0 +1,177 @@
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+# * Готовые байты ответа комнаты по ключу (комната, ревизия, вариант запроса)
+# * Ревизия (и отпечаток каталога в варианте) в ключе делает устаревшие записи недостижимыми,
+# * invalidate_room / clear лишь освобождают память
+RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+# * Сколько ждать чужой рендер того же ключа, прежде чем рендерить самому
+RESPONSE_CACHE_WAIT_SECONDS = 5
+
+
+class ResponseCache(ABC):
+    """
+    Base class: single-flight around the backend get/set (subclasses implement the storage)
+    - Concurrent misses for one key wait for the first renderer instead of rendering too
+    - If the renderer fails or takes longer than wait_timeout, waiters render on their own
+    """
+
+    wait_timeout = RESPONSE_CACHE_WAIT_SECONDS
+
+    def __init__(self):
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, room_id, revision, variant, render):
+        key = (room_id, revision, variant)
+
+        body = self.get(key)
+        if body is not None:
+            self.hits += 1
+            return body
+
+        with self._inflight_lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+
+        if not leader:
+            event.wait(self.wait_timeout)
+            body = self.get(key)
+            if body is not None:
+                self.hits += 1
+                return body
+
+        self.misses += 1
+        try:
+            body = render()
+            self.set(key, body)
+            return body
+        finally:
+            if leader:
+                with self._inflight_lock:
+                    self._inflight.pop(key, None)
+                event.set()
+
+    @abstractmethod
+    def get(self, key):
+        """Stored body or None"""
+
+    @abstractmethod
+    def set(self, key, body):
+        pass
+
+    def invalidate_room(self, room_id):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LocalResponseCache(ResponseCache):
+    """In-process LRU capped by the total size of stored bodies"""
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_MAX_BYTES, **options):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._rooms = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                return
+
+            self._entries[key] = body
+            self._rooms.setdefault(key[0], set()).add(key)
+            self.size += len(body)
+
+            while self.size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_room(self, room_id):
+        with self._lock:
+            for key in list(self._rooms.get(room_id, ())):
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rooms.clear()
+            self.size = 0
+
+    def _discard(self, key):
+        body = self._entries.pop(key)
+        self.size -= len(body)
+
+        keys = self._rooms[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._rooms[key[0]]
+
+
+class DjangoResponseCache(ResponseCache):
+    """
+    Shared across workers through a Django cache alias (LocMemCache locally, Redis/Memcached in prod)
+    - Old revisions are left to expire by timeout
+    """
+
+    def __init__(self, alias="default", timeout=300, key_prefix="main:room-response", **options):
+        super().__init__()
+        self.alias = alias
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+
+    def cache_key(self, key):
+        room_id, revision, variant = key
+        # Вариант может содержать device_id - хешируем, чтобы ключ был безопасен для memcached
+        digest = hashlib.md5(variant.encode()).hexdigest()
+        return f"{self.key_prefix}:{room_id}:{revision}:{digest}"
+
+    def get(self, key):
+        return caches[self.alias].get(self.cache_key(key))
+
+    def set(self, key, body):
+        caches[self.alias].set(self.cache_key(key), body, timeout=self.timeout)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = getattr(settings, "ROOM_RESPONSE_CACHE", {})
+                cache_class = import_string(config.get("BACKEND", "main.services.response_cache.LocalResponseCache"))
+                _cache = cache_class(**config.get("OPTIONS", {}))
+    return _cache
+
+
+def invalidate_room_responses(room_id):
+    get_response_cache().invalidate_room(room_id)
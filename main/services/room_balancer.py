@@ -0,0 +1,122 @@
+import random
+import weakref
+
+try:  # Optional dependency: без него комнаты балансируются по одному игроку (trait_solver)
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# * Сколько случайных наборов разыгрывается на каждое место и сколько раундов их подтягивания к окну
+ROOM_BALANCE_CANDIDATES = 64
+ROOM_BALANCE_REPAIR_ROUNDS = 8
+# Штраф за набор вне окна - больше любого разброса сил
+OUT_OF_WINDOW_PENALTY = 10 ** 6
+
+_pools = weakref.WeakKeyDictionary()
+
+
+class TraitPools:
+    """
+    Trait pools of several types as flat NumPy arrays, in the catalog's order (sorted by power per type)
+    - powers: all pools one after another, starts / sizes: where each type's pool is
+    - keys: type number * span + power - sorted as a whole, so one searchsorted serves every type
+    """
+
+    def __init__(self, catalog, types):
+        pools = [catalog.trait_powers_by_type[t] for t in types]
+        self.sizes = np.array([len(pool) for pool in pools], dtype=np.int64)
+        self.starts = np.concatenate(([0], np.cumsum(self.sizes)[:-1]))
+        self.powers = np.concatenate([np.asarray(pool, dtype=np.int64) for pool in pools])
+
+        self.base = int(self.powers.min())
+        self.span = int(self.powers.max()) - self.base + 1
+        self.keys = np.repeat(np.arange(len(types)), self.sizes) * self.span + (self.powers - self.base)
+
+        self.lowest = self.powers[self.starts]
+        self.highest = self.powers[self.starts + self.sizes - 1]
+
+    def nearest(self, types, wanted, generator):
+        """Pool index of a random trait of each type whose power is the closest to `wanted` (vectorized)"""
+        wanted = np.clip(wanted, self.lowest[types], self.highest[types])
+        first = self.starts[types]
+        last = first + self.sizes[types] - 1
+
+        insert = np.searchsorted(self.keys, types * self.span + (wanted - self.base))
+        below = np.clip(insert - 1, first, last)
+        above = np.clip(insert, first, last)
+        closer = np.abs(self.powers[above] - wanted) < np.abs(self.powers[below] - wanted)
+        key = self.keys[np.where(closer, above, below)]
+
+        start = np.searchsorted(self.keys, key, "left")
+        stop = np.searchsorted(self.keys, key, "right")
+        return start + (generator.random(len(key)) * (stop - start)).astype(np.int64) - first
+
+
+def trait_pools(catalog, types):
+    """TraitPools built once per catalog snapshot and set of types"""
+    pools = _pools.setdefault(catalog, {})
+    key = tuple(types)
+    if key not in pools:
+        pools[key] = TraitPools(catalog, types)
+    return pools[key]
+
+
+def balance_room(catalog, trait_types, seats, target, dev, rng=random,
+                 candidates=ROOM_BALANCE_CANDIDATES, rounds=ROOM_BALANCE_REPAIR_ROUNDS):
+    """
+    One trait per type for every seat at once, with totals as equal as possible inside [target - dev, target + dev]
+
+    - Samples `candidates` random sheets per seat as a (seats, candidates, types) index array
+    - Sheets outside the window get a random slot swapped to the power that brings the total
+      closest to target, `rounds` times
+    - For every center in the window each seat takes its sheet closest to it; the center with
+      the fewest seats outside the window, then the smallest spread, then the mean closest to target wins
+
+    Deterministic for a given `rng` state. Returns a list of trait records per seat.
+    """
+    types = [t for t in trait_types if catalog.traits_by_type[t]]
+    if not types:
+        return [[] for _ in range(seats)]
+
+    generator = np.random.default_rng(rng.getrandbits(64))
+    pools = trait_pools(catalog, types)
+    low, high = target - dev, target + dev
+
+    chosen = (generator.random((seats, candidates, len(types))) * pools.sizes).astype(np.int64)
+    powers = pools.powers[pools.starts + chosen]
+    totals = powers.sum(axis=-1)
+
+    for _ in range(rounds):
+        seat, candidate = np.nonzero((totals < low) | (totals > high))
+        if not len(seat):
+            break
+
+        slot = generator.integers(0, len(types), size=len(seat))
+        rest = totals[seat, candidate] - powers[seat, candidate, slot]
+        index = pools.nearest(slot, target - rest, generator)
+        power = pools.powers[pools.starts[slot] + index]
+
+        chosen[seat, candidate, slot] = index
+        powers[seat, candidate, slot] = power
+        totals[seat, candidate] = rest + power
+
+    in_window = (totals >= low) & (totals <= high)
+    centers = np.arange(low, high + 1)
+
+    # (centers, seats, candidates): расстояние набора до центра, наборы вне окна - в самом конце
+    distance = np.abs(totals[None] - centers[:, None, None]) + np.where(in_window, 0, OUT_OF_WINDOW_PENALTY)[None]
+    best = distance.argmin(axis=-1)
+
+    seat_index = np.arange(seats)[None]
+    picked = totals[seat_index, best]
+    outside = (~in_window[seat_index, best]).sum(axis=1)
+    spread = picked.max(axis=1) - picked.min(axis=1)
+    drift = np.abs(picked.mean(axis=1) - target)
+    center = np.lexsort((drift, spread, outside))[0]
+
+    sheets = chosen[np.arange(seats), best[center]]
+    return [
+        [catalog.traits_by_type[t][index] for t, index in zip(types, sheet.tolist())]
+        for sheet in sheets
+    ]
@@ -0,0 +1,120 @@
+from collections import defaultdict
+
+from django.db.models import Q
+
+from main.models import Room, Player, RoomChange, ChangeKind
+from main.serializers import RoomStateSerializer, PlayerStateSerializer
+from main.services.catalog import get_catalog
+from main.services.sheets import TRAIT_PK_STRIDE, sheet_trait, sheet_card, sheet_has_slot
+
+
+# * Если клиент отстал сильнее - дешевле отдать полный снимок, чем собирать дельту
+ROOM_DELTA_MAX_REVISIONS = 200
+
+
+def _player_state(player, fields, own):
+    """Changed player in the projected shape (project_players): id and seat always, device_id only to its owner"""
+    entry = {field: getattr(player, field) for field in ("id", "seat", "is_host", "is_alive", "nickname")
+             if field in ("id", "seat") or field in fields}
+    if own and "device_id" in fields:
+        entry["device_id"] = player.device_id
+    return entry
+
+
+def build_room_delta(room_id, revision, since, projection=None):
+    """
+    Collects everything that changed in the room after `since`
+    - Returns None when the client has to take a full snapshot instead
+      (too far behind, ahead of the server, journal gap or a restart in between)
+    - projection - (view, fields, device_id) of read_projection: the delta shows no more than that view's snapshot
+      (other players' hidden traits, unused card texts and devices are left out, so are fields not asked for),
+      with device_id the delta carries "own_player" like the snapshot
+    """
+    if since > revision or revision - since > ROOM_DELTA_MAX_REVISIONS:
+        return None
+
+    delta = {
+        "revision": revision,
+        "full": False,
+        "room": None,
+        "players": [],
+        "traits": [],
+        "action_cards": [],
+        "reaction_cards": [],
+    }
+    if since == revision:
+        return delta
+
+    journal = RoomChange.objects.filter(
+        room_id=room_id, revision__gt=since, revision__lte=revision
+    ).values_list("revision", "kind", "object_id")
+
+    changed = defaultdict(set)
+    revisions = set()
+    for change_revision, kind, object_id in journal:
+        revisions.add(change_revision)
+        changed[kind].add(object_id)
+
+    if len(revisions) < revision - since or ChangeKind.RESET in changed:
+        return None
+
+    _, fields, device_id = projection or (None, None, None)
+
+    def asked(field):
+        return projection is None or field in fields
+
+    # Характеристика и карта journal-а указывают на игрока (pk характеристики - id игрока и слот)
+    sheet_players = set()
+    if asked("player_traits"):
+        sheet_players |= {pk // TRAIT_PK_STRIDE for pk in changed[ChangeKind.TRAIT]}
+    for kind in (ChangeKind.ACTION_CARD, ChangeKind.REACTION_CARD):
+        if asked(kind.value):
+            sheet_players |= changed[kind]
+
+    room = None
+    if ChangeKind.ROOM in changed or sheet_players:
+        room = Room.objects.get(pk=room_id)
+    if ChangeKind.ROOM in changed:
+        delta["room"] = RoomStateSerializer(room).data
+
+    # Свой игрок (view=own) выбирается тем же запросом
+    players = {}
+    wanted = Q(pk__in=changed[ChangeKind.PLAYER] | sheet_players)
+    if device_id:
+        wanted |= Q(device_id=device_id)
+    if changed[ChangeKind.PLAYER] or sheet_players or device_id:
+        players = {player.pk: player for player in Player.objects.filter(wanted, room_id=room_id).order_by("seat")}
+
+    own_id = next((pk for pk, player in players.items() if device_id and player.device_id == device_id), None)
+    if device_id:
+        delta["own_player"] = own_id
+
+    if changed[ChangeKind.PLAYER]:
+        changed_players = [player for pk, player in players.items() if pk in changed[ChangeKind.PLAYER]]
+        if projection is None:
+            delta["players"] = PlayerStateSerializer(changed_players, many=True).data
+        else:
+            delta["players"] = [_player_state(player, fields, player.pk == own_id) for player in changed_players]
+
+    catalog = get_catalog()
+    for pk in sorted(changed[ChangeKind.TRAIT]) if asked("player_traits") else ():
+        player = players.get(pk // TRAIT_PK_STRIDE)
+        slot = pk % TRAIT_PK_STRIDE
+        if player is not None and sheet_has_slot(room.deck, player.seat, slot):
+            sheet = room.deck["seats"][player.seat - 1]
+            trait = sheet_trait(catalog, sheet, player.pk, player.revealed, slot)
+            if projection is None or trait["is_revealed"] or player.pk == own_id:
+                delta["traits"].append({**trait, "player": player.pk})
+    delta["traits"].sort(key=lambda trait: trait["trait_type"])
+
+    for kind, key in ((ChangeKind.ACTION_CARD, "action_cards"), (ChangeKind.REACTION_CARD, "reaction_cards")):
+        for pk in sorted(changed[kind]):
+            player = players.get(pk) if asked(kind.value) else None
+            visible = projection is None or pk == own_id
+            card = player and sheet_card(
+                catalog, room.deck, kind.value, player.pk, player.seat, player.cards_used, visible,
+            )
+            if card:
+                delta[key].append({**card, "player": player.pk})
+
+    return delta
@@ -0,0 +1,97 @@
+from rest_framework.exceptions import NotFound, ValidationError
+
+from main.renderers import FastJSONRenderer
+from main.serializers import RoomRetrieveSerializer
+from main.services.catalog import catalog_fingerprint
+from main.services.projections import parse_fields, project_room
+from main.services.queries import room_detail_queryset
+from main.services.response_cache import get_response_cache
+from main.services.room_delta import build_room_delta
+
+
+# * Чтение комнаты, общее для синхронных (main.views) и асинхронных (main.async_views) вьюх
+
+
+PROJECTED_VIEWS = ("table", "own")
+
+
+def read_projection(params):
+    """
+    ?view=table|own, ?fields=a,b and ?device_id= of a read (params - query string dict)
+    - Returns (view, player fields, device_id) or None for the full serializer
+    - `own` needs device_id: the owner's hidden traits and cards are shown to them
+    """
+    view = params.get("view")
+    raw_fields = params.get("fields")
+    if view is None and raw_fields is None:
+        return None
+
+    view = view or "table"
+    if view not in PROJECTED_VIEWS:
+        raise ValidationError({"view": f"Expected one of: {', '.join(PROJECTED_VIEWS)}."})
+
+    device_id = params.get("device_id")
+    if view == "own" and not device_id:
+        raise ValidationError({"device_id": "Required for view=own."})
+
+    try:
+        fields = parse_fields(raw_fields)
+    except ValueError as error:
+        raise ValidationError({"fields": str(error)})
+
+    return view, fields, device_id if view == "own" else None
+
+
+def projection_variant(projection):
+    """Cache key part of a read: full, or view + fields + device"""
+    if projection is None:
+        return "full"
+    view, fields, device_id = projection
+    return f"{view}:{','.join(fields)}:{device_id or ''}"
+
+
+def room_snapshot(room_id, projection=None):
+    """Room data for a snapshot read, NotFound if the room is gone or the own player isn't in it"""
+    if projection is None:
+        room = room_detail_queryset().filter(pk=room_id).first()
+        if room is None:
+            raise NotFound()
+        return RoomRetrieveSerializer(room).data
+
+    view, fields, device_id = projection
+    room = project_room(room_id, fields, device_id)
+    if room is None:
+        raise NotFound()
+    if view == "own" and room["own_player"] is None:
+        raise NotFound("Player not found in this room.")
+    return room
+
+
+# * Форматы, чьи байты не зависят от запроса (Browsable API зависит) - их можно кешировать
+CACHEABLE_FORMATS = ("json", "msgpack")
+
+
+def cached_room_body(room_id, revision, projection=None, renderer=None):
+    """
+    Rendered bytes of a snapshot (JSON by default), rendered once per (room, revision, format, variant)
+    - Texts come from the catalog, so its fingerprint is part of the variant
+    """
+    renderer = renderer or FastJSONRenderer()
+    return get_response_cache().get_or_render(
+        room_id, revision, f"{renderer.format}:{projection_variant(projection)}:c{catalog_fingerprint()}",
+        lambda: renderer.render(room_snapshot(room_id, projection)),
+    )
+
+
+def room_changes_since(room_id, revision, since, projection=None):
+    """
+    ?since=<revision> read: what changed after `since`,
+    or {"revision", "full": true, "room": <snapshot>} when a delta can't be built
+    - Both follow the same projection (?view= / ?fields=) as a snapshot read
+    """
+    delta = build_room_delta(room_id, revision, since, projection)
+    if delta is not None:
+        if projection is not None and projection[0] == "own" and delta.get("own_player", 0) is None:
+            raise NotFound("Player not found in this room.")
+        return delta
+    return {"revision": revision, "full": True, "room": room_snapshot(room_id, projection)}
@@ -0,0 +1,107 @@
+from typing import NamedTuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+
+from main.models import Room, Player, RoomChange, ChangeKind
+from main.services.events import publish_room_event
+from main.services.room_delta import ROOM_DELTA_MAX_REVISIONS
+from main.services.catalog import catalog_fingerprint
+from main.services.response_cache import invalidate_room_responses
+
+
+# * Журнал чистится раз в столько ревизий: записи старше ROOM_DELTA_MAX_REVISIONS дельта уже не читает,
+# * так что в журнале комнаты остается не больше ROOM_DELTA_MAX_REVISIONS + ROOM_JOURNAL_PRUNE_EVERY ревизий
+ROOM_JOURNAL_PRUNE_EVERY = 50
+
+
+class RoomRevision(NamedTuple):
+    id: int
+    code: str
+    revision: int
+
+
+def touch_room(room_id=None, *, player_id=None):
+    """
+    Bumps the room revision (and activity timestamp) in a single statement
+    - Room can be addressed directly or through one of its players
+    - Returns RoomRevision, None if the room is gone
+    """
+    room_table = connection.ops.quote_name(Room._meta.db_table)
+
+    if player_id is not None:
+        player_table = connection.ops.quote_name(Player._meta.db_table)
+        where = f"id = (SELECT room_id FROM {player_table} WHERE id = %s)"
+        key = player_id
+    else:
+        where = "id = %s"
+        key = room_id
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {room_table} SET revision = revision + 1, updated_at = %s "
+            f"WHERE {where} RETURNING id, code, revision",
+            [timezone.now(), key],
+        )
+        row = cursor.fetchone()
+
+    return RoomRevision(*row) if row else None
+
+
+def room_changed(event_type, room_id=None, *, via_player=None, changes=(), **payload):
+    """
+    Bumps the revision, journals what changed and notifies room subscribers
+    - changes: [(ChangeKind, object_id), ...] for delta reads
+    """
+    touched = touch_room(room_id, player_id=via_player)
+    if not touched:
+        return None
+
+    changes = list(changes) or [(ChangeKind.ROOM, None)]
+    RoomChange.objects.bulk_create([
+        RoomChange(room_id=touched.id, revision=touched.revision, kind=kind, object_id=object_id)
+        for kind, object_id in changes
+    ])
+    if any(kind == ChangeKind.RESET for kind, _ in changes):
+        # После перезапуска старые записи бесполезны - клиенты все равно получат полный снимок
+        RoomChange.objects.filter(room_id=touched.id, revision__lt=touched.revision).delete()
+    elif touched.revision % ROOM_JOURNAL_PRUNE_EVERY == 0:
+        RoomChange.objects.filter(
+            room_id=touched.id, revision__lte=touched.revision - ROOM_DELTA_MAX_REVISIONS
+        ).delete()
+
+    # Кеш ответов ключуется ревизией - старые записи уже недостижимы, освобождаем память
+    transaction.on_commit(lambda: invalidate_room_responses(touched.id))
+    publish_room_event(touched.code, event_type, revision=touched.revision, **payload)
+    return touched
+
+
+def player_joined(room_id, player):
+    return room_changed(
+        "player_joined", room_id,
+        changes=[(ChangeKind.PLAYER, player.pk)], player_id=player.pk, seat=player.seat,
+    )
+
+
+def trait_revealed(player_id, trait_id):
+    return room_changed(
+        "trait_revealed", via_player=player_id,
+        changes=[(ChangeKind.TRAIT, trait_id)], player_id=player_id, trait_id=trait_id,
+    )
+
+
+def room_etag(room_id, revision, fmt="json"):
+    # * pk входит в тег, чтобы пересозданная комната с тем же кодом не совпала со старой,
+    # * отпечаток каталога - потому что тексты листов берутся из него,
+    # * формат ответа (json / msgpack / api) - потому что по одному URL отдаются разные байты
+    return quote_etag(f"{room_id}-{revision}-{catalog_fingerprint()}-{fmt}")
+
+
+def etag_matches(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+
+    etags = parse_etags(header)
+    return "*" in etags or etag in [e.removeprefix("W/") for e in etags]
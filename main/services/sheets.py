@@ -0,0 +1,157 @@
+from main.models import Room, TraitType, Trait, ActionCard, ReactionCard
+
+
+# * Листы персонажей не хранятся строками: колода комнаты (Room.deck) держит id каталога по местам,
+# * игрок - битовые маски открытых характеристик (revealed) и использованных карт (cards_used).
+# * Характеристики и карты собираются отсюда при чтении из колоды и каталога
+# * - {"seats": [{"bio": text, "traits": [id | text | None, ...], "action_card": ..., "reaction_card": ...}]}
+# * - Вместо id может стоять текст: так колода держит записи, удаленные из каталога во время игры
+
+# * Характеристики по типам, кроме био (оно генерируется отдельно) - в этом порядке они лежат в колоде
+TRAIT_TYPES = [
+    TraitType.PROFESSION,
+    TraitType.HEALTH,
+    TraitType.HOBBY,
+    TraitType.FEAR,
+    TraitType.CHARACTER,
+    TraitType.BACKGROUND,
+    TraitType.KNOWLEDGE,
+    TraitType.ITEM,
+]
+
+# Слот 0 - био, слоты 1.. - TRAIT_TYPES; бит слота в Player.revealed - 1 << slot
+SLOT_TYPES = tuple(t.value for t in (TraitType.BIO, *TRAIT_TYPES))
+# Порядок выдачи как у прежних строк: по типу, затем по pk
+SLOT_ORDER = sorted(range(len(SLOT_TYPES)), key=SLOT_TYPES.__getitem__)
+TRAIT_LABELS = dict(TraitType.choices)
+
+# * Публичный pk характеристики - id игрока и слот, pk карты - id ее владельца
+TRAIT_PK_STRIDE = 16
+
+# Поле листа -> (модель каталога, бит в Player.cards_used)
+CARD_FIELDS = {"action_card": (ActionCard, 1), "reaction_card": (ReactionCard, 2)}
+CATALOG_FIELDS = {Trait: "traits", ActionCard: "action_card", ReactionCard: "reaction_card"}
+
+
+def trait_pk(player_id, slot):
+    return player_id * TRAIT_PK_STRIDE + slot
+
+
+def trait_slot(player_id, pk):
+    """Slot of a public trait pk if it belongs to the player, else None"""
+    slot = pk - player_id * TRAIT_PK_STRIDE
+    return slot if 0 <= slot < len(SLOT_TYPES) else None
+
+
+def deck_of(plan):
+    """What a room keeps of a plan (plan_game_content) - its seats"""
+    return {"seats": plan["seats"]}
+
+
+def dealt_masks(sheet):
+    """
+    (revealed, cards_used) a player starts with
+    - Slots and cards missing from the sheet (empty catalog pools) count as revealed / used,
+      so the conditional updates of transitions never match them
+    """
+    revealed = sum(1 << slot for slot, ref in enumerate(sheet["traits"], 1) if ref is None)
+    used = sum(bit for field, (_, bit) in CARD_FIELDS.items() if sheet[field] is None)
+    return revealed, used
+
+
+def text_of(catalog, model, ref):
+    """Text of a deck entry: catalog id or the text kept in the deck"""
+    if isinstance(ref, str):
+        return ref
+    return catalog.text_of(model, ref)
+
+
+def sheet_trait(catalog, sheet, player_id, revealed, slot):
+    """One trait as the API shows it: {"pk", "trait_type", "trait_type_display", "description", "is_revealed"}"""
+    trait_type = SLOT_TYPES[slot]
+    return {
+        "pk": trait_pk(player_id, slot),
+        "trait_type": trait_type,
+        "trait_type_display": TRAIT_LABELS[trait_type],
+        "description": sheet["bio"] if slot == 0 else text_of(catalog, Trait, sheet["traits"][slot - 1]),
+        "is_revealed": bool(revealed & 1 << slot),
+    }
+
+
+def sheet_traits(catalog, deck, player_id, seat, revealed, hidden=True):
+    """
+    Traits of a seat's sheet, ordered by type
+    - hidden=False - only revealed ones (what other players see)
+    """
+    if not deck:
+        return []
+
+    sheet = deck["seats"][seat - 1]
+    return [
+        sheet_trait(catalog, sheet, player_id, revealed, slot)
+        for slot in SLOT_ORDER
+        if (slot == 0 or sheet["traits"][slot - 1] is not None) and (hidden or revealed & 1 << slot)
+    ]
+
+
+def sheet_card(catalog, deck, field, player_id, seat, cards_used, visible=True):
+    """
+    Action / reaction card of a seat: {"pk", "description", "is_used"} or None
+    - visible=False - text only once the card is used
+    """
+    if not deck:
+        return None
+
+    ref = deck["seats"][seat - 1][field]
+    if ref is None:
+        return None
+
+    model, bit = CARD_FIELDS[field]
+    is_used = bool(cards_used & bit)
+    return {
+        "pk": player_id,
+        "description": text_of(catalog, model, ref) if visible or is_used else None,
+        "is_used": is_used,
+    }
+
+
+def sheet_has_slot(deck, seat, slot):
+    sheet = deck["seats"][seat - 1] if deck else None
+    return sheet is not None and (slot == 0 or sheet["traits"][slot - 1] is not None)
+
+
+def sheet_has_card(deck, seat, field):
+    return bool(deck) and deck["seats"][seat - 1][field] is not None
+
+
+def keep_deleted_texts(model, ids):
+    """
+    Writes texts of catalog rows that are about to be deleted into the decks that still use them
+    - Call in the deleting transaction, before the delete
+    - Other content (shelters, catastrophes) is protected by its foreign keys and is ignored here
+    """
+    field = CATALOG_FIELDS.get(model)
+    if field is None:
+        return 0
+
+    texts = dict(model.objects.filter(pk__in=list(ids)).values_list("pk", "description"))
+    if not texts:
+        return 0
+
+    rooms = []
+    for room in Room.objects.filter(deck__isnull=False).only("pk", "deck").iterator():
+        changed = False
+        for sheet in room.deck["seats"]:
+            if field == "traits":
+                for index, ref in enumerate(sheet["traits"]):
+                    if ref in texts and not isinstance(ref, str):
+                        sheet["traits"][index] = texts[ref]
+                        changed = True
+            elif sheet[field] in texts and not isinstance(sheet[field], str):
+                sheet[field] = texts[sheet[field]]
+                changed = True
+        if changed:
+            rooms.append(room)
+
+    Room.objects.bulk_update(rooms, ["deck"])
+    return len(rooms)
@@ -0,0 +1,67 @@
+import random
+from bisect import bisect_left, bisect_right
+
+
+# * Сколько замен допускается, прежде чем сдаться и оставить ближайший к окну набор
+MAX_SWAPS = 32
+
+
+def _random_index_with_power(powers, power, rng):
+    """Random index among traits that share the given power"""
+    return rng.randrange(bisect_left(powers, power), bisect_right(powers, power))
+
+
+def balance_traits(catalog, trait_types, target, dev, rng=random):
+    """
+    Picks one trait per type so that the total power lands in [target - dev, target + dev]
+
+    Pools in the catalog are sorted by power, so every step is a pair of bisects:
+    - Start from a uniformly random trait per type
+    - For each type, look up the power range that would put the total into the window
+      and swap to a random trait from that range
+    - If no single swap reaches the window, move the slot that gets closest to it
+      to its extreme and try again
+
+    Cost is O(types * log n) per swap regardless of catalog size.
+    """
+    low, high = target - dev, target + dev
+
+    types = [t for t in trait_types if catalog.traits_by_type[t]]
+    powers = catalog.trait_powers_by_type
+
+    chosen = {t: rng.randrange(len(powers[t])) for t in types}
+    total = sum(powers[t][i] for t, i in chosen.items())
+
+    order = list(types)
+    for _ in range(MAX_SWAPS):
+        if low <= total <= high:
+            break
+
+        rng.shuffle(order)
+        for t_type in order:
+            pool = powers[t_type]
+            rest = total - pool[chosen[t_type]]
+
+            start = bisect_left(pool, low - rest)
+            stop = bisect_right(pool, high - rest)
+            if start < stop:
+                chosen[t_type] = rng.randrange(start, stop)
+                total = rest + pool[chosen[t_type]]
+                break
+        else:
+            # * Ни одна одиночная замена не попадает в окно - двигаем слот, который ближе всего подводит к нему
+            best_type, best_power, best_total = None, None, total
+            for t_type in order:
+                pool = powers[t_type]
+                rest = total - pool[chosen[t_type]]
+                power = pool[-1] if total < low else pool[0]
+                if abs(target - (rest + power)) < abs(target - best_total):
+                    best_type, best_power, best_total = t_type, power, rest + power
+
+            if best_type is None:
+                break
+
+            chosen[best_type] = _random_index_with_power(powers[best_type], best_power, rng)
+            total = best_total
+
+    return [catalog.traits_by_type[t][i] for t, i in chosen.items()]
@@ -0,0 +1,168 @@
+from typing import NamedTuple
+
+from django.db import connection
+from django.db.models import F
+from django.db.models.lookups import Exact
+from rest_framework import status
+
+from main.models import Player
+from main.services.sheets import CARD_FIELDS, trait_slot, trait_pk, sheet_has_slot, sheet_has_card
+
+
+# * Переходы состояния условным UPDATE: проверка прав и флага внутри WHERE, результат - число
+# * затронутых строк. Два одновременных нажатия не применятся дважды
+# * Листы персонажей - биты в строке игрока (services.sheets): открыть/использовать - выставить бит,
+# * если он еще сброшен
+
+
+class KilledPlayer(NamedTuple):
+    room_id: int
+    seat: int
+    nickname: str
+
+
+def _bit_clear(field, bit):
+    return Exact(F(field).bitand(bit), 0)
+
+
+def _hidden_trait(player_id, slot, device_id):
+    return Player.objects.filter(_bit_clear("revealed", 1 << slot), pk=player_id, device_id=device_id)
+
+
+def reveal_trait(player_id, trait_id, device_id):
+    """Reveals a hidden trait of the player owning device_id, returns False if nothing changed"""
+    slot = trait_slot(player_id, trait_id)
+    if slot is None:
+        return False
+    return _hidden_trait(player_id, slot, device_id).update(revealed=F("revealed").bitor(1 << slot)) > 0
+
+
+async def areveal_trait(player_id, trait_id, device_id):
+    """reveal_trait for async views"""
+    slot = trait_slot(player_id, trait_id)
+    if slot is None:
+        return False
+    return await _hidden_trait(player_id, slot, device_id).aupdate(revealed=F("revealed").bitor(1 << slot)) > 0
+
+
+def kill_player(player_id, host_device_id):
+    """
+    Kills a living player if host_device_id is the host of their room, returns KilledPlayer or None
+    - One UPDATE ... RETURNING (like touch_room): ORM update() reports only the row count
+    """
+    table = connection.ops.quote_name(Player._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET is_alive = %s "
+            f"WHERE id = %s AND is_alive = %s AND EXISTS ("
+            f"SELECT 1 FROM {table} host WHERE host.room_id = {table}.room_id "
+            f"AND host.device_id = %s AND host.is_host = %s) "
+            f"RETURNING room_id, seat, nickname",
+            [False, player_id, True, host_device_id, True],
+        )
+        row = cursor.fetchone()
+    return KilledPlayer(*row) if row else None
+
+
+def use_card(field, card_id, device_id):
+    """
+    Marks an unused action/reaction card ("action_card" / "reaction_card") of the player owning device_id as used,
+    returns the owner's player id or None
+    - A card's pk is its owner's player id
+    """
+    bit = CARD_FIELDS[field][1]
+    used = (
+        Player.objects
+        .filter(_bit_clear("cards_used", bit), pk=card_id, device_id=device_id)
+        .update(cards_used=F("cards_used").bitor(bit))
+    )
+    return card_id if used else None
+
+
+def use_action_card(card_id, device_id):
+    return use_card("action_card", card_id, device_id)
+
+
+def use_reaction_card(card_id, device_id):
+    return use_card("reaction_card", card_id, device_id)
+
+
+# & Почему переход не применился (только после неудачного UPDATE)
+
+
+def diagnose_reveal(player_id, trait_id, device_id):
+    """Why a conditional reveal matched no row: (detail, status), same answers as the old read-check-save flow"""
+    player = Player.objects.filter(pk=player_id).values_list("device_id", "seat", "room__deck").first()
+    if player is None:
+        return "Player not found", status.HTTP_404_NOT_FOUND
+    owner, seat, deck = player
+    if owner != device_id:
+        return "You can only reveal your own traits", status.HTTP_403_FORBIDDEN
+    slot = trait_slot(player_id, trait_id)
+    if slot is None or not sheet_has_slot(deck, seat, slot):
+        return "Trait not found", status.HTTP_404_NOT_FOUND
+    return "Trait already revealed", status.HTTP_200_OK
+
+
+def diagnose_card_use(field, card_id, device_id):
+    """Why a conditional card use matched no row: (detail, status)"""
+    name = "Action" if field == "action_card" else "Reaction"
+    player = Player.objects.filter(pk=card_id).values_list("device_id", "seat", "room__deck").first()
+    if player is None:
+        return f"{name} card not found", status.HTTP_404_NOT_FOUND
+    owner, seat, deck = player
+    if not sheet_has_card(deck, seat, field):
+        return f"{name} card not found", status.HTTP_404_NOT_FOUND
+    if owner != device_id:
+        return "You can only use your own cards", status.HTTP_403_FORBIDDEN
+    return f"{name} card already used", status.HTTP_400_BAD_REQUEST
+
+
+# & Пакетные переходы (права уже проверены вызывающим кодом), только внутри транзакции
+
+
+def _apply(queryset, **values):
+    """
+    Locks the rows that still match, updates them, returns their ids
+    - A concurrent request waits on the lock and then no longer sees the changed rows,
+      so every id is reported as applied by exactly one request
+    """
+    ids = sorted(queryset.select_for_update().values_list("pk", flat=True))
+    if ids:
+        queryset.model.objects.filter(pk__in=ids).update(**values)
+    return ids
+
+
+def _set_bits(player_id, field, bits):
+    """
+    Locks the player row, sets the bits that are still clear, returns them
+    - A concurrent request waits on the lock and then sees the bits set,
+      so every bit is reported as applied by exactly one request
+    """
+    current = Player.objects.select_for_update().filter(pk=player_id).values_list(field, flat=True).first()
+    if current is None:
+        return set()
+
+    fresh = {bit for bit in bits if not current & bit}
+    if fresh:
+        Player.objects.filter(pk=player_id).update(**{field: F(field).bitor(sum(fresh))})
+    return fresh
+
+
+def reveal_traits(player_id, trait_ids):
+    """Reveals hidden traits of the player among trait_ids, returns the ids that changed"""
+    slots = {trait_slot(player_id, trait_id) for trait_id in trait_ids} - {None}
+    applied = _set_bits(player_id, "revealed", {1 << slot for slot in slots})
+    return sorted(trait_pk(player_id, slot) for slot in slots if 1 << slot in applied)
+
+
+def kill_players(room_id, player_ids):
+    """Kills living players of the room among player_ids, returns the ids that changed"""
+    return _apply(Player.objects.filter(room_id=room_id, is_alive=True, pk__in=player_ids), is_alive=False)
+
+
+def use_cards(field, player_id, card_ids):
+    """Marks the player's own card among card_ids (its pk is the player id) as used, returns the ids that changed"""
+    if player_id not in card_ids:
+        return []
+    return [player_id] if _set_bits(player_id, "cards_used", {CARD_FIELDS[field][1]}) else []
@@ -1,3 +1,1191 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import os
+import random
+import tempfile
+import threading
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.apps import apps
+from django.contrib.admin import site
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from main.db_router import ReplicaRouter, health, replica_reads, PRIMARY_PIN_COOKIE, PRIMARY_PIN_HEADER
+from main.models import (
+    Room,
+    Player,
+    Trait,
+    TraitType,
+    ActionCard,
+    ReactionCard,
+    ShelterDescription,
+    Catastrophe,
+    PreparedDeck,
+    ArchivedGame,
+    RoomChange,
+    RoomCatastrophe,
+    ChangeKind,
+)
+from main.renderers import FastJSONRenderer
+from main.serializers import RoomRetrieveSerializer, PlayerSerializer
+from main.services.archive import archive_idle_rooms, jsonl_writer
+from main.services.catalog import Catalog, TraitRecord, get_catalog, invalidate_catalog
+from main.services.events import LocalEventBackend
+from main.services.catalog_io import import_catalog, export_catalog, CatalogImportError
+from main.services.queries import room_detail_queryset, player_detail_queryset
+from main.services.deck_pool import fill_pool, pool_stats
+from main.services.response_cache import get_response_cache, LocalResponseCache
+from main.services.reaper import delete_rooms, room_tables
+from main.services.room_delta import ROOM_DELTA_MAX_REVISIONS
+from main.services.room_state import room_changed, ROOM_JOURNAL_PRUNE_EVERY
+from main.services.sheets import SLOT_TYPES, trait_pk, keep_deleted_texts
+from main.services.draw_content import DeckKey, plan_game_content, DIFFICULTY_TO_POWER, BALANCE_TO_DEV
+from main.services.trait_solver import balance_traits
+from main.services import room_balancer
+from main.utils import allocate_room_code
+from main.views import RoomEventStreamView, PlayerUpdateAPIView
+
+
+class QueryBudgetTestCase(TestCase):
+    """Seeded catalog and helpers to check that an endpoint costs the same queries for any room size"""
+
+    # SQLite caps query parameters and splits bulk inserts past ~200 trait rows, so the largest
+    # size stays under that to keep budgets comparable across backends
+    ROOM_SIZES = (4, 20)
+
+    @classmethod
+    def setUpTestData(cls):
+        Trait.objects.bulk_create([
+            Trait(trait_type=trait_type, description=f"{trait_type} {power}", power=power)
+            for trait_type in TraitType.values
+            if trait_type != TraitType.BIO
+            for power in range(-10, 11)
+        ])
+        ActionCard.objects.bulk_create([ActionCard(description=f"action {i}") for i in range(3)])
+        ReactionCard.objects.bulk_create([ReactionCard(description=f"reaction {i}") for i in range(3)])
+        ShelterDescription.objects.bulk_create([
+            ShelterDescription(size=size, difficulty=difficulty, description=f"shelter {size}/{difficulty}")
+            for size in (1, 2, 3)
+            for difficulty in range(1, 6)
+        ])
+        Catastrophe.objects.bulk_create([
+            Catastrophe(severity=severity, title=f"catastrophe {severity}", description="...")
+            for severity in range(1, 6)
+        ])
+
+    def setUp(self):
+        # Контент и блок кодов комнат живут в памяти процесса - прогреваем, чтобы они не попадали в бюджет
+        invalidate_catalog()
+        get_catalog()
+        allocate_room_code()
+        # Id и ревизии комнат повторяются между тестами (откат транзакции)
+        get_response_cache().clear()
+
+    def post(self, url, data=None):
+        return self.client.post(url, data or {}, content_type="application/json")
+
+    def create_room(self, players_count):
+        response = self.post(
+            "/api/rooms/",
+            {"players_count": players_count, "difficulty": 3, "balance": 3, "severity": 3},
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def join(self, room, device_id):
+        response = self.post(f"/api/rooms/{room['code']}/join/", {"device_id": device_id})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assertQueryBudget(self, budget, action, prepare=None):
+        """Runs `action(room, host)` against rooms of every size under the same query budget"""
+        for players_count in self.ROOM_SIZES:
+            with self.subTest(players_count=players_count):
+                room = self.create_room(players_count)
+                host = self.join(room, f"host-{players_count}")
+                if prepare:
+                    prepare(room, host)
+                with self.assertNumQueries(budget):
+                    response = action(room, host)
+                self.assertLess(response.status_code, 400)
+
+
+class QueryBudgetTests(QueryBudgetTestCase):
+    """Every endpoint costs a fixed number of queries, whatever the size of the room"""
+
+    def test_room_create(self):
+        for players_count in self.ROOM_SIZES:
+            with self.subTest(players_count=players_count):
+                # Пул по умолчанию выключен - без запроса к нему
+                with self.assertNumQueries(10):
+                    self.create_room(players_count)
+
+    @override_settings(ROOM_DECK_POOL=True)
+    def test_room_create_from_pool(self):
+        for players_count in self.ROOM_SIZES:
+            with self.subTest(players_count=players_count):
+                fill_pool([DeckKey(players_count, 3, 3, 3)], per_key=1)
+                with self.assertNumQueries(12):
+                    response = self.post(
+                        "/api/rooms/",
+                        {"players_count": players_count, "difficulty": 3, "balance": 3, "severity": 3},
+                    )
+                self.assertEqual(response["X-Generation-Source"], "pool")
+                self.assertEqual(len(response.json()["players"]), players_count)
+                self.assertFalse(PreparedDeck.objects.exists())
+
+        # Промах - пул пуст; попадания и промахи записаны в самих комнатах
+        self.create_room(4)
+        self.assertEqual(pool_stats()[:2], (len(self.ROOM_SIZES), 1))
+
+    def test_room_retrieve(self):
+        self.assertQueryBudget(3, lambda room, host: self.client.get(f"/api/rooms/{room['code']}/"))
+
+    def test_room_retrieve_cached(self):
+        def prepare(room, host):
+            room["body"] = self.client.get(f"/api/rooms/{room['code']}/").content
+
+        def action(room, host):
+            response = self.client.get(f"/api/rooms/{room['code']}/")
+            self.assertEqual(response.content, room["body"])
+            return response
+
+        self.assertQueryBudget(1, action, prepare)
+
+    def test_room_cache_follows_revision(self):
+        room = self.create_room(4)
+        host = self.join(room, "host")
+        before = self.client.get(f"/api/rooms/{room['code']}/").json()
+
+        self.post(f"/api/players/{host['id']}/kill/", {"deviceId": "host"})
+        after = self.client.get(f"/api/rooms/{room['code']}/").json()
+
+        self.assertTrue(before["players"][0]["is_alive"])
+        self.assertFalse(after["players"][0]["is_alive"])
+
+    def test_room_retrieve_not_modified(self):
+        def prepare(room, host):
+            room["etag"] = self.client.get(f"/api/rooms/{room['code']}/")["ETag"]
+
+        def action(room, host):
+            response = self.client.get(f"/api/rooms/{room['code']}/", HTTP_IF_NONE_MATCH=room["etag"])
+            self.assertEqual(response.status_code, 304)
+            return response
+
+        self.assertQueryBudget(1, action, prepare)
+
+    def test_room_delta(self):
+        self.assertQueryBudget(3, lambda room, host: self.client.get(f"/api/rooms/{room['code']}/?since=0"))
+
+    def test_room_table_view(self):
+        self.assertQueryBudget(3, lambda room, host: self.client.get(f"/api/rooms/{room['code']}/?view=table"))
+
+    def test_room_fields(self):
+        self.assertQueryBudget(
+            3, lambda room, host: self.client.get(f"/api/rooms/{room['code']}/?fields=seat,nickname,is_alive")
+        )
+
+    def test_room_restart(self):
+        self.assertQueryBudget(14, lambda room, host: self.post(f"/api/rooms/{room['code']}/restart/"))
+
+    def test_start_game(self):
+        self.assertQueryBudget(
+            5, lambda room, host: self.post(f"/api/rooms/{room['code']}/start/", {"device_id": host["device_id"]})
+        )
+
+    def test_join(self):
+        self.assertQueryBudget(
+            7, lambda room, host: self.post(f"/api/rooms/{room['code']}/join/", {"device_id": f"guest-{room['code']}"})
+        )
+
+    def test_leave(self):
+        self.assertQueryBudget(
+            6,
+            lambda room, host: self.post(f"/api/rooms/{room['code']}/leave/", {"device_id": f"guest-{room['code']}"}),
+            prepare=lambda room, host: self.join(room, f"guest-{room['code']}"),
+        )
+
+    def test_player_retrieve(self):
+        self.assertQueryBudget(2, lambda room, host: self.client.get(f"/api/players/{host['id']}/"))
+
+    def test_player_table_view(self):
+        self.assertQueryBudget(2, lambda room, host: self.client.get(f"/api/players/{host['id']}/?view=table"))
+
+    def test_player_update(self):
+        self.assertQueryBudget(
+            5,
+            lambda room, host: self.client.patch(
+                f"/api/rooms/{room['code']}/player/",
+                {"device_id": host["device_id"], "nickname": "host"},
+                content_type="application/json",
+            ),
+        )
+
+    def test_reveal_trait(self):
+        self.assertQueryBudget(
+            3,
+            lambda room, host: self.post(
+                f"/api/players/{host['id']}/traits/{host['player_traits'][0]['pk']}/reveal/",
+                {"device_id": host["device_id"]},
+            ),
+        )
+
+    def test_kill_player(self):
+        self.assertQueryBudget(
+            3,
+            lambda room, host: self.post(
+                f"/api/players/{room['players'][1]['id']}/kill/", {"deviceId": host["device_id"]}
+            ),
+        )
+
+    def test_use_action_card(self):
+        self.assertQueryBudget(
+            3, lambda room, host: self.post(
+                f"/api/action/{host['action_card']['pk']}/use/", {"device_id": host["device_id"]}
+            )
+        )
+
+    def test_use_reaction_card(self):
+        self.assertQueryBudget(
+            3, lambda room, host: self.post(
+                f"/api/reaction/{host['reaction_card']['pk']}/use/", {"device_id": host["device_id"]}
+            )
+        )
+
+    def test_player_by_device(self):
+        self.assertQueryBudget(
+            1, lambda room, host: self.post("/api/players/by-device/", {"device_id": host["device_id"]})
+        )
+
+    def test_room_actions(self):
+        def action(room, host):
+            return self.post(f"/api/rooms/{room['code']}/actions/", {
+                "device_id": host["device_id"],
+                "actions": [
+                    *({"type": "reveal", "id": trait["pk"]} for trait in host["player_traits"]),
+                    *({"type": "kill", "id": player["id"]} for player in room["players"][1:]),
+                    {"type": "use_action_card", "id": host["action_card"]["pk"]},
+                    {"type": "use_reaction_card", "id": host["reaction_card"]["pk"]},
+                ],
+            })
+
+        # Каждый тип действия - SELECT ... FOR UPDATE и UPDATE
+        self.assertQueryBudget(13, action)
+
+
+class AsyncViewQueryBudgetTests(QueryBudgetTestCase):
+    """The /api/async/ views answer like their sync twins and cost the same queries"""
+
+    def async_get(self, url, **extra):
+        return async_to_sync(self.async_client.get)(url, **extra)
+
+    def async_post(self, url, data=None):
+        return async_to_sync(self.async_client.post)(url, data or {}, content_type="application/json")
+
+    def test_room_retrieve(self):
+        def prepare(room, host):
+            room["sync"] = self.client.get(f"/api/rooms/{room['code']}/")
+            get_response_cache().clear()
+
+        def action(room, host):
+            response = self.async_get(f"/api/async/rooms/{room['code']}/")
+            self.assertEqual(response.json(), room["sync"].json())
+            self.assertEqual(response["ETag"], room["sync"]["ETag"])
+            return response
+
+        self.assertQueryBudget(3, action, prepare)
+
+    def test_join_with_cold_catalog(self):
+        room = self.create_room(4)
+        invalidate_catalog()
+        response = self.async_post(f"/api/async/rooms/{room['code']}/join/", {"device_id": "host"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["player_traits"])
+
+    def test_room_retrieve_not_modified(self):
+        def prepare(room, host):
+            room["etag"] = self.async_get(f"/api/async/rooms/{room['code']}/")["ETag"]
+
+        def action(room, host):
+            response = self.async_get(f"/api/async/rooms/{room['code']}/", headers={"If-None-Match": room["etag"]})
+            self.assertEqual(response.status_code, 304)
+            return response
+
+        self.assertQueryBudget(1, action, prepare)
+
+    def test_room_delta(self):
+        self.assertQueryBudget(3, lambda room, host: self.async_get(f"/api/async/rooms/{room['code']}/?since=0"))
+
+    def test_room_table_view(self):
+        url = "rooms/{code}/?view=own&device_id={device_id}&fields=seat,is_alive,player_traits"
+
+        def prepare(room, host):
+            room["sync"] = self.client.get("/api/" + url.format(code=room["code"], device_id=host["device_id"]))
+
+        def action(room, host):
+            response = self.async_get("/api/async/" + url.format(code=room["code"], device_id=host["device_id"]))
+            self.assertEqual(response.json(), room["sync"].json())
+            return response
+
+        # Тело уже отрендерено синхронным запросом - общий кеш ответов
+        self.assertQueryBudget(1, action, prepare)
+
+    def test_join(self):
+        def action(room, host):
+            response = self.async_post(f"/api/async/rooms/{room['code']}/join/", {"device_id": f"guest-{room['code']}"})
+            self.assertEqual(response.json()["device_id"], f"guest-{room['code']}")
+            return response
+
+        self.assertQueryBudget(7, action)
+
+    def test_reveal_trait(self):
+        def action(room, host):
+            trait = host["player_traits"][0]["pk"]
+            response = self.async_post(
+                f"/api/async/players/{host['id']}/traits/{trait}/reveal/", {"device_id": host["device_id"]}
+            )
+            self.assertEqual(response.json(), {"trait_id": trait, "is_revealed": True})
+            return response
+
+        self.assertQueryBudget(3, action)
+
+    def test_player_by_device(self):
+        def action(room, host):
+            response = self.async_post("/api/async/players/by-device/", {"device_id": host["device_id"]})
+            self.assertEqual(response.json(), {"room": None})
+            return response
+
+        self.assertQueryBudget(1, action)
+
+
+class ProjectionTests(QueryBudgetTestCase):
+    """Table views never carry other players' hidden traits, card texts or devices"""
+
+    def test_room_views(self):
+        room = self.create_room(4)
+        host = self.join(room, "host")
+        self.join(room, "guest")
+        revealed = host["player_traits"][0]["pk"]
+        self.post(f"/api/players/{host['id']}/traits/{revealed}/reveal/", {"device_id": "host"})
+
+        table = self.client.get(f"/api/rooms/{room['code']}/?view=table").json()
+        for player in table["players"]:
+            self.assertNotIn("device_id", player)
+            self.assertIsNone(player["action_card"]["description"])
+        self.assertEqual([trait["pk"] for trait in table["players"][0]["player_traits"]], [revealed])
+        self.assertEqual(table["players"][1]["player_traits"], [])
+
+        own = self.client.get(f"/api/rooms/{room['code']}/?view=own&device_id=guest&fields=seat,device_id,player_traits")
+        own = own.json()
+        guest = own["players"][1]
+        self.assertEqual(own["own_player"], room["players"][1]["id"])
+        self.assertEqual(set(guest), {"seat", "device_id", "player_traits"})
+        self.assertEqual(guest["device_id"], "guest")
+        self.assertEqual(len(guest["player_traits"]), len(host["player_traits"]))
+        self.assertNotIn("device_id", own["players"][0])
+
+        self.assertEqual(self.client.get(f"/api/rooms/{room['code']}/?view=own").status_code, 400)
+        self.assertEqual(self.client.get(f"/api/rooms/{room['code']}/?fields=bogus").status_code, 400)
+        self.assertEqual(self.client.get(f"/api/rooms/{room['code']}/?view=own&device_id=nobody").status_code, 404)
+
+    def test_delta_follows_view(self):
+        room = self.create_room(4)
+        host = self.join(room, "host")
+        since = Room.objects.get(code=room["code"]).revision
+        guest = self.join(room, "guest")
+        trait = host["player_traits"][0]["pk"]
+        self.post(f"/api/players/{host['id']}/traits/{trait}/reveal/", {"device_id": "host"})
+
+        url = f"/api/rooms/{room['code']}/?since={since}"
+        full = self.client.get(url).json()
+        self.assertEqual(full["players"][0]["device_id"], "guest")
+        self.assertEqual([change["pk"] for change in full["traits"]], [trait])
+
+        table = self.client.get(url + "&view=table").json()
+        self.assertFalse(table["full"])
+        self.assertEqual(table["players"], [{"id": guest["id"], "seat": guest["seat"], "is_host": False,
+                                             "is_alive": True, "nickname": guest["nickname"]}])
+        self.assertEqual(table["traits"], full["traits"])
+
+        own = self.client.get(url + "&view=own&device_id=guest&fields=seat,device_id").json()
+        self.assertEqual(own["players"], [{"id": guest["id"], "seat": guest["seat"], "device_id": "guest"}])
+        self.assertEqual((own["traits"], own["own_player"]), ([], guest["id"]))
+        self.assertEqual(self.client.get(url + "&view=own&device_id=nobody").status_code, 404)
+
+    def test_delta_fields_without_traits(self):
+        room = self.create_room(4)
+        host = self.join(room, "host")
+        since = Room.objects.get(code=room["code"]).revision
+        self.client.patch(f"/api/rooms/{room['code']}/player/", {"device_id": "host", "nickname": "renamed"},
+                          content_type="application/json")
+        trait = host["player_traits"][0]["pk"]
+        self.post(f"/api/players/{host['id']}/traits/{trait}/reveal/", {"device_id": "host"})
+
+        url = f"/api/rooms/{room['code']}/?since={since}"
+        own = self.client.get(url + "&view=own&device_id=host&fields=seat")
+        self.assertEqual(own.status_code, 200)
+        self.assertEqual(own.json()["traits"], [])
+
+        table = self.client.get(url + "&fields=seat,nickname")
+        self.assertEqual(table.status_code, 200)
+        self.assertEqual(table.json()["players"], [{"id": host["id"], "seat": host["seat"], "nickname": "renamed"}])
+        self.assertEqual(table.json()["traits"], [])
+
+    def test_player_views(self):
+        room = self.create_room(4)
+        host = self.join(room, "host")
+
+        self.assertEqual(self.client.get(f"/api/players/{host['id']}/?view=own&device_id=guest").status_code, 403)
+        own = self.client.get(f"/api/players/{host['id']}/?view=own&device_id=host").json()
+        self.assertEqual(len(own["player_traits"]), len(host["player_traits"]))
+        self.assertEqual(own["action_card"], host["action_card"])
+
+
+class RenderingTests(QueryBudgetTestCase):
+    def test_fast_renderer_matches_drf(self):
+        room = self.create_room(4)
+        data = RoomRetrieveSerializer(room_detail_queryset().get(code=room["code"])).data
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+    def test_gzip_above_threshold(self):
+        room = self.create_room(24)
+        plain = self.client.get(f"/api/rooms/{room['code']}/")
+        packed = self.client.get(f"/api/rooms/{room['code']}/", HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertEqual(packed["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", packed["Vary"])
+        self.assertEqual(gzip.decompress(packed.content), plain.content)
+
+        # Слабый ETag сжатого ответа по-прежнему дает 304
+        self.assertEqual(packed["ETag"], "W/" + plain["ETag"])
+        again = self.client.get(
+            f"/api/rooms/{room['code']}/", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=packed["ETag"]
+        )
+        self.assertEqual(again.status_code, 304)
+
+        small = self.client.post("/api/players/by-device/", {"device_id": "x"}, content_type="application/json")
+        self.assertNotIn("Content-Encoding", small)
+
+    def test_etag_follows_media_type(self):
+        room = self.create_room(4)
+        url = f"/api/rooms/{room['code']}/"
+        plain = self.client.get(url)
+        self.assertIn("Accept", plain["Vary"])
+
+        html = self.client.get(url, HTTP_ACCEPT="text/html", HTTP_IF_NONE_MATCH=plain["ETag"])
+        self.assertEqual(html.status_code, 200)
+        self.assertNotEqual(html["ETag"], plain["ETag"])
+
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=plain["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertIn("Accept", again["Vary"])
+
+
+class StateTransitionTests(QueryBudgetTestCase):
+    """Repeated taps change nothing and fall back to the same answers as before"""
+
+    def revision(self, room):
+        return Room.objects.get(code=room["code"]).revision
+
+    def test_repeated_actions_apply_once(self):
+        room = self.create_room(4)
+        host = self.join(room, "host")
+        guest = self.join(room, "guest")
+        trait = host["player_traits"][0]["pk"]
+
+        requests = [
+            (f"/api/players/{host['id']}/traits/{trait}/reveal/", {"device_id": "host"}, 200),
+            (f"/api/players/{guest['id']}/kill/", {"deviceId": "host"}, 200),
+            (f"/api/action/{host['action_card']['pk']}/use/", {"device_id": "host"}, 400),
+            (f"/api/reaction/{host['reaction_card']['pk']}/use/", {"device_id": "host"}, 400),
+        ]
+        for url, data, repeat_status in requests:
+            with self.subTest(url=url):
+                self.assertEqual(self.post(url, data).status_code, 200)
+                revision = self.revision(room)
+                self.assertEqual(self.post(url, data).status_code, repeat_status)
+                self.assertEqual(self.revision(room), revision)
+
+    def test_start_keeps_concurrent_revision(self):
+        room = self.create_room(4)
+        host = self.join(room, "host")
+        load = Room.objects.get
+
+        def load_then_join(*args, **kwargs):
+            # Кто-то подключается между чтением комнаты и записью флага
+            loaded = load(*args, **kwargs)
+            room_changed("player_joined", loaded.pk, changes=[(ChangeKind.PLAYER, host["id"])])
+            return loaded
+
+        with mock.patch.object(Room.objects, "get", side_effect=load_then_join):
+            self.assertEqual(self.post(f"/api/rooms/{room['code']}/start/", {"device_id": "host"}).status_code, 200)
+
+        current = Room.objects.get(code=room["code"])
+        revisions = list(RoomChange.objects.filter(room=current).values_list("revision", flat=True))
+        self.assertTrue(current.is_playing)
+        self.assertEqual(len(revisions), len(set(revisions)))
+        self.assertEqual(current.revision, max(revisions))
+
+    def test_update_keeps_concurrent_reveal(self):
+        room = self.create_room(4)
+        host = self.join(room, "host")
+        stale = player_detail_queryset().get(pk=host["id"])
+        trait = host["player_traits"][0]["pk"]
+        self.post(f"/api/players/{host['id']}/traits/{trait}/reveal/", {"device_id": "host"})
+
+        # Экземпляр загружен до открытия характеристики - PATCH ника не должен ее закрыть
+        with mock.patch.object(PlayerUpdateAPIView, "get_object", return_value=stale):
+            response = self.client.patch(f"/api/rooms/{room['code']}/player/",
+                                         {"device_id": "host", "nickname": "renamed"},
+                                         content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+
+        player = Player.objects.get(pk=host["id"])
+        self.assertEqual(player.nickname, "renamed")
+        self.assertNotEqual(player.revealed, stale.revealed)
+
+    def test_room_actions_skip_foreign_and_repeated(self):
+        room = self.create_room(4)
+        host = self.join(room, "host")
+        guest = self.join(room, "guest")
+        url = f"/api/rooms/{room['code']}/actions/"
+        actions = [
+            {"type": "reveal", "id": host["player_traits"][0]["pk"]},
+            {"type": "reveal", "id": guest["player_traits"][0]["pk"]},
+            {"type": "use_action_card", "id": guest["action_card"]["pk"]},
+        ]
+
+        response = self.post(url, {"device_id": "guest", "actions": actions})
+        revision = self.revision(room)
+        self.assertEqual(response.json(), {
+            "revision": revision,
+            "applied": {
+                "reveal": [guest["player_traits"][0]["pk"]],
+                "use_action_card": [guest["action_card"]["pk"]],
+            },
+        })
+
+        response = self.post(url, {"device_id": "guest", "actions": actions})
+        self.assertEqual(response.json(), {"revision": revision, "applied": {"reveal": [], "use_action_card": []}})
+        self.assertEqual(self.revision(room), revision)
+
+        kill = {"device_id": "guest", "actions": [{"type": "kill", "id": host["id"]}]}
+        self.assertEqual(self.post(url, kill).status_code, 403)
+        self.assertEqual(self.post(url, {"device_id": "guest", "actions": []}).status_code, 400)
+
+    def test_ownership_checks(self):
+        room = self.create_room(4)
+        host = self.join(room, "host")
+        guest = self.join(room, "guest")
+        trait = host["player_traits"][0]["pk"]
+        revision = self.revision(room)
+
+        self.assertEqual(
+            self.post(f"/api/players/{host['id']}/traits/{trait}/reveal/", {"device_id": "guest"}).status_code, 403
+        )
+        self.assertEqual(self.post(f"/api/players/{host['id']}/kill/", {"deviceId": "guest"}).status_code, 403)
+        self.assertEqual(
+            self.post(f"/api/action/{host['action_card']['pk']}/use/", {"device_id": "guest"}).status_code, 403
+        )
+        self.assertEqual(self.post(f"/api/action/{host['action_card']['pk']}/use/").status_code, 400)
+        self.assertEqual(self.post(f"/api/players/{guest['id']}/traits/0/reveal/", {"device_id": "guest"}).status_code, 404)
+        self.assertEqual(self.post(f"/api/action/{guest['id'] + 1000}/use/", {"device_id": "guest"}).status_code, 404)
+        self.assertEqual(Player.objects.get(pk=host["id"]).revealed, 0)
+        self.assertEqual(self.revision(room), revision)
+
+
+class RoomJournalTests(QueryBudgetTestCase):
+    """The change journal stays bounded and deltas past it fall back to a snapshot"""
+
+    def test_journal_is_pruned(self):
+        room = self.create_room(4)
+        room_id = Room.objects.get(code=room["code"]).pk
+        for _ in range(ROOM_DELTA_MAX_REVISIONS + ROOM_JOURNAL_PRUNE_EVERY):
+            touched = room_changed("game_started", room_id)
+
+        revisions = RoomChange.objects.filter(room_id=room_id).values_list("revision", flat=True)
+        self.assertEqual(min(revisions), touched.revision - ROOM_DELTA_MAX_REVISIONS + 1)
+
+        url = f"/api/rooms/{room['code']}/?since="
+        self.assertFalse(self.client.get(url + str(touched.revision - ROOM_DELTA_MAX_REVISIONS)).json()["full"])
+        self.assertTrue(self.client.get(url + str(touched.revision - ROOM_DELTA_MAX_REVISIONS - 1)).json()["full"])
+
+
+class SeededDeckTests(QueryBudgetTestCase):
+    """A room's deck is a function of its seed, key and the catalog"""
+
+    def sheet(self, room, seat):
+        player = player_detail_queryset().get(room__code=room["code"], seat=seat)
+        return [(trait["trait_type"], trait["description"]) for trait in PlayerSerializer(player).data["player_traits"]]
+
+    def test_same_seed_same_deck(self):
+        key = DeckKey(8, 3, 3, 3)
+        self.assertEqual(plan_game_content(key, get_catalog(), 42), plan_game_content(key, get_catalog(), 42))
+        self.assertNotEqual(plan_game_content(key, get_catalog(), 42), plan_game_content(key, get_catalog(), 43))
+
+    def test_room_rows_replay_from_seed(self):
+        room = self.create_room(4)
+        seed = Room.objects.get(code=room["code"]).seed
+        plan = plan_game_content(DeckKey(4, 3, 3, 3), get_catalog(), seed)
+
+        traits = get_catalog().traits
+        self.assertEqual(
+            sorted(self.sheet(room, 2)),
+            sorted(
+                [(TraitType.BIO, plan["seats"][1]["bio"])]
+                + [(traits[pk].trait_type, traits[pk].description) for pk in plan["seats"][1]["traits"]]
+            ),
+        )
+        self.assertEqual(Room.objects.get(code=room["code"]).deck, {"seats": plan["seats"]})
+
+    def test_restart_reseeds(self):
+        room = self.create_room(4)
+        host = self.join(room, "host")
+        seed = Room.objects.get(code=room["code"]).seed
+
+        self.post(f"/api/rooms/{room['code']}/restart/", {"device_id": "host"})
+        reseeded = Room.objects.get(code=room["code"]).seed
+        self.assertNotEqual(reseeded, seed)
+
+        plan = plan_game_content(DeckKey(4, 3, 3, 3), get_catalog(), reseeded)
+        self.assertIn((TraitType.BIO, plan["seats"][host["seat"] - 1]["bio"]), self.sheet(room, host["seat"]))
+        self.assertEqual(Room.objects.get(code=room["code"]).deck, {"seats": plan["seats"]})
+
+
+    def test_missing_slot_is_not_dealt(self):
+        Trait.objects.filter(trait_type=TraitType.ITEM).delete()
+        invalidate_catalog()
+        room = self.create_room(4)
+        host = self.join(room, "host")
+
+        self.assertNotIn(TraitType.ITEM, [trait["trait_type"] for trait in host["player_traits"]])
+        missing = trait_pk(host["id"], SLOT_TYPES.index(TraitType.ITEM))
+        response = self.post(f"/api/players/{host['id']}/traits/{missing}/reveal/", {"device_id": "host"})
+        self.assertEqual(response.status_code, 404)
+
+
+class AssignmentTextTests(QueryBudgetTestCase):
+    """Decks reference catalog rows, deleting a row through the admin leaves its text in the decks"""
+
+    def test_catalog_delete_keeps_text(self):
+        room = self.create_room(4)
+        host = self.join(room, "host")
+        drawn = next(trait for trait in host["player_traits"] if trait["trait_type"] != TraitType.BIO)
+        sheet = Room.objects.get(code=room["code"]).deck["seats"][host["seat"] - 1]
+        trait_id = next(ref for ref in sheet["traits"] if get_catalog().traits[ref].description == drawn["description"])
+
+        site.get_model_admin(Trait).delete_queryset(None, Trait.objects.filter(pk=trait_id))
+        site.get_model_admin(ActionCard).delete_model(None, ActionCard.objects.get(pk=sheet["action_card"]))
+        invalidate_catalog()
+
+        sheet = Room.objects.get(code=room["code"]).deck["seats"][host["seat"] - 1]
+        self.assertIn(drawn["description"], sheet["traits"])
+        self.assertEqual(sheet["action_card"], host["action_card"]["description"])
+
+        response = self.client.get(f"/api/players/{host['id']}/")
+        self.assertEqual(response.json()["player_traits"], host["player_traits"])
+        self.assertEqual(response.json()["action_card"], host["action_card"])
+
+
+class RoomBalancerTests(QueryBudgetTestCase):
+    """ROOM_TRAIT_BALANCER = "room": all seats balanced together, per-seat fallback without NumPy"""
+
+    def totals(self, plan):
+        traits = get_catalog().traits
+        return [sum(traits[pk].power for pk in seat["traits"]) for seat in plan["seats"]]
+
+    @skipUnless(room_balancer.np is not None, "numpy is not installed")
+    @override_settings(ROOM_TRAIT_BALANCER="room")
+    def test_room_totals_are_even(self):
+        for difficulty, balance in ((1, 5), (3, 3), (5, 1)):
+            with self.subTest(difficulty=difficulty, balance=balance):
+                key = DeckKey(30, difficulty, balance, 3)
+                plan = plan_game_content(key, get_catalog(), 7)
+                totals = self.totals(plan)
+
+                self.assertEqual(plan, plan_game_content(key, get_catalog(), 7))
+                self.assertLessEqual(max(totals) - min(totals), 1)
+                target, dev = DIFFICULTY_TO_POWER[difficulty], BALANCE_TO_DEV[balance]
+                self.assertTrue(all(target - dev <= total <= target + dev for total in totals))
+                self.assertTrue(all(len(seat["traits"]) == len(TraitType.values) - 1 for seat in plan["seats"]))
+
+    @override_settings(ROOM_TRAIT_BALANCER="room")
+    def test_falls_back_without_numpy(self):
+        with mock.patch.object(room_balancer, "np", None), self.assertLogs("main.services.draw_content", "WARNING"):
+            plan = plan_game_content(DeckKey(4, 3, 3, 3), get_catalog(), 7)
+
+        with override_settings(ROOM_TRAIT_BALANCER="seat"):
+            self.assertEqual(plan, plan_game_content(DeckKey(4, 3, 3, 3), get_catalog(), 7))
+
+
+class TraitSolverTests(SimpleTestCase):
+    """balance_traits на каталоге в памяти: без базы, только бисекции по силам"""
+
+    def catalog(self, powers):
+        traits = [
+            TraitRecord(len(powers) * i + j, t_type, f"{t_type} {power}", power)
+            for i, t_type in enumerate(TraitType.values)
+            for j, power in enumerate(powers)
+        ]
+        return Catalog(traits, [], [], [], [])
+
+    def test_feasible_window_is_reached(self):
+        catalog = self.catalog(range(-10, 11))
+        for seed in range(50):
+            with self.subTest(seed=seed):
+                traits = balance_traits(catalog, TraitType.values, 15, 1, random.Random(seed))
+
+                self.assertEqual([t.trait_type for t in traits], TraitType.values)
+                self.assertLessEqual(abs(sum(t.power for t in traits) - 15), 1)
+
+        self.assertEqual(
+            balance_traits(catalog, TraitType.values, 15, 1, random.Random(7)),
+            balance_traits(catalog, TraitType.values, 15, 1, random.Random(7)),
+        )
+
+    def test_infeasible_window_keeps_closest_sheet(self):
+        catalog = self.catalog(range(3))
+        traits = balance_traits(catalog, TraitType.values, 100, 1, random.Random(7))
+
+        self.assertEqual([t.trait_type for t in traits], TraitType.values)
+        self.assertEqual([t.power for t in traits], [2] * len(TraitType.values))
+
+
+class ReaperTests(QueryBudgetTestCase):
+    def test_delete_plan_covers_every_table(self):
+        plan = {model for model, _ in room_tables()}
+        for model in apps.get_app_config("main").get_models():
+            for field in model._meta.concrete_fields:
+                if field.is_relation and field.related_model in plan:
+                    self.assertIn(model, plan, f"{model._meta.label}.{field.name} isn't deleted with its room")
+
+    def test_delete_rooms(self):
+        room = self.create_room(4)
+        self.join(room, "host")
+        room_id = Room.objects.get(code=room["code"]).pk
+
+        deleted = delete_rooms([room_id])
+        self.assertEqual(deleted["main.Player"], 4)
+        for model, lookup in room_tables():
+            self.assertFalse(model.objects.filter(**{lookup: [room_id]}).exists(), model._meta.label)
+
+
+class ArchiveTests(QueryBudgetTestCase):
+    """Idle rooms move into one document each and leave the live tables"""
+
+    def idle_rooms(self):
+        played = self.create_room(4)
+        host = self.join(played, "host")
+        self.post(f"/api/players/{host['id']}/traits/{host['player_traits'][0]['pk']}/reveal/", {"device_id": "host"})
+        self.join(played, "guest")
+        self.post(f"/api/rooms/{played['code']}/leave/", {"device_id": "guest"})
+        self.create_room(4)  # Никто не подключился - удаляется без документа
+        fresh = self.create_room(4)
+
+        Room.objects.exclude(code=fresh["code"]).update(updated_at=timezone.now() - timedelta(days=1))
+        return played, host, fresh
+
+    def test_archive_to_table(self):
+        played, host, fresh = self.idle_rooms()
+        card_id = Room.objects.get(code=played["code"]).deck["seats"][host["seat"] - 1]["action_card"]
+        catastrophe = RoomCatastrophe.objects.get(room__code=played["code"]).catastrophe
+        # Удаленная из каталога карта остается в документе текстом без id
+        keep_deleted_texts(ActionCard, [card_id])
+        ActionCard.objects.filter(pk=card_id).delete()
+
+        report = archive_idle_rooms(chunk_size=1)
+        self.assertEqual((report.rooms, report.archived, report.discarded), (2, 1, 1))
+        self.assertEqual(list(Room.objects.values_list("code", flat=True)), [fresh["code"]])
+        self.assertFalse(Player.objects.exclude(room__code=fresh["code"]).exists())
+
+        game = ArchivedGame.objects.get()
+        self.assertEqual(game.code, played["code"])
+        # Все места стола, ушедший посреди игры гость - тоже
+        players = game.document["players"]
+        self.assertEqual([(p["seat"], p["seated"]) for p in players], [(1, True), (2, False), (3, False), (4, False)])
+        self.assertEqual(len(players[1]["traits"]), len(host["player_traits"]) - 1)
+        player = players[0]
+        self.assertEqual(player["seat"], host["seat"])
+        # Тексты разрешены в документ: он не зависит от каталога после удаления комнаты
+        traits = {trait["trait_type"]: trait for trait in host["player_traits"]}
+        bio = traits.pop("bio")
+        self.assertEqual(player["bio"][0], bio["description"])
+        self.assertEqual(
+            [trait[:3] for trait in player["traits"]],
+            [[t_type, mock.ANY, trait["description"]] for t_type, trait in traits.items()],
+        )
+        self.assertEqual(sum(trait[3] for trait in player["traits"]) + player["bio"][1], 1)
+        self.assertEqual(player["action_card"], [None, host["action_card"]["description"], False])
+        self.assertEqual(game.document["catastrophe"]["title"], catastrophe.title)
+
+    def test_archive_to_jsonl(self):
+        played, host, fresh = self.idle_rooms()
+        stream = io.StringIO()
+
+        report = archive_idle_rooms(write=jsonl_writer(stream))
+        self.assertEqual(report.archived, 1)
+        self.assertFalse(ArchivedGame.objects.exists())
+
+        [line] = stream.getvalue().splitlines()
+        record = json.loads(line)
+        self.assertEqual(record["code"], played["code"])
+        self.assertEqual(record["game"]["players"][0]["nickname"], host["nickname"])
+
+
+class CatalogIOTests(QueryBudgetTestCase):
+    """Catalog export reads back as a no-op import, upserts match by text or id, bad rows roll back"""
+
+    def export(self, fmt="csv", **kwargs):
+        stream = io.StringIO()
+        export_catalog(stream, fmt, **kwargs)
+        return stream.getvalue()
+
+    def import_rows(self, text, fmt="csv", **kwargs):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            report = import_catalog(io.StringIO(text), fmt, **kwargs)
+        return report, callbacks
+
+    def test_round_trip_is_unchanged(self):
+        for fmt in ("csv", "jsonl"):
+            with self.subTest(fmt=fmt):
+                report, callbacks = self.import_rows(self.export(fmt), fmt)
+                self.assertEqual((report.created, report.updated), ({}, {}))
+                self.assertEqual(report.unchanged["trait"], Trait.objects.count())
+                self.assertEqual(report.unchanged["catastrophe"], 5)
+                self.assertEqual(callbacks, [])
+
+    def test_natural_key_upsert(self):
+        catalog = get_catalog()
+        text = (
+            "kind,trait_type,description,power,title,severity\n"
+            "trait,health,health 3,9,,\n"
+            "trait,hobby,brand new hobby,2,,\n"
+            "catastrophe,,flood,,catastrophe 2,4\n"
+        )
+        report, callbacks = self.import_rows(text)
+        self.assertEqual(report.created, {"trait": 1})
+        self.assertEqual(report.updated, {"trait": 1, "catastrophe": 1})
+        self.assertEqual(len(callbacks), 1)
+
+        self.assertEqual(Trait.objects.get(trait_type="health", description="health 3").power, 9)
+        self.assertTrue(Trait.objects.filter(description="brand new hobby", power=2).exists())
+        self.assertEqual(Catastrophe.objects.get(title="catastrophe 2").severity, 4)
+        self.assertIsNot(get_catalog(), catalog)
+
+    def test_catalog_change_rerenders_rooms(self):
+        room = self.create_room(4)
+        host = self.join(room, "host")
+        url = f"/api/rooms/{room['code']}/"
+        before = self.client.get(url)
+        card = ActionCard.objects.get(description=host["action_card"]["description"])
+
+        self.import_rows(json.dumps({"kind": "action_card", "id": card.pk, "description": "renamed"}), "jsonl",
+                         match="id")
+
+        after = self.client.get(url)
+        self.assertNotEqual(after["ETag"], before["ETag"])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=before["ETag"]).status_code, 200)
+        self.assertEqual(after.json()["players"][0]["action_card"]["description"], "renamed")
+
+    def test_catalog_reload_without_shared_cache(self):
+        # Правка из другого воркера: общей версии нет, каталог перечитывается по TTL
+        room = self.create_room(4)
+        host = self.join(room, "host")
+        url = f"/api/rooms/{room['code']}/"
+        before = self.client.get(url)
+        ActionCard.objects.filter(description=host["action_card"]["description"]).update(description="elsewhere")
+
+        with mock.patch("main.services.catalog.CATALOG_TTL", 0):
+            after = self.client.get(url, HTTP_IF_NONE_MATCH=before["ETag"])
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual(after.json()["players"][0]["action_card"]["description"], "elsewhere")
+
+    def test_match_by_id(self):
+        card = ActionCard.objects.order_by("pk").first()
+        report, _ = self.import_rows(json.dumps({"kind": "action_card", "id": card.pk, "description": "renamed"}),
+                                     "jsonl", match="id")
+        self.assertEqual(report.updated, {"action_card": 1})
+        card.refresh_from_db()
+        self.assertEqual(card.description, "renamed")
+
+    def test_match_by_id_keeps_unknown_ids(self):
+        pk = ActionCard.objects.order_by("-pk").values_list("pk", flat=True).first() + 10
+        row = json.dumps({"kind": "action_card", "id": pk, "description": "imported"})
+
+        report, _ = self.import_rows(row, "jsonl", match="id")
+        self.assertEqual(report.created, {"action_card": 1})
+        self.assertEqual(ActionCard.objects.get(pk=pk).description, "imported")
+
+        report, callbacks = self.import_rows(row, "jsonl", match="id")
+        self.assertEqual((report.created, report.unchanged), ({}, {"action_card": 1}))
+        self.assertEqual(callbacks, [])
+        # Последовательность id ушла дальше импортированного ключа
+        self.assertGreater(ActionCard.objects.create(description="next").pk, pk)
+
+    def test_fractional_numbers_are_invalid(self):
+        rows = "\n".join(json.dumps(row) for row in (
+            {"kind": "trait", "trait_type": "health", "description": "half", "power": 1.5},
+            {"kind": "action_card", "id": 1.5, "description": "half"},
+            {"kind": "catastrophe", "title": "flag", "description": "...", "severity": True},
+        ))
+        with self.assertRaises(CatalogImportError) as raised:
+            self.import_rows(rows, "jsonl")
+        self.assertEqual([line for line, _ in raised.exception.errors], [1, 2, 3])
+        self.assertIn("power must be an integer", raised.exception.errors[0][1])
+
+    def test_invalid_rows_roll_back(self):
+        text = (
+            "kind,trait_type,description,power,title,severity\n"
+            "trait,health,health 3,9,,\n"
+            "trait,health,too strong,11,,\n"
+            "catastrophe,,...,,catastrophe 9,6\n"
+        )
+        with self.assertRaises(CatalogImportError) as raised:
+            self.import_rows(text, chunk_size=1)
+        self.assertEqual([line for line, _ in raised.exception.errors], [3, 4])
+        self.assertEqual(Trait.objects.get(description="health 3").power, 3)
+
+        report, _ = self.import_rows(text, skip_invalid=True)
+        self.assertEqual((report.updated, report.skipped), ({"trait": 1}, 2))
+        self.assertFalse(Trait.objects.filter(description="too strong").exists())
+
+    def test_commands_round_trip_gzip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "catalog.jsonl.gz")
+            call_command("export_catalog", path, "--kind", "trait", stdout=io.StringIO())
+            with gzip.open(path, "rt", encoding="utf-8") as stream:
+                self.assertEqual(sum(1 for _ in stream), Trait.objects.count())
+
+            out = io.StringIO()
+            call_command("import_catalog", path, stdout=out)
+            self.assertIn(f"trait: +0 created, 0 updated, {Trait.objects.count()} unchanged", out.getvalue())
+
+
+class RoomEventStreamTests(SimpleTestCase):
+    """SSE stream over the local backend: keepalives don't end the subscription"""
+
+    async def test_keepalive_then_event(self):
+        backend = LocalEventBackend()
+        with mock.patch("main.views.get_event_backend", return_value=backend), \
+                mock.patch("main.views.SSE_KEEPALIVE_SECONDS", 0.01):
+            stream = RoomEventStreamView().stream("ABCDEF", 3)
+            self.assertIn('"revision": 3', await anext(stream))
+
+            self.assertEqual(await anext(stream), ": keepalive\n\n")
+            self.assertEqual(await anext(stream), ": keepalive\n\n")
+            self.assertEqual(backend.broker.subscriber_count("ABCDEF"), 1)
+
+            # publish() приходит из потока синхронной вьюхи
+            await asyncio.to_thread(backend.publish, "ABCDEF", {"type": "trait_revealed", "revision": 4})
+            chunk = await anext(stream)
+            while chunk.startswith(":"):
+                chunk = await anext(stream)
+            self.assertTrue(chunk.startswith("event: trait_revealed\n"))
+
+            backend.publish("ABCDEF", {"type": "room_closed"})
+            self.assertTrue((await anext(stream)).startswith("event: room_closed\n"))
+            with self.assertRaises(StopAsyncIteration):
+                await anext(stream)
+        self.assertEqual(backend.broker.subscriber_count("ABCDEF"), 0)
+
+    async def test_disconnect_unsubscribes(self):
+        backend = LocalEventBackend()
+        with mock.patch("main.views.get_event_backend", return_value=backend), \
+                mock.patch("main.views.SSE_KEEPALIVE_SECONDS", 0.01):
+            stream = RoomEventStreamView().stream("ABCDEF", 0)
+            await anext(stream)
+            await anext(stream)
+            await stream.aclose()
+        self.assertEqual(backend.broker.subscriber_count("ABCDEF"), 0)
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def test_lru_respects_byte_cap(self):
+        cache = LocalResponseCache(max_bytes=10)
+        cache.get_or_render(1, 1, "full", lambda: b"aaaa")
+        cache.get_or_render(2, 1, "full", lambda: b"bbbb")
+        cache.get((1, 1, "full"))  # 1 становится самым свежим
+        cache.get_or_render(3, 1, "full", lambda: b"cccc")
+
+        self.assertIsNotNone(cache.get((1, 1, "full")))
+        self.assertIsNone(cache.get((2, 1, "full")))
+        self.assertLessEqual(cache.size, 10)
+
+        cache.invalidate_room(1)
+        self.assertIsNone(cache.get((1, 1, "full")))
+        self.assertEqual(cache.size, 4)
+
+    def test_concurrent_misses_render_once(self):
+        cache = LocalResponseCache()
+        started = threading.Event()
+        release = threading.Event()
+        renders = []
+
+        def render():
+            renders.append(1)
+            started.set()
+            release.wait()
+            return b"body"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(cache.get_or_render(1, 1, "full", render)))
+        leader.start()
+        started.wait()
+        followers = [
+            threading.Thread(target=lambda: results.append(cache.get_or_render(1, 1, "full", render)))
+            for _ in range(3)
+        ]
+        for follower in followers:
+            follower.start()
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join()
+
+        self.assertEqual(len(renders), 1)
+        self.assertEqual(results, [b"body"] * 4)
+
+    def test_waiter_renders_after_timeout(self):
+        cache = LocalResponseCache()
+        cache.wait_timeout = 0.01
+        started = threading.Event()
+        release = threading.Event()
+
+        def stuck():
+            started.set()
+            release.wait()
+            return b"late"
+
+        leader = threading.Thread(target=lambda: cache.get_or_render(1, 1, "full", stuck))
+        leader.start()
+        started.wait()
+        try:
+            self.assertEqual(cache.get_or_render(1, 1, "full", lambda: b"own"), b"own")
+        finally:
+            release.set()
+            leader.join()
+
+
+# Алиасы-зеркала default (TEST MIRROR): локально - вторая SQLite / Postgres на ту же базу
+REPLICA_ALIASES = [alias for alias, db in settings.DATABASES.items() if db.get("TEST", {}).get("MIRROR") == "default"]
+
+
+@override_settings(READ_REPLICAS=["replica"])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        health.mark("replica", True)
+
+    def tearDown(self):
+        health.forget()
+
+    def test_reads_use_replica_only_when_allowed(self):
+        self.assertIsNone(self.router.db_for_read(Room))
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Room), "replica")
+        self.assertFalse(self.router.allow_migrate("replica", "main"))
+
+    def test_write_returns_request_to_primary(self):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Room), "replica")
+            self.assertIsNone(self.router.db_for_write(Room))
+            self.assertIsNone(self.router.db_for_read(Room))
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        with self.assertLogs("main.db_router", "WARNING"):
+            health.mark("replica", False)
+        with replica_reads():
+            self.assertIsNone(self.router.db_for_read(Room))
+
+    def test_requests_never_probe(self):
+        health.forget()
+        with mock.patch.object(health, "probe") as probe, replica_reads():
+            self.assertIsNone(self.router.db_for_read(Room))
+        probe.assert_not_called()
+
+
+@skipUnless(REPLICA_ALIASES, "needs a database alias with TEST MIRROR = default")
+class ReplicaRoutingTests(TransactionTestCase):
+    """GET views read from the replica, the client that just wrote reads from primary"""
+
+    databases = {"default", *REPLICA_ALIASES}
+
+    def setUp(self):
+        self.replica = REPLICA_ALIASES[0]
+        self.room = Room.objects.create(code="REPL01", players_count=4, difficulty=3, balance=3, severity=3)
+        self.room.deck = {"seats": [{"bio": "...", "traits": [None] * 8, "action_card": None, "reaction_card": None}]}
+        self.room.save(update_fields=["deck"])
+        player = Player.objects.create(room=self.room, seat=1, device_id="writer", is_host=True)
+        self.reveal_url = f"/api/players/{player.id}/traits/{trait_pk(player.id, 0)}/reveal/"
+        get_response_cache().clear()
+        health.forget()
+
+    def tearDown(self):
+        health.forget()
+
+    def read_room(self, client=None, **headers):
+        client = client or self.client
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections[self.replica]) as replica:
+            response = client.get(f"/api/rooms/{self.room.code}/", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        get_response_cache().clear()
+        return len(primary), len(replica)
+
+    def test_reads_follow_replica_and_writer_stickiness(self):
+        with override_settings(READ_REPLICAS=[self.replica]):
+            # До первой проверки реплики чтения идут на primary
+            primary, replica = self.read_room()
+            self.assertEqual(replica, 0)
+
+            health.refresh()
+            primary, replica = self.read_room()
+            self.assertEqual(primary, 0)
+            self.assertGreater(replica, 0)
+
+            writer = Client()
+            response = writer.post(self.reveal_url, {"device_id": "writer"}, content_type="application/json")
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+            primary, replica = self.read_room(writer)
+            self.assertEqual(replica, 0)
+            self.assertGreater(primary, 0)
+
+            # Тот же токен в заголовке - для клиентов без cookie, поддельный игнорируется
+            primary, replica = self.read_room(**{PRIMARY_PIN_HEADER: response[PRIMARY_PIN_HEADER]})
+            self.assertEqual(replica, 0)
+            primary, replica = self.read_room(**{PRIMARY_PIN_HEADER: "1:forged"})
+            self.assertEqual(primary, 0)
+
+            primary, replica = self.read_room()
+            self.assertEqual(primary, 0)
+
+            # Поиск по устройству - POST, но только чтение: клиент остается на реплике
+            reader = Client()
+            response = reader.post("/api/players/by-device/", {"device_id": "writer"}, content_type="application/json")
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn(PRIMARY_PIN_COOKIE, response.cookies)
+            primary, replica = self.read_room(reader)
+            self.assertEqual(primary, 0)
+
+            with CaptureQueriesContext(connections[self.replica]) as async_replica:
+                response = async_to_sync(self.async_client.get)(f"/api/async/rooms/{self.room.code}/")
+            self.assertEqual(response.status_code, 200)
+            self.assertGreater(len(async_replica), 0)
+
+            with self.assertLogs("main.db_router", "WARNING"):
+                health.mark(self.replica, False)
+            primary, replica = self.read_room()
+            self.assertEqual(replica, 0)
@@ -13,6 +13,8 @@ from main.views import (
     UseReactionCardView,
     PlayerByDeviceView,
     KillPlayerAPIView,
+    RoomEventStreamView,
+    RoomActionsAPIView,
 )
 
 app_name = "main"
@@ -26,6 +28,8 @@ urlpatterns = [
     path("rooms/<str:code>/join/", JoinRoomAPIView.as_view(), name="join-room"),
     path("rooms/<str:code>/start/", StartGameAPIView.as_view(), name="start-game"),
     path("rooms/<str:code>/leave/", LeaveRoomAPIView.as_view(), name="leave-room"),
+    path("rooms/<str:code>/events/", RoomEventStreamView.as_view(), name="room-events"),
+    path("rooms/<str:code>/actions/", RoomActionsAPIView.as_view(), name="room-actions"),
     path("players/<int:pk>/", PlayerRetrieveAPIView.as_view(), name="player-retrieve"),
     path(
         "players/<int:player_id>/traits/<int:trait_id>/reveal/",
@@ -38,8 +42,8 @@ urlpatterns = [
         name="player-update",
     ),
     path("players/<int:player_id>/kill/", KillPlayerAPIView.as_view(), name="kill-player"),
-    path("action/<int:pk>/use/", UseActionCardView.as_view()),
-    path("reaction/<int:pk>/use/", UseReactionCardView.as_view()),
+    path("action/<int:pk>/use/", UseActionCardView.as_view(), name="use-action-card"),
+    path("reaction/<int:pk>/use/", UseReactionCardView.as_view(), name="use-reaction-card"),
 
-    path("players/by-device/", PlayerByDeviceView.as_view()),
+    path("players/by-device/", PlayerByDeviceView.as_view(), name="player-by-device"),
 ]
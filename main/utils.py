@@ -1,6 +1,117 @@
-import random
+import hashlib
 import string
+import threading
+import time
 
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
 
-def generate_room_code(length=6):
-    return "".join(random.choices(string.ascii_uppercase + string.digits, k=length))
+
+ROOM_CODE_ALPHABET = string.ascii_uppercase + string.digits
+ROOM_CODE_LENGTH = 6
+ROOM_CODE_SPACE = len(ROOM_CODE_ALPHABET) ** ROOM_CODE_LENGTH
+
+# * Сколько номеров процесс забирает из общего счетчика за один запрос
+ROOM_CODE_BLOCK_SIZE = 1000
+
+
+class RoomCodeAllocator:
+    """
+    Hands out unique room codes without probing the database
+    - Sequence numbers come from RoomCodeSequence in blocks (hi/lo), one query per block
+    - Each number goes through a keyed Feistel permutation of [0, 36^6), so codes look random
+      but can never repeat until the whole code space is used
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, block_size=ROOM_CODE_BLOCK_SIZE, key=None):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+        key = (key if key is not None else settings.SECRET_KEY or "").encode()
+        self._round_keys = [
+            hashlib.blake2b(key, digest_size=8, person=b"room-code-%d" % i).digest()
+            for i in range(self.ROUNDS)
+        ]
+
+    def _round(self, half, round_key):
+        digest = hashlib.blake2b(half.to_bytes(2, "big"), digest_size=2, key=round_key).digest()
+        return int.from_bytes(digest, "big")
+
+    def permute(self, number):
+        """Bijection on [0, ROOM_CODE_SPACE): Feistel on 32 bits + cycle walking"""
+        value = number
+        while True:
+            left, right = value >> 16, value & 0xFFFF
+            for round_key in self._round_keys:
+                left, right = right, left ^ self._round(right, round_key)
+            value = (left << 16) | right
+            if value < ROOM_CODE_SPACE:
+                return value
+
+    @staticmethod
+    def encode(value):
+        chars = []
+        for _ in range(ROOM_CODE_LENGTH):
+            value, index = divmod(value, len(ROOM_CODE_ALPHABET))
+            chars.append(ROOM_CODE_ALPHABET[index])
+        return "".join(reversed(chars))
+
+    def _claim_block(self):
+        from main.models import RoomCodeSequence
+
+        with transaction.atomic():
+            updated = RoomCodeSequence.objects.filter(pk=1).update(next_block=F("next_block") + 1)
+            if not updated:
+                RoomCodeSequence.objects.get_or_create(pk=1)
+                RoomCodeSequence.objects.filter(pk=1).update(next_block=F("next_block") + 1)
+            block = RoomCodeSequence.objects.values_list("next_block", flat=True).get(pk=1) - 1
+
+        return block * self.block_size
+
+    def allocate(self):
+        with self._lock:
+            if self._next >= self._end:
+                self._next = self._claim_block()
+                self._end = self._next + self.block_size
+            number = self._next
+            self._next += 1
+
+        return self.encode(self.permute(number % ROOM_CODE_SPACE))
+
+
+room_code_allocator = RoomCodeAllocator()
+
+
+def allocate_room_code():
+    return room_code_allocator.allocate()
+
+
+class QueryCounter:
+    """
+    Context manager counting SQL statements and wall time of a block
+    - Works with DEBUG=False (uses execute_wrapper instead of connection.queries)
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self.count = 0
+        self.duration_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connections[self.using].execute_wrapper(self)
+        self._wrapper.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        return self._wrapper.__exit__(exc_type, exc, tb)
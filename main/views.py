@@ -2,25 +2,111 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.exceptions import NotFound
-from django.shortcuts import get_object_or_404
-from django.utils import timezone
+from django.db import transaction, IntegrityError
 from rest_framework.authentication import BasicAuthentication
 from rest_framework.permissions import AllowAny
 
 from django.db.models import Q
-from main.models import Room, Player, RoomCatastrophe, Shelter, AssignedTrait, AssignedActionCard, AssignedReactionCard
+from django.utils.cache import patch_vary_headers
+from main.models import Room, Player, ChangeKind
 from main.serializers import (
     RoomCreateSerializer,
     RoomRetrieveSerializer,
     PlayerSerializer,
+    RoomActionsSerializer,
 )
-from main.utils import generate_room_code
-from main.services.draw_content import draw_game_content
+from main.utils import allocate_room_code
+from main.services.draw_content import draw_game_content, redraw_game_content, new_seed, DeckKey
+from main.services.deck_pool import claim_deck
+from main.services.queries import (
+    room_detail_queryset,
+    player_detail_queryset,
+    seated_player_queryset,
+    other_room_code_queryset,
+    free_seat_queryset,
+)
+from main.services.projections import project_players
+from main.services.room_reads import (
+    read_projection,
+    room_snapshot,
+    room_changes_since,
+    cached_room_body,
+    CACHEABLE_FORMATS,
+)
+from main.services.reaper import delete_rooms
+from main.services.transitions import (
+    reveal_trait,
+    kill_player,
+    use_action_card,
+    use_reaction_card,
+    reveal_traits,
+    kill_players,
+    use_cards,
+    diagnose_reveal,
+    diagnose_card_use,
+)
+from main.services.room_state import room_changed, room_etag, etag_matches, player_joined, trait_revealed
+from main.services.events import publish_room_event, get_event_backend
+from main.services.metrics import registry as metrics_registry
+
+import asyncio
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse, JsonResponse, HttpResponse, HttpResponseForbidden
+from django.views import View
+
+
+
+class RoomRevisionETagMixin:
+    """
+    Conditional GET for room reads
+    - ETag is built from the room revision and the negotiated format (responses vary by Accept)
+    - If-None-Match is answered with 304 after a single indexed lookup
+    """
+
+    # Поля (room id, ревизия) модели вьюхи: у комнаты свои, у игрока - через room
+    revision_fields = ("pk", "revision")
+
+    def get_room_revision(self):
+        """Returns (room_id, revision) of the looked-up object or None, without loading it"""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return (
+            self.get_queryset().model._default_manager
+            .filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            .values_list(*self.revision_fields)
+            .first()
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        revision = self.get_room_revision()
+        if revision is None:
+            raise NotFound()
+
+        etag = room_etag(*revision, request.accepted_renderer.format)
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        else:
+            self.room_revision = revision
+            response = self.render_fresh(request, *args, **kwargs)
+            response["ETag"] = etag
+        patch_vary_headers(response, ("Accept",))
+        return response
+
+    def render_fresh(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
-from datetime import timedelta
+ROOM_CODE_ATTEMPTS = 3
 
 
-STALE_ROOM_DAYS = 7
+def generation_headers(report):
+    """Exposes room generation cost to clients and benchmarks"""
+    return {
+        "X-Generation-Queries": str(report.queries),
+        "X-Generation-Time-Ms": f"{report.duration_ms:.1f}",
+        "X-Generation-Source": report.source,
+    }
 
 
 # & Комнаты
@@ -39,14 +125,21 @@ class RoomCreateAPIView(generics.CreateAPIView):
         Actually creates the room and draws content.
         """
         room_data: dict[str, object] = dict(serializer.validated_data)
-        room = Room.objects.create(code=code, **room_data)
-        draw_game_content(room)
-        return room
+        with transaction.atomic():
+            # Готовая колода из пула, если есть - иначе розыгрыш прямо здесь из нового зерна
+            pooled = getattr(settings, "ROOM_DECK_POOL", False)
+            plan = claim_deck(DeckKey(**room_data)) if pooled else None
+            seed = plan["seed"] if plan is not None else new_seed()
+
+            # Комната пишется вместе с колодой
+            room = Room(code=code, seed=seed, **room_data)
+            report = draw_game_content(room, plan, pooled)
+        return room, report
 
     def create(self, request, *args, **kwargs):
         """
         Override create to:
-        - generate unique room code
+        - allocate unique room code (no lookups, see RoomCodeAllocator)
         - create room with that code
         - draw content
         - return fully serialized room data
@@ -54,15 +147,19 @@ class RoomCreateAPIView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        code = generate_room_code()
-        while Room.objects.filter(code=code).exists():
-            code = generate_room_code()
-
-        room = self.perform_create(serializer, code=code)
+        for attempt in range(ROOM_CODE_ATTEMPTS):
+            try:
+                room, report = self.perform_create(serializer, code=allocate_room_code())
+                break
+            except IntegrityError:
+                # Код может совпасть только с комнатой, созданной случайным кодом до аллокатора
+                if attempt == ROOM_CODE_ATTEMPTS - 1:
+                    raise
 
-        output_serializer = RoomRetrieveSerializer(room)
+        output_serializer = RoomRetrieveSerializer(room_detail_queryset().get(pk=room.pk))
 
         headers = self.get_success_headers(serializer.data)
+        headers.update(generation_headers(report))
         return Response(
             output_serializer.data,
             status=status.HTTP_201_CREATED,
@@ -70,11 +167,44 @@ class RoomCreateAPIView(generics.CreateAPIView):
         )
 
 
-class RoomRetrieveAPIView(generics.RetrieveAPIView):
-    queryset = Room.objects.all()
+class RoomRetrieveAPIView(RoomRevisionETagMixin, generics.RetrieveAPIView):
+    replica_reads = True
+    queryset = room_detail_queryset()
     serializer_class = RoomRetrieveSerializer
     lookup_field = "code"
 
+    def render_snapshot(self, request, *args, **kwargs):
+        """
+        Full serializer, or the table / own view when ?view= or ?fields= is given
+        - JSON bodies come from the revision-keyed response cache
+        """
+        projection = read_projection(request.query_params)
+        room_id, revision = self.room_revision
+
+        renderer = request.accepted_renderer
+        if renderer.format not in CACHEABLE_FORMATS:
+            return Response(room_snapshot(room_id, projection))
+
+        body = cached_room_body(room_id, revision, projection, renderer)
+        return HttpResponse(body, content_type=renderer.media_type)
+
+    def render_fresh(self, request, *args, **kwargs):
+        """
+        ?since=<revision> returns only what changed after that revision
+        - Falls back to {"full": true, "room": <snapshot>} when a delta can't be built
+        """
+        since = request.query_params.get("since")
+        if since is None:
+            return self.render_snapshot(request, *args, **kwargs)
+
+        try:
+            since = int(since)
+        except ValueError:
+            return Response({"detail": "since must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        room_id, revision = self.room_revision
+        return Response(room_changes_since(room_id, revision, since, read_projection(request.query_params)))
+
 
 class StartGameAPIView(APIView):
     def post(self, request, code):
@@ -105,8 +235,9 @@ class StartGameAPIView(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        room.is_playing = True
-        room.save()
+        # Только флаг: ревизию, колоду и зерно меняют другие запросы атомарными UPDATE
+        Room.objects.filter(pk=room.pk).update(is_playing=True)
+        room_changed("game_started", room.pk, changes=[(ChangeKind.ROOM, None)])
 
         return Response({"detail": "Game started."}, status=status.HTTP_200_OK)
 
@@ -121,53 +252,48 @@ class RoomRestartAPIView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        old_players = (
-            Player.objects
-            .filter(room=room)
-            .values("seat", "device_id", "nickname", "is_host")
-        )
-
-        player_snapshot = {
-            p["seat"]: {
-                "device_id": p["device_id"],
-                "nickname": p["nickname"],
-                "is_host": p["is_host"],
-            }
-            for p in old_players
-            if p["device_id"]
-        }
-
-        Player.objects.filter(room=room).delete()
-        Shelter.objects.filter(room=room).delete()
-        RoomCatastrophe.objects.filter(room=room).delete()
-
-        draw_game_content(room)
+        # Игроки (места, устройства, ники) сохраняются, перераздаются только карточки
+        with transaction.atomic():
+            room.seed = new_seed()
+            report = redraw_game_content(room)
 
-        for player in Player.objects.filter(room=room):
-            snapshot = player_snapshot.get(player.seat)
-            if snapshot:
-                player.device_id = snapshot["device_id"]
-                player.nickname = snapshot["nickname"]
-                player.is_host = snapshot["is_host"]
-                player.save(update_fields=["device_id", "nickname", "is_host"])
+            room.is_playing = False
+            room.save(update_fields=["is_playing", "seed", "deck"])
+            room_changed("room_restarted", room.pk, changes=[(ChangeKind.RESET, None)])
 
-        room.is_playing = False
-        room.save(update_fields=["is_playing"])
-
-        serializer = RoomRetrieveSerializer(room)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer = RoomRetrieveSerializer(room_detail_queryset().get(pk=room.pk))
+        return Response(serializer.data, status=status.HTTP_200_OK, headers=generation_headers(report))
 
 # & Игроки
 
 
-class PlayerRetrieveAPIView(generics.RetrieveAPIView):
-    queryset = Player.objects.all()
+class PlayerRetrieveAPIView(RoomRevisionETagMixin, generics.RetrieveAPIView):
+    replica_reads = True
+    queryset = player_detail_queryset()
     serializer_class = PlayerSerializer
+    revision_fields = ("room_id", "room__revision")
+
+    def render_fresh(self, request, *args, **kwargs):
+        """
+        ?view=table - what other players see, ?view=own&device_id= - only for the owner
+        - Without ?view / ?fields the full player as before
+        """
+        projection = read_projection(request.query_params)
+        if projection is None:
+            return super().render_fresh(request, *args, **kwargs)
+
+        view, fields, device_id = projection
+        players, own_id = project_players(Player.objects.filter(pk=self.kwargs["pk"]), fields, device_id)
+        if not players:
+            raise NotFound()
+        if view == "own" and own_id is None:
+            return Response({"detail": "Not your player."}, status=status.HTTP_403_FORBIDDEN)
+        return Response(players[0])
 
 
 class PlayerUpdateAPIView(generics.UpdateAPIView):
     serializer_class = PlayerSerializer
-    queryset = Player.objects.all()
+    queryset = player_detail_queryset()
     http_method_names = ["patch"]
 
     def get_object(self):
@@ -182,12 +308,20 @@ class PlayerUpdateAPIView(generics.UpdateAPIView):
         except Room.DoesNotExist:
             raise NotFound("Room not found")
 
-        player = Player.objects.filter(room=room, device_id=device_id).first()
+        player = self.get_queryset().filter(room=room, device_id=device_id).first()
 
         if not player:
             raise NotFound("Player not found")
 
         return player
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        player = serializer.instance
+        room_changed(
+            "player_updated", player.room_id,
+            changes=[(ChangeKind.PLAYER, player.pk)], player_id=player.pk, nickname=player.nickname,
+        )
     
 
 class KillPlayerAPIView(APIView):
@@ -196,21 +330,21 @@ class KillPlayerAPIView(APIView):
         if not device_id:
             return Response({"detail": "device_id required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            player = Player.objects.get(pk=player_id)
-        except Player.DoesNotExist:
-            return Response({"detail": "Player not found"}, status=status.HTTP_404_NOT_FOUND)
+        # * Проверка хоста и смерть - один UPDATE, разбор причины только при неудаче
+        killed = kill_player(player_id, device_id)
+        if killed:
+            room_changed("player_killed", killed.room_id, changes=[(ChangeKind.PLAYER, player_id)], player_id=player_id)
+            return Response({"detail": f"Player {killed.nickname or killed.seat} killed"}, status=status.HTTP_200_OK)
 
-        room = player.room
+        player = Player.objects.filter(pk=player_id).values("room_id", "seat", "nickname").first()
+        if not player:
+            return Response({"detail": "Player not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        host = Player.objects.filter(room=room, device_id=device_id, is_host=True).first()
-        if not host:
+        if not Player.objects.filter(room_id=player["room_id"], device_id=device_id, is_host=True).exists():
             return Response({"detail": "Not authorized"}, status=status.HTTP_403_FORBIDDEN)
 
-        player.is_alive = False
-        player.save()
-
-        return Response({"detail": f"Player {player.nickname or player.seat} killed"}, status=status.HTTP_200_OK)
+        # Уже мертв (например, двойное нажатие) - повторно ничего не меняем
+        return Response({"detail": f"Player {player['nickname'] or player['seat']} killed"}, status=status.HTTP_200_OK)
 
 
 class JoinRoomAPIView(APIView):
@@ -230,34 +364,22 @@ class JoinRoomAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        player = Player.objects.filter(room=room, device_id=device_id).first()
+        player = seated_player_queryset(room, device_id).first()
         if player:
             return Response(PlayerSerializer(player).data)
 
-        existing_player = (
-            Player.objects
-            .filter(device_id=device_id)
-            .exclude(room=room)
-            .select_related("room")
-            .first()
-        )
+        existing_room_code = other_room_code_queryset(room, device_id).first()
 
-        if existing_player:
+        if existing_room_code:
             return Response(
                 {
                     "detail": "Device already joined another room",
-                    "room_code": existing_player.room.code,
+                    "room_code": existing_room_code,
                 },
                 status=status.HTTP_409_CONFLICT,
             )
 
-        unassigned_player = (
-            Player.objects
-            .filter(room=room)
-            .filter(Q(device_id__isnull=True) | Q(device_id=""))
-            .order_by("seat")
-            .first()
-        )
+        unassigned_player = free_seat_queryset(room).first()
 
         if not unassigned_player:
             return Response(
@@ -266,17 +388,15 @@ class JoinRoomAPIView(APIView):
             )
 
         unassigned_player.device_id = device_id
-        unassigned_player.save()
+        unassigned_player.save(update_fields=["device_id"])
+        player_joined(room.pk, unassigned_player)
 
         return Response(PlayerSerializer(unassigned_player).data)
 
 
 class LeaveRoomAPIView(APIView):
     def post(self, request, code):
-        # Delete stale rooms (>7 days old)
-        stale_time = timezone.now() - timedelta(days=7)
-        Room.objects.filter(updated_at__lt=stale_time).delete()
-
+        # Stale rooms are deleted by the reaper (manage.py reap_rooms / ROOM_REAPER_INTERVAL)
         try:
             room = Room.objects.get(code=code)
         except Room.DoesNotExist:
@@ -296,7 +416,8 @@ class LeaveRoomAPIView(APIView):
         player.save(update_fields=["device_id"])
 
         if player.is_host:
-            room.delete()
+            delete_rooms([room.pk])
+            publish_room_event(room.code, "room_closed")
             return Response(
                 {"detail": "Host left the room. Room was empty and deleted."},
                 status=status.HTTP_200_OK,
@@ -305,12 +426,17 @@ class LeaveRoomAPIView(APIView):
         # Delete the room if no players have a device_id
         active_players = Player.objects.filter(room=room).exclude(Q(device_id="") | Q(device_id__isnull=True))
         if not active_players.exists():
-            room.delete()
+            delete_rooms([room.pk])
+            publish_room_event(room.code, "room_closed")
             return Response(
                 {"detail": "Left the room. Room was empty and deleted."},
                 status=status.HTTP_200_OK,
             )
 
+        room_changed(
+            "player_left", room.pk,
+            changes=[(ChangeKind.PLAYER, player.pk)], player_id=player.pk, seat=player.seat,
+        )
         return Response({"detail": "Left the room."}, status=status.HTTP_200_OK)
     
 
@@ -323,76 +449,110 @@ class RevealTraitAPIView(APIView):
                 {"detail": "device_id is required"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            player = Player.objects.get(pk=player_id)
-        except Player.DoesNotExist:
-            return Response(
-                {"detail": "Player not found"}, status=status.HTTP_404_NOT_FOUND
-            )
+        if reveal_trait(player_id, trait_id, device_id):
+            trait_revealed(player_id, trait_id)
+            return Response({"trait_id": trait_id, "is_revealed": True}, status=status.HTTP_200_OK)
 
-        if player.device_id != device_id:
-            return Response(
-                {"detail": "You can only reveal your own traits"},
-                status=status.HTTP_403_FORBIDDEN,
-            )
+        error, error_status = diagnose_reveal(player_id, trait_id, device_id)
+        return Response({"detail": error}, status=error_status)
 
-        try:
-            trait = AssignedTrait.objects.get(pk=trait_id, player=player)
-        except AssignedTrait.DoesNotExist:
-            return Response(
-                {"detail": "Trait not found"}, status=status.HTTP_404_NOT_FOUND
-            )
 
-        if trait.is_revealed:
-            return Response(
-                {"detail": "Trait already revealed"}, status=status.HTTP_200_OK
-            )
+class UseActionCardView(APIView):
+    def post(self, request, pk):
+        device_id = request.data.get("device_id")
+        if not device_id:
+            return Response({"detail": "device_id required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        trait.is_revealed = True
-        trait.save(update_fields=["is_revealed"])
+        player_id = use_action_card(pk, device_id)
+        if player_id is None:
+            error, error_status = diagnose_card_use("action_card", pk, device_id)
+            return Response({"detail": error}, status=error_status)
 
-        return Response(
-            {
-                "trait_id": trait.pk,
-                "is_revealed": trait.is_revealed,
-            },
-            status=status.HTTP_200_OK,
+        room_changed(
+            "action_card_used", via_player=player_id,
+            changes=[(ChangeKind.ACTION_CARD, pk)], player_id=player_id, card_id=pk,
         )
 
+        return Response({"status": "ok"})
 
-class UseActionCardView(APIView):
+
+class UseReactionCardView(APIView):
     def post(self, request, pk):
-        card = get_object_or_404(AssignedActionCard, pk=pk)
+        device_id = request.data.get("device_id")
+        if not device_id:
+            return Response({"detail": "device_id required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        if card.is_used:
-            return Response(
-                {"detail": "Action card already used"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        player_id = use_reaction_card(pk, device_id)
+        if player_id is None:
+            error, error_status = diagnose_card_use("reaction_card", pk, device_id)
+            return Response({"detail": error}, status=error_status)
 
-        card.is_used = True
-        card.save(update_fields=["is_used"])
+        room_changed(
+            "reaction_card_used", via_player=player_id,
+            changes=[(ChangeKind.REACTION_CARD, pk)], player_id=player_id, card_id=pk,
+        )
 
         return Response({"status": "ok"})
 
 
-class UseReactionCardView(APIView):
-    def post(self, request, pk):
-        card = get_object_or_404(AssignedReactionCard, pk=pk)
+class RoomActionsAPIView(APIView):
+    """
+    Several reveals / kills / card uses of one device in a single request
+    - Device is checked once, each action type is one set-based UPDATE, all in one transaction
+    - Actions that don't apply (not yours, already done) are skipped, the revision moves once
+    """
 
-        if card.is_used:
-            return Response(
-                {"detail": "Reaction card already used"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    def post(self, request, code):
+        serializer = RoomActionsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        card.is_used = True
-        card.save(update_fields=["is_used"])
+        actor = (
+            Player.objects
+            .filter(room__code=code, device_id=serializer.validated_data["device_id"])
+            .values("pk", "room_id", "is_host", "room__revision")
+            .first()
+        )
+        if not actor:
+            return Response({"detail": "Player not found in this room."}, status=status.HTTP_404_NOT_FOUND)
 
-        return Response({"status": "ok"})
+        requested = {}
+        for action in serializer.validated_data["actions"]:
+            requested.setdefault(action["type"], set()).add(action["id"])
+
+        if "kill" in requested and not actor["is_host"]:
+            return Response({"detail": "Only the host can kill players."}, status=status.HTTP_403_FORBIDDEN)
+
+        appliers = {
+            "reveal": (ChangeKind.TRAIT, lambda ids: reveal_traits(actor["pk"], ids)),
+            "kill": (ChangeKind.PLAYER, lambda ids: kill_players(actor["room_id"], ids)),
+            "use_action_card": (ChangeKind.ACTION_CARD, lambda ids: use_cards("action_card", actor["pk"], ids)),
+            "use_reaction_card": (ChangeKind.REACTION_CARD, lambda ids: use_cards("reaction_card", actor["pk"], ids)),
+        }
+
+        applied = {}
+        changes = []
+        revision = actor["room__revision"]
+
+        with transaction.atomic():
+            for action_type, ids in requested.items():
+                kind, apply = appliers[action_type]
+                applied[action_type] = apply(sorted(ids))
+                changes.extend((kind, object_id) for object_id in applied[action_type])
+
+            if changes:
+                touched = room_changed(
+                    "actions_applied", actor["room_id"],
+                    changes=changes, player_id=actor["pk"], applied=applied,
+                )
+                if touched:
+                    revision = touched.revision
+
+        return Response({"revision": revision, "applied": applied}, status=status.HTTP_200_OK)
 
 
 class PlayerByDeviceView(APIView):
+    replica_reads = True
+
     def post(self, request):
         device_id = request.data.get("device_id")
         if not device_id:
@@ -410,4 +570,78 @@ class PlayerByDeviceView(APIView):
 
         return Response({
             "room": player.room.code
-        })
\ No newline at end of file
+        })
+
+
+# & События
+
+
+SSE_KEEPALIVE_SECONDS = 15
+
+
+class RoomEventStreamView(View):
+    """
+    Server-Sent Events stream of room changes (requires ASGI)
+    - First event is `hello` with the current revision
+    - Every change carries the new revision, a gap means the client should refetch the room
+    """
+
+    async def get(self, request, code):
+        room = await Room.objects.filter(code=code).values("revision").afirst()
+        if room is None:
+            return JsonResponse({"detail": "Room not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        response = StreamingHttpResponse(
+            self.stream(code, room["revision"]),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    @staticmethod
+    def format_event(event):
+        return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    async def stream(self, code, revision):
+        events = get_event_backend().subscribe(code)
+        # * Ожидание следующего события живет дольше keepalive: отмена на таймауте закрыла бы подписку
+        pending = None
+        try:
+            yield self.format_event({"type": "hello", "revision": revision})
+
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(anext(events))
+
+                done, _ = await asyncio.wait({pending}, timeout=SSE_KEEPALIVE_SECONDS)
+                if not done:
+                    yield ": keepalive\n\n"
+                    continue
+
+                event, pending = pending.result(), None
+                yield self.format_event(event)
+                if event["type"] == "room_closed":
+                    break
+        finally:
+            if pending is not None:
+                # Клиент ушел - прерываем ожидание, генератор подписки закрывается вместе с ним
+                pending.cancel()
+                await asyncio.gather(pending, return_exceptions=True)
+            await events.aclose()
+
+
+# & Метрики
+
+
+class MetricsView(View):
+    """Prometheus scrape endpoint, only reachable from METRICS_ALLOWED_IPS"""
+
+    def get(self, request):
+        if request.META.get("REMOTE_ADDR") not in getattr(settings, "METRICS_ALLOWED_IPS", ()):
+            return HttpResponseForbidden()
+
+        return HttpResponse(
+            metrics_registry.render_prometheus(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )